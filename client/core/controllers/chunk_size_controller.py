@@ -0,0 +1,88 @@
+import threading
+
+
+class ChunkSizeController:
+    """Adapts the chunk size to the throughput and acknowledgement latency measured over the last chunks sent.
+
+    The chunks in flight must at least cover the bandwidth-delay product for the link to stay busy. Above that
+    floor the chunk size is probed: it keeps growing or shrinking while the throughput improves and turns back
+    when the throughput drops. Samples are taken every few windows of chunks within a file and at its end, so a
+    single large file adapts as well as a series of small ones.
+    """
+
+    SMOOTHING = 0.5  # Weight of the last sample in the throughput and latency averages
+    BANDWIDTH_DELAY_GAIN = 2  # Bandwidth-delay products the window of chunks in flight should cover
+    MIN_CHUNKS = 4  # Chunks a sample must cover for its throughput to be measured
+    SAMPLE_WINDOWS = 4  # Windows of chunks sent before the chunk size is probed again within a file
+    STEP = 2  # Factor the chunk size is probed by from one sample to the next
+
+    def __init__(self, chunk_size: int, minimum_chunk_size: int, maximum_chunk_size: int, window_size=1):
+        self.minimum_chunk_size = minimum_chunk_size
+        self.maximum_chunk_size = maximum_chunk_size
+        self.window_size = window_size
+        self.chunk_size = self.clamp(chunk_size)  # In Ko
+
+        self.throughput = None  # Smoothed bytes per second
+        self.growing = True  # Direction the chunk size is probed in
+        self.latency = None  # Smoothed acknowledgement latency in seconds
+
+        self.sample_latency = 0.0  # Total acknowledgement latency of the chunks of the current sample
+        self.sample_acknowledgements = 0
+        self.sample_retransmissions = 0
+
+        self.lock = threading.Lock()  # Stripes report their acknowledgements from several threads
+
+    def clamp(self, chunk_size: int) -> int:
+        return max(self.minimum_chunk_size, min(int(chunk_size), self.maximum_chunk_size))
+
+    def get_chunk_size(self) -> int:
+        return self.chunk_size
+
+    def record_acknowledgement(self, latency: float) -> None:
+        with self.lock:
+            self.sample_latency += latency
+            self.sample_acknowledgements += 1
+
+    def record_retransmission(self) -> None:
+        with self.lock:
+            self.sample_retransmissions += 1
+
+    def is_sample_due(self, size: int, chunk_size: int) -> bool:
+        return size >= chunk_size * 10**3 * max(self.MIN_CHUNKS, self.SAMPLE_WINDOWS * self.window_size)
+
+    def record_sample(self, size: int, elapsed_time: float, chunk_size: int) -> None:
+        with self.lock:
+            acknowledgements, retransmissions = self.sample_acknowledgements, self.sample_retransmissions
+            latency = self.sample_latency / acknowledgements if acknowledgements > 0 else None
+            self.sample_latency, self.sample_acknowledgements, self.sample_retransmissions = 0.0, 0, 0
+
+            if retransmissions > 0:  # Corrupted chunks are cheaper to send again when they are smaller
+                self.chunk_size = self.clamp(chunk_size // 2)
+                return
+
+            if latency is None or elapsed_time <= 0 or size < chunk_size * 10**3 * self.MIN_CHUNKS:
+                return
+
+            throughput = size / elapsed_time
+
+            if self.throughput is not None and throughput < self.throughput:
+                self.growing = not self.growing
+
+            self.throughput = self.smooth(self.throughput, throughput)
+            self.latency = self.smooth(self.latency, latency)
+
+            bandwidth_delay_product = self.throughput * self.latency
+            minimum_chunk_size = bandwidth_delay_product * self.BANDWIDTH_DELAY_GAIN / self.window_size / 10**3
+
+            if self.growing:
+                target_chunk_size = chunk_size * self.STEP
+            else:
+                target_chunk_size = chunk_size / self.STEP
+
+            self.chunk_size = self.clamp(max(target_chunk_size, minimum_chunk_size))
+
+    def smooth(self, average: float, value: float) -> float:
+        if average is None:
+            return value
+
+        return (1 - self.SMOOTHING) * average + self.SMOOTHING * value
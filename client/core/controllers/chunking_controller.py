@@ -0,0 +1,53 @@
+import mmap
+import random
+import hashlib
+from typing import List, Tuple
+
+from client.core.models.file import File
+
+
+class ChunkingController:
+    """Content defined chunking with a gear rolling hash, so that shared regions of files give identical chunks."""
+
+    MIN_CHUNK_SIZE = 16 * 2**10
+    MAX_CHUNK_SIZE = 256 * 2**10
+    BOUNDARY_MASK = 0xFFFF0000  # 16 bits set: 64 KiB average chunks past the minimum size
+
+    GEAR = list(map(random.Random(0x67656172).getrandbits, [32] * 256))
+
+    @staticmethod
+    def get_boundary(data, start: int, end: int) -> int:
+        if end - start <= ChunkingController.MIN_CHUNK_SIZE:
+            return end
+
+        gear = ChunkingController.GEAR
+        boundary_mask = ChunkingController.BOUNDARY_MASK
+        rolling_hash = 0
+        position = start + ChunkingController.MIN_CHUNK_SIZE  # Cut points are never looked for below the minimum
+
+        for byte in data[position:end]:
+            rolling_hash = ((rolling_hash << 1) + gear[byte]) & 0xFFFFFFFF
+            position += 1
+
+            if not rolling_hash & boundary_mask:
+                return position
+
+        return end
+
+    @staticmethod
+    def get_chunks(file: File) -> List[Tuple[int, int, bytes]]:
+        chunks = list()  # (offset, size, sha256 digest)
+
+        with open(file.path, "rb") as file_object, \
+                mmap.mmap(file_object.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = 0
+
+            while start < len(data):
+                end = ChunkingController.get_boundary(data,
+                                                      start,
+                                                      min(start + ChunkingController.MAX_CHUNK_SIZE, len(data)))
+
+                chunks.append((start, end - start, hashlib.sha256(data[start:end]).digest()))
+                start = end
+
+        return chunks
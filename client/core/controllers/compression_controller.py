@@ -0,0 +1,34 @@
+import zlib
+import lzma
+import time
+
+from client.core.models.file import File
+
+
+class CompressionController:
+    """Registry of the codecs chunks can be compressed with, skipping files whose sampled chunk does not shrink."""
+
+    CODECS = {"zlib": lambda data: zlib.compress(data, 6),
+              "lzma": lambda data: lzma.compress(data, preset=1)}
+
+    COMPRESSIBLE_RATIO = 0.9  # Compressed size under which the sampled chunk is worth compressing the file
+
+    @staticmethod
+    def compress_chunk(file: File) -> None:
+        file.current_chunk_payload = file.current_chunk_data
+        file.current_chunk_compressed = False
+
+        if file.compression is not None and file.compressible is not False:
+            start_time = time.process_time()
+            compressed_data = CompressionController.CODECS[file.compression](file.current_chunk_data)
+            file.compression_time += time.process_time() - start_time
+
+            if len(compressed_data) < len(file.current_chunk_data) * CompressionController.COMPRESSIBLE_RATIO:
+                file.current_chunk_payload = compressed_data
+                file.current_chunk_compressed = True
+
+            if file.compressible is None:  # The first chunk decides for the rest of the file
+                file.compressible = file.current_chunk_compressed
+
+        file.compression_input_size += len(file.current_chunk_data)
+        file.compression_output_size += len(file.current_chunk_payload)
@@ -0,0 +1,107 @@
+import zlib
+import mmap
+import struct
+import hashlib
+from typing import Dict, Iterator, List, Tuple
+
+from client.core.models.file import File
+from client.network.protocol.protocol import Protocol
+
+
+class DeltaController:
+
+    @staticmethod
+    def parse_signatures(signatures: bytes) -> Dict[int, List[Tuple[int, bytes]]]:
+        signatures_dict = dict()  # Rolling checksum -> [(block number, strong checksum), ...]
+
+        for block_number, (weak_checksum, strong_checksum) in enumerate(struct.iter_unpack(Protocol.SIGNATURE_FORMAT,
+                                                                                          signatures)):
+            signatures_dict.setdefault(weak_checksum, list()).append((block_number, strong_checksum))
+
+        return signatures_dict
+
+    @staticmethod
+    def find_block(data, position: int, block_size: int, weak_checksum: int, signatures: dict):
+        candidates = signatures.get(weak_checksum)
+
+        if candidates is None:
+            return None
+
+        strong_checksum = hashlib.md5(data[position:position+block_size]).digest()
+
+        for block_number, block_strong_checksum in candidates:
+            if block_strong_checksum == strong_checksum:
+                return block_number
+
+        return None
+
+    @staticmethod
+    def copy_instruction(first_block: int, blocks_count: int) -> bytes:
+        return struct.pack(Protocol.DELTA_COPY_FORMAT, 0x00, first_block, blocks_count)
+
+    @staticmethod
+    def literal_instructions(data, start: int, end: int, literal_size: int) -> Iterator[bytes]:
+        for literal_start in range(start, end, literal_size):
+            literal = data[literal_start:min(literal_start + literal_size, end)]
+
+            yield struct.pack(Protocol.DELTA_LITERAL_FORMAT, 0x01, len(literal)) + literal
+
+    @staticmethod
+    def get_instructions(file: File, block_size: int, signatures: dict) -> Iterator[bytes]:
+        with open(file.path, "rb") as file_object, \
+                mmap.mmap(file_object.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            size = len(data)
+            position = 0
+            literal_start = 0
+            weak_checksum = None
+            a = b = 0
+            copy_first_block = None
+            copy_blocks_count = 0
+
+            while position + block_size <= size:
+                if weak_checksum is None:
+                    weak_checksum = zlib.adler32(data[position:position+block_size])
+                    a, b = weak_checksum & 0xffff, weak_checksum >> 16
+
+                block_number = DeltaController.find_block(data, position, block_size, weak_checksum, signatures)
+
+                if block_number is not None:
+                    yield from DeltaController.literal_instructions(data, literal_start, position, file.chunk_size)
+
+                    if copy_first_block is not None and copy_first_block + copy_blocks_count == block_number:
+                        copy_blocks_count += 1
+                    else:
+                        if copy_first_block is not None:
+                            yield DeltaController.copy_instruction(copy_first_block, copy_blocks_count)
+
+                        copy_first_block, copy_blocks_count = block_number, 1
+
+                    position += block_size
+                    literal_start = position
+                    weak_checksum = None
+
+                    continue
+
+                if copy_first_block is not None:
+                    yield DeltaController.copy_instruction(copy_first_block, copy_blocks_count)
+                    copy_first_block = None
+
+                if position - literal_start >= file.chunk_size:  # Keep literals bounded while scanning
+                    yield from DeltaController.literal_instructions(data, literal_start, position, file.chunk_size)
+                    literal_start = position
+
+                if position + block_size < size:  # Roll the adler32 checksum by one byte
+                    removed_byte, added_byte = data[position], data[position + block_size]
+
+                    a = (a - removed_byte + added_byte) % 65521
+                    b = (b - block_size * removed_byte + a - 1) % 65521
+                    weak_checksum = (b << 16) | a
+                else:
+                    weak_checksum = None
+
+                position += 1
+
+            if copy_first_block is not None:
+                yield DeltaController.copy_instruction(copy_first_block, copy_blocks_count)
+
+            yield from DeltaController.literal_instructions(data, literal_start, size, file.chunk_size)
@@ -1,38 +1,60 @@
 import os
-from typing import List
+from typing import List, Tuple
 
 from client.core.models.directory import Directory
 from client.core.models.file import File
+from client.core.models.file_table import FileTable
 
+from client.core.controllers.file_controller import FileController
 
-class DirectoryController:
 
-    @staticmethod
-    def from_path_list(path_list: List[str], directory_list: List[Directory], chunk_size: int) -> List[Directory]:
-        for path in path_list:
-            try:
-                new_directory = Directory(path)
-            except NotADirectoryError:
-                pass  # TODO: Implement
-            else:
-                directory_list.append(new_directory)
-                DirectoryController.set_content(new_directory, chunk_size)
+class DirectoryController:
 
     @staticmethod
     def set_name(directory: Directory) -> None:
         directory.name = directory.path.split("/")[-2]
 
     @staticmethod
-    def set_content(directory: Directory, chunk_size: int) -> None:
-        DirectoryController.set_name(directory)
+    def get_manifest(directory: Directory, files_list: List[File], file_table: FileTable, checksum_algorithm=None,
+                     relative_path="") -> None:
+        relative_path += directory.name + "/"
+
+        for file in directory.files_list:
+            DirectoryController.add_manifest_entry(file_table,
+                                                   file,
+                                                   relative_path + os.path.basename(file.path),
+                                                   checksum_algorithm)
+            files_list.append(file)
+
+        for sub_directory in directory.sub_directories_list:
+            DirectoryController.get_manifest(sub_directory, files_list, file_table, checksum_algorithm, relative_path)
+
+    @staticmethod
+    def add_manifest_entry(file_table: FileTable, file: File, relative_path: str, checksum_algorithm=None) -> None:
+        FileController.set_file_stat(file)
+        checksum = None
+
+        if checksum_algorithm is not None:
+            FileController.set_prehashed_checksum(file)
+
+            if file.checksum is not None and file.hash_algorithm == checksum_algorithm:
+                checksum = file.checksum
+            else:
+                checksum = FileController.get_checksum(file.path, file.chunk_size, checksum_algorithm)
+
+        file_table.append(relative_path, file.size, file.modification_time, checksum)
+
+    @staticmethod
+    def get_tree(directory: Directory, directories_list: List[Tuple[int, str]], files_list: List[File],
+                 parent_number=-1, relative_path="") -> None:
+        directory_number = len(directories_list)
+        relative_path += directory.name + "/"
 
-        for element in os.listdir(directory.path):
-            element_path = os.path.join(directory.path, element)
+        directories_list.append((parent_number, directory.name))
 
-            if os.path.isdir(element_path):
-                new_directory = Directory(element_path+"/", directory.level + 1)
+        for file in directory.files_list:
+            file.relative_path = relative_path + os.path.basename(file.path)
+            files_list.append(file)
 
-                directory.sub_directories_list.append(new_directory)
-                DirectoryController.set_content(new_directory, chunk_size)
-            elif os.path.isfile(element_path):
-                directory.files_list.append(File(element_path, chunk_size))
+        for sub_directory in directory.sub_directories_list:
+            DirectoryController.get_tree(sub_directory, directories_list, files_list, directory_number, relative_path)
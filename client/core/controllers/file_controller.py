@@ -1,9 +1,11 @@
 import os
-import hashlib
+import mmap
 from typing import List
 from datetime import datetime
 
 from client.core.models.file import File
+from client.core.controllers.hash_controller import HashController
+from client.core.controllers.compression_controller import CompressionController
 from client.errors.file_errors import *
 
 
@@ -22,7 +24,10 @@ class FileController:
 
     @staticmethod
     def set_name(file: File) -> None:
-        file.name = file.path.split("/")[-1]
+        if file.relative_path is not None:
+            file.name = file.relative_path
+        else:
+            file.name = file.path.split("/")[-1]
 
     @staticmethod
     def set_file_size(file: File) -> None:
@@ -36,64 +41,246 @@ class FileController:
     @staticmethod
     def set_file_checksum(file: File) -> None:
         if file.is_opened() and file.current_chunk == 0:
-            checksum_function = hashlib.md5()
+            checksum_function = HashController.new(file.hash_algorithm)
 
             for chunk in iter(lambda: file.file_object.read(file.chunk_size), b""):
                 checksum_function.update(chunk)
 
             file.checksum = checksum_function.hexdigest()
+            file.checksum_function = None
             FileController.go_to_byte(file, 0)
 
+    @staticmethod
+    def set_prehashed_checksum(file: File) -> None:
+        if file.checksum_future is not None:
+            try:
+                file.checksum = file.checksum_future.result()[0]
+            except (OSError, RuntimeError):  # Hashed again when needed
+                pass
+
+            file.checksum_future = None
+
+    @staticmethod
+    def set_file_stat(file: File) -> None:
+        if file.modification_time is None:
+            file_stat = os.stat(file.path)
+
+            file.size = file_stat.st_size
+            file.modification_time = file_stat.st_mtime_ns
+
+    @staticmethod
+    def require_file_checksum(file: File) -> None:
+        if file.checksum is None:
+            FileController.set_file_checksum(file)
+
+    @staticmethod
+    def finish_file_checksum(file: File) -> None:
+        if file.checksum_function is not None:
+            file.checksum = file.checksum_function.hexdigest()
+
+    @staticmethod
+    def read_whole_file(file: File) -> bytes:
+        with open(file.path, "rb") as file_object:
+            data = file_object.read()
+
+        checksum_function = HashController.new(file.hash_algorithm)
+        checksum_function.update(data)
+
+        FileController.set_name(file)
+        file.size = len(data)
+        file.checksum = checksum_function.hexdigest()
+
+        return data
+
+    @staticmethod
+    def get_checksum(path: str, chunk_size: int, algorithm: str) -> str:
+        checksum_function = HashController.new(algorithm)
+
+        with open(path, "rb") as file_object:
+            for chunk in iter(lambda: file_object.read(chunk_size), b""):
+                checksum_function.update(chunk)
+
+        return checksum_function.hexdigest()
+
     @staticmethod
     def set_chunk_checksum(file: File) -> None:
         if file.current_chunk_data is not None:
-            checksum_function = hashlib.md5()
+            checksum_function = HashController.new(file.chunk_hash_algorithm)
             checksum_function.update(file.current_chunk_data)
 
-            file.current_chunk_checksum = checksum_function.hexdigest()
+            file.current_chunk_digest = checksum_function.digest()
+            file.current_chunk_checksum = file.current_chunk_digest.hex()
 
     @staticmethod
     def update_last_chunk_time(file: File) -> None:
         file.last_chunk_sent_time = datetime.now()
 
     @staticmethod
-    def open(file: File) -> None:
+    def open(file: File, upfront_checksum=True) -> None:
         if file.is_opened():
             return
 
         file.file_object = open(file.path, "rb")
+        FileController.map(file)
 
         FileController.set_name(file)
         FileController.set_file_size(file)
-        FileController.set_file_checksum(file)
+        FileController.set_prehashed_checksum(file)
+
+        if file.checksum is not None:
+            pass  # Hashed by the scanner
+        elif upfront_checksum:
+            FileController.set_file_checksum(file)
+        else:  # The checksum is computed from the chunks as they are read
+            file.checksum_function = HashController.new(file.hash_algorithm)
+
+    @staticmethod
+    def map(file: File) -> None:
+        try:
+            file.file_mapping = mmap.mmap(file.file_object.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):  # Empty or special files are read into a reused buffer instead
+            file.file_mapping = None
 
     @staticmethod
     def close(file: File) -> None:
+        if file.file_mapping is not None:
+            try:
+                file.file_mapping.close()
+            except BufferError:
+                pass  # Chunks still in use: unmapped when the last of them is released
+
+            file.file_mapping = None
+
         if file.is_opened():
             file.file_object.close()
+            file.file_object = None
+
+        file.current_chunk_data = None
+        file.current_chunk_payload = None
 
     @staticmethod
     def read(file: File) -> None:
         if not file.is_opened():
             FileController.open(file)
 
-        if file.current_chunk == -1:
+        if file.current_chunk == -1 or (file.last_chunk is not None and file.current_chunk >= file.last_chunk):
+            file.current_chunk = -1
             raise EndOfFile
 
-        file.current_chunk_data = file.file_object.read(file.chunk_size)
+        file.current_chunk_data = FileController.read_chunk(file)
 
-        if file.current_chunk_data == b"":
+        if len(file.current_chunk_data) == 0:
             file.current_chunk = -1
             raise EndOfFile
 
         current_chunk_size = len(file.current_chunk_data)
 
+        if file.checksum_function is not None:
+            file.checksum_function.update(file.current_chunk_data)
+
         FileController.set_chunk_checksum(file)
+        CompressionController.compress_chunk(file)
         file.total_bytes_sent += current_chunk_size
         file.current_chunk_size = current_chunk_size
         file.current_chunk += 1
 
+    @staticmethod
+    def read_chunk(file: File) -> memoryview:
+        # Chunks are memoryviews over the file mapping or the read buffer, hashed and sent without being copied
+        if file.file_mapping is not None:
+            offset = file.file_mapping.tell()
+            chunk_data = memoryview(file.file_mapping)[offset:offset + file.chunk_size]
+            file.file_mapping.seek(offset + len(chunk_data))
+
+            return chunk_data
+
+        if file.read_buffer is None or len(file.read_buffer) != file.chunk_size:
+            file.read_buffer = bytearray(file.chunk_size)
+
+        return memoryview(file.read_buffer)[:file.file_object.readinto(file.read_buffer)]
+
+    @staticmethod
+    def is_chunk_reused(file: File) -> bool:
+        # Buffered chunks are overwritten by the next read, they must be copied to outlive it
+        return file.file_mapping is None and not file.current_chunk_compressed
+
+    @staticmethod
+    def get_chunks_count(file: File) -> int:
+        return -(-file.size // file.chunk_size)  # Ceiling division
+
+    @staticmethod
+    def split(file: File, stripes_count: int) -> List[File]:
+        chunks_count = FileController.get_chunks_count(file)
+        stripe_chunks_count = -(-chunks_count // stripes_count)
+        stripes = list()
+
+        for first_chunk in range(0, chunks_count, stripe_chunks_count):
+            stripe = FileController.copy(file, first_chunk * file.chunk_size)
+
+            stripe.current_chunk = first_chunk
+            stripe.last_chunk = min(first_chunk + stripe_chunks_count, chunks_count)
+
+            stripes.append(stripe)
+
+        return stripes
+
+    @staticmethod
+    def copy(file: File, offset: int) -> File:
+        # The same file opened again with its own position
+        file_copy = File(file.path, file.chunk_size // 10**3, checked=True)
+
+        file_copy.name = file.name
+        file_copy.size = file.size
+        file_copy.checksum = file.checksum
+        file_copy.hash_algorithm = file.hash_algorithm
+        file_copy.chunk_hash_algorithm = file.chunk_hash_algorithm
+        file_copy.compression = file.compression
+        file_copy.compressible = file.compressible
+        file_copy.file_object = open(file_copy.path, "rb")
+        FileController.map(file_copy)
+
+        FileController.go_to_byte(file_copy, offset)
+
+        return file_copy
+
+    @staticmethod
+    def get_position(file: File) -> int:
+        if file.file_mapping is not None:
+            return file.file_mapping.tell()
+
+        return file.file_object.tell()
+
+    @staticmethod
+    def resume(file: File, chunk_number: int, offset: int) -> None:
+        offset = min(offset, file.size)  # The chunks before it may have been sent with other chunk sizes
+
+        if file.checksum_function is not None:  # The skipped chunks still count in the running checksum
+            file.checksum_function = HashController.new(file.hash_algorithm)
+            FileController.go_to_byte(file, 0)
+
+            while file.file_object.tell() < offset:
+                file.checksum_function.update(file.file_object.read(min(file.chunk_size,
+                                                                        offset - file.file_object.tell())))
+
+        FileController.go_to_byte(file, offset)
+
+        file.current_chunk = chunk_number
+        file.total_bytes_sent = offset
+
+    @staticmethod
+    def rewind(file: File) -> None:
+        FileController.go_to_byte(file, 0)
+
+        if file.checksum_function is not None:
+            file.checksum_function = HashController.new(file.hash_algorithm)
+
+        file.current_chunk = 0
+        file.total_bytes_sent = 0
+
     @staticmethod
     def go_to_byte(file: File, byte_number: int) -> None:
         if file.is_opened() and byte_number <= file.size:
             file.file_object.seek(byte_number)
+
+            if file.file_mapping is not None:
+                file.file_mapping.seek(min(byte_number, len(file.file_mapping)))
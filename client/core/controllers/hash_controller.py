@@ -0,0 +1,94 @@
+import os
+import time
+import zlib
+import hashlib
+
+
+class Crc32:
+    """hashlib-like wrapper of zlib.crc32, cheap enough to check every chunk."""
+
+    digest_size = 4
+
+    def __init__(self, value=0):
+        self.value = value
+
+    def update(self, data) -> None:
+        self.value = zlib.crc32(data, self.value)
+
+    def digest(self) -> bytes:
+        return self.value.to_bytes(4, "big")
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+    def copy(self):
+        return Crc32(self.value)
+
+
+class HashController:
+    """Registry of the hash algorithms that can be proposed to the server for chunks and whole files."""
+
+    ALGORITHMS = {"md5": hashlib.md5,
+                  "sha256": hashlib.sha256,
+                  "blake2b": lambda: hashlib.blake2b(digest_size=32),
+                  "blake2s": lambda: hashlib.blake2s(digest_size=16),
+                  "crc32": Crc32}
+
+    DEFAULT_ALGORITHM = "md5"  # Only algorithm of servers that do not negotiate one
+    CHUNK_ALGORITHMS = ("crc32", "blake2s", "md5")  # Default order of preference
+    FILE_ALGORITHMS = ("sha256", "blake2b", "blake2s", "md5")  # sha256 is hardware accelerated on most recent processors
+
+    @staticmethod
+    def new(algorithm: str):
+        return HashController.ALGORITHMS[algorithm]()
+
+    @staticmethod
+    def get_preferences(algorithm: str, default_preferences) -> list:
+        if algorithm is None:
+            return list(default_preferences)
+
+        return [algorithm] + [preference for preference in default_preferences if preference != algorithm]
+
+    @staticmethod
+    def benchmark(data_size=64 * 2**20, chunk_size=15 * 10**3) -> dict:
+        data = memoryview(os.urandom(data_size))
+        throughputs = dict()
+
+        for algorithm in HashController.ALGORITHMS:
+            start_time = time.perf_counter()
+
+            for offset in range(0, data_size, chunk_size):  # New hash per chunk like chunk checks
+                HashController.new(algorithm).update(data[offset:offset+chunk_size])
+
+            chunk_time = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+
+            file_hash = HashController.new(algorithm)
+
+            for offset in range(0, data_size, 2**20):  # One running hash like whole file checks
+                file_hash.update(data[offset:offset+2**20])
+
+            file_hash.digest()
+            file_time = time.perf_counter() - start_time
+
+            throughputs[algorithm] = (data_size / chunk_time, data_size / file_time)
+
+        return throughputs
+
+
+if __name__ == '__main__':
+    import sys
+    import argparse
+
+    argument_parser = argparse.ArgumentParser(description="Hash throughput of every algorithm on this host")
+    argument_parser.add_argument("--size", help="megabytes hashed per algorithm", type=int, default=64)
+    argument_parser.add_argument("--chunk_size", help="chunk size in Ko", type=int, default=15)
+
+    args = argument_parser.parse_args()
+
+    sys.stdout.write("%-10s %16s %16s\n" % ("algorithm", "chunks (MB/s)", "file (MB/s)"))
+
+    for name, (chunk_throughput, file_throughput) in sorted(
+            HashController.benchmark(args.size * 2**20, args.chunk_size * 10**3).items(),
+            key=lambda item: -item[1][0]):
+        sys.stdout.write("%-10s %16.1f %16.1f\n" % (name, chunk_throughput / 2**20, file_throughput / 2**20))
@@ -0,0 +1,145 @@
+import queue
+import threading
+import time
+
+from client.core.models.file import File
+from client.core.models.statistics import Statistics
+
+from client.core.controllers.file_controller import FileController
+from client.errors.file_errors import *
+
+
+class ReadAheadController:
+    """Reads, hashes and compresses the next chunks of a file in a thread while the previous ones are being sent.
+
+    The reader thread works on its own copy of the file and hands the chunks out through a bounded queue, so a
+    slow disk and a slow link overlap instead of adding up. With a depth of 0 the sending thread reads the chunks.
+    """
+
+    def __init__(self, file: File, depth: int, statistics: Statistics):
+        self.file = file
+        self.depth = depth
+        self.statistics = statistics
+
+        self.reader_file = None
+        self.reader_thread = None
+        self.chunks = queue.Queue(max(depth, 1))
+        self.last_item = None  # End of file or read error, handed out again to every later read
+        self.chunk_size = None  # Chunk size the next chunks are to be read with, set by the sender
+        self.stopped = threading.Event()
+
+        self.sender_stall_time = 0.0  # Waited by the sender for a chunk to be read
+        self.reader_stall_time = 0.0  # Waited by the reader for a chunk to be sent
+
+        if depth > 0:
+            self.reader_file = FileController.copy(file, FileController.get_position(file))
+            self.reader_file.current_chunk = file.current_chunk
+            self.reader_file.total_bytes_sent = file.total_bytes_sent
+            self.reader_file.checksum_function = file.checksum_function  # Only updated by the reader from now on
+
+            self.reader_thread = threading.Thread(target=self.read_chunks, daemon=True)
+            self.reader_thread.start()
+
+    def read_chunks(self) -> None:
+        reader_file = self.reader_file
+
+        while not self.stopped.is_set():
+            if self.chunk_size is not None:
+                reader_file.chunk_size = self.chunk_size
+
+            try:
+                FileController.read(reader_file)
+            except (EndOfFile, IOError) as error:
+                self.put(error)
+                return
+
+            self.put((reader_file.current_chunk,
+                      reader_file.chunk_size,
+                      reader_file.current_chunk_size,
+                      reader_file.current_chunk_data,
+                      reader_file.current_chunk_checksum,
+                      reader_file.current_chunk_digest,
+                      reader_file.current_chunk_payload,
+                      reader_file.current_chunk_compressed,
+                      reader_file.total_bytes_sent))
+
+            if FileController.is_chunk_reused(reader_file):  # The next read would overwrite the queued chunk
+                reader_file.read_buffer = None
+
+    def put(self, item) -> None:
+        if not self.chunks.full():
+            self.chunks.put(item)
+            return
+
+        start_time = time.perf_counter()
+
+        while not self.stopped.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            else:
+                break
+
+        self.reader_stall_time += time.perf_counter() - start_time
+
+    def read(self, file: File) -> None:
+        if self.reader_file is None:
+            FileController.read(file)
+            return
+
+        if self.last_item is None:
+            self.statistics.read_ahead_chunks += 1
+            self.statistics.read_ahead_depth += self.chunks.qsize()
+
+            start_time = time.perf_counter()
+            item = self.chunks.get()
+            self.sender_stall_time += time.perf_counter() - start_time
+
+            if isinstance(item, Exception):
+                self.last_item = item
+                self.close()
+        else:
+            item = self.last_item
+
+        if isinstance(item, EndOfFile):
+            file.current_chunk = -1
+            raise EndOfFile
+
+        if isinstance(item, Exception):
+            raise item
+
+        (file.current_chunk,
+         file.chunk_size,
+         file.current_chunk_size,
+         file.current_chunk_data,
+         file.current_chunk_checksum,
+         file.current_chunk_digest,
+         file.current_chunk_payload,
+         file.current_chunk_compressed,
+         file.total_bytes_sent) = item
+
+    def set_chunk_size(self, chunk_size: int) -> None:
+        # Chunks already read keep their size, the sender learns the new size with the first chunk read with it
+        if self.reader_file is None:
+            self.file.chunk_size = chunk_size
+        else:
+            self.chunk_size = chunk_size
+
+    def close(self) -> None:
+        if self.reader_thread is None:
+            return
+
+        self.stopped.set()
+        self.reader_thread.join()
+        self.reader_thread = None
+
+        FileController.close(self.reader_file)
+
+        self.file.compressible = self.reader_file.compressible
+        self.file.compression_input_size += self.reader_file.compression_input_size
+        self.file.compression_output_size += self.reader_file.compression_output_size
+        self.file.compression_time += self.reader_file.compression_time
+
+        self.statistics.read_ahead_sender_stall_time += self.sender_stall_time
+        self.statistics.read_ahead_reader_stall_time += self.reader_stall_time
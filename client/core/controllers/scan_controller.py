@@ -0,0 +1,233 @@
+import os
+import time
+import itertools
+import threading
+from typing import List, Tuple, Iterator, Optional
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from client.core.models.directory import Directory
+from client.core.models.file import File
+from client.core.models.statistics import Statistics
+
+from client.core.controllers.directory_controller import DirectoryController
+from client.core.controllers.file_controller import FileController
+
+
+class ScanController:
+    """Directory scanner walking subtrees in parallel with os.scandir, optionally hashing files in worker processes."""
+
+    BATCH_SIZE = 1000  # Directories and files held by a batch of a streamed walk
+
+    def __init__(self, chunk_size: int, statistics: Statistics, scan_threads=8, hash_processes=0,
+                 hash_algorithm="md5"):
+        self.chunk_size = chunk_size
+        self.statistics = statistics
+        self.scan_threads = scan_threads
+        self.hash_algorithm = hash_algorithm
+
+        self.hash_executor = None
+        self.checksum_futures = set()  # Hashes not done yet, cancelled when the scanner is closed
+        self.checksum_futures_lock = threading.Lock()
+
+        if hash_processes > 0:
+            self.hash_executor = ProcessPoolExecutor(hash_processes)
+
+    @staticmethod
+    def hash_file(path: str, chunk_size: int, algorithm: str) -> Tuple[str, float]:
+        start_time = time.perf_counter()
+        checksum = FileController.get_checksum(path, chunk_size, algorithm)
+
+        return checksum, time.perf_counter() - start_time
+
+    def from_path_list(self, path_list: List[str], directories_list: List[Directory]) -> List[str]:
+        invalid_paths = list()  # Paths that are not directories, reported by the caller
+
+        for path in path_list:
+            try:
+                new_directory = Directory(path)
+            except NotADirectoryError:
+                invalid_paths.append(path)
+            else:
+                directories_list.append(new_directory)
+                self.scan(new_directory)
+
+        return invalid_paths
+
+    def scan(self, directory: Directory) -> None:
+        start_time = time.perf_counter()
+
+        DirectoryController.set_name(directory)
+
+        # Workers only list their own directory, the subdirectories found are queued from this thread
+        with ThreadPoolExecutor(self.scan_threads) as executor:
+            pending_scans = {executor.submit(self.scan_directory, directory)}
+
+            while pending_scans:
+                done_scans, pending_scans = wait(pending_scans, return_when=FIRST_COMPLETED)
+
+                for done_scan in done_scans:
+                    scanned_directory = done_scan.result()
+
+                    self.statistics.directories_scanned += 1
+                    self.statistics.files_scanned += len(scanned_directory.files_list)
+
+                    for sub_directory in scanned_directory.sub_directories_list:
+                        pending_scans.add(executor.submit(self.scan_directory, sub_directory))
+
+        self.statistics.scan_time += time.perf_counter() - start_time
+
+    def scan_directory(self, directory: Directory) -> Directory:
+        with os.scandir(directory.path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    new_directory = Directory(entry.path + "/", directory.level + 1, checked=True)
+                    DirectoryController.set_name(new_directory)
+
+                    directory.sub_directories_list.append(new_directory)
+                elif entry.is_file():
+                    entry_stat = entry.stat()
+
+                    new_file = File(entry.path, self.chunk_size, checked=True)
+                    new_file.size = entry_stat.st_size
+                    new_file.modification_time = entry_stat.st_mtime_ns
+
+                    self.prehash(new_file)
+                    directory.files_list.append(new_file)
+
+        return directory
+
+    def walk(self, path: str) -> Iterator[Tuple[List[Tuple[int, str]], List[File]]]:
+        root_path, name = os.path.split(os.path.normpath(path))
+        directories_list = list()  # (parent directory number in the batch, name or relative path) pairs
+        directories_numbers = dict()
+        files_list = list()
+
+        # Directories are listed BATCH_SIZE entries at a time, the rest of a directory waits in its open scandir
+        # iterator. The listings waiting are taken last in first out: the subdirectories found by a piece are listed
+        # before the rest of their parent, so only a piece of each directory down the current path is held instead of
+        # a whole level of the tree. New pieces are only listed once the sender took the previous batch.
+        pending_listings = [(name, None)]  # (relative path, entries left or None when the directory is not opened)
+        running_listings = set()
+
+        with ThreadPoolExecutor(self.scan_threads) as executor:
+            try:
+                while pending_listings or running_listings:
+                    while pending_listings and len(running_listings) < self.scan_threads:
+                        running_listings.add(executor.submit(self.list_directory, root_path, *pending_listings.pop()))
+
+                    done_listings, running_listings = wait(running_listings, return_when=FIRST_COMPLETED)
+
+                    for done_listing in done_listings:
+                        (relative_path,
+                         entries,
+                         opened,
+                         sub_directories,
+                         directory_files,
+                         scan_time) = done_listing.result()
+
+                        if entries is not None:  # Listed once its subdirectories are
+                            pending_listings.append((relative_path, entries))
+
+                        pending_listings.extend((sub_directory, None) for sub_directory in sub_directories)
+
+                        if opened:  # First piece of the directory
+                            parent_path, name = os.path.split(relative_path)
+
+                            if parent_path in directories_numbers:
+                                directories_list.append((directories_numbers[parent_path], name))
+                            else:  # Parent created by an earlier batch
+                                directories_list.append((-1, relative_path))
+
+                            directories_numbers[relative_path] = len(directories_list) - 1
+                            self.statistics.directories_scanned += 1
+
+                        files_list.extend(directory_files)
+
+                        self.statistics.files_scanned += len(directory_files)
+                        self.statistics.scan_time += scan_time
+
+                    if len(directories_list) + len(files_list) >= ScanController.BATCH_SIZE:
+                        yield directories_list, files_list
+
+                        directories_list = list()
+                        directories_numbers = dict()
+                        files_list = list()
+            finally:
+                # Directories left open when the walk is left before its end
+                wait(running_listings)
+
+                for running_listing in running_listings:
+                    if running_listing.exception() is None and running_listing.result()[1] is not None:
+                        running_listing.result()[1].close()
+
+                for _, entries in pending_listings:
+                    if entries is not None:
+                        entries.close()
+
+        if directories_list or files_list:
+            yield directories_list, files_list
+
+    def list_directory(self, root_path: str, relative_path: str,
+                       entries=None) -> Tuple[str, Optional[Iterator], bool, List[str], List[File], float]:
+        start_time = time.perf_counter()
+        opened = entries is None
+        listed_entries = 0
+        sub_directories = list()
+        files_list = list()
+
+        if opened:
+            entries = os.scandir(os.path.join(root_path, relative_path))
+
+        for entry in itertools.islice(entries, ScanController.BATCH_SIZE):
+            listed_entries += 1
+
+            if entry.is_dir():
+                sub_directories.append(os.path.join(relative_path, entry.name))
+            elif entry.is_file():
+                entry_stat = entry.stat()
+
+                new_file = File(entry.path, self.chunk_size, checked=True)
+                new_file.size = entry_stat.st_size
+                new_file.modification_time = entry_stat.st_mtime_ns
+                new_file.relative_path = os.path.join(relative_path, entry.name)
+
+                self.prehash(new_file)
+                files_list.append(new_file)
+
+        if listed_entries < ScanController.BATCH_SIZE:  # Whole directory listed
+            entries.close()
+            entries = None
+
+        return relative_path, entries, opened, sub_directories, files_list, time.perf_counter() - start_time
+
+    def prehash(self, file: File) -> None:
+        if self.hash_executor is not None:
+            file.hash_algorithm = self.hash_algorithm
+            file.checksum_future = self.hash_executor.submit(ScanController.hash_file,
+                                                             file.path,
+                                                             file.chunk_size,
+                                                             self.hash_algorithm)
+
+            with self.checksum_futures_lock:
+                self.checksum_futures.add(file.checksum_future)
+
+            file.checksum_future.add_done_callback(self.count_hash)
+
+    def count_hash(self, checksum_future) -> None:
+        with self.checksum_futures_lock:
+            self.checksum_futures.discard(checksum_future)
+
+        if not checksum_future.cancelled() and checksum_future.exception() is None:
+            self.statistics.files_hashed += 1
+            self.statistics.hash_time += checksum_future.result()[1]
+
+    def close(self) -> None:
+        if self.hash_executor is not None:
+            # Cancelled one by one, shutdown only cancels the pending hashes itself from Python 3.9
+            with self.checksum_futures_lock:
+                checksum_futures = list(self.checksum_futures)
+
+            for checksum_future in checksum_futures:
+                checksum_future.cancel()
+
+            self.hash_executor.shutdown()
@@ -1,17 +1,32 @@
+import os
 import sys
+import mmap
 import socket
 import logging
+import threading
+import time
+from datetime import datetime
 
 from client.network.core.client import Client
 from client.network.protocol.protocol import Protocol
 
 from client.core.models.directory import Directory
 from client.core.models.file import File
+from client.core.models.file_table import FileTable
+from client.core.models.statistics import Statistics
 
 from client.core.views.file_view import FileView
+from client.core.views.statistics_view import StatisticsView
 
 from client.core.controllers.directory_controller import DirectoryController
 from client.core.controllers.file_controller import FileController
+from client.core.controllers.delta_controller import DeltaController
+from client.core.controllers.chunking_controller import ChunkingController
+from client.core.controllers.hash_controller import HashController
+from client.core.controllers.compression_controller import CompressionController
+from client.core.controllers.scan_controller import ScanController
+from client.core.controllers.chunk_size_controller import ChunkSizeController
+from client.core.controllers.read_ahead_controller import ReadAheadController
 
 from client.errors.directory_errors import *
 from client.errors.file_errors import *
@@ -20,7 +35,11 @@ from client.errors.network_errors import *
 
 class Main:
 
-    def __init__(self, ip_address, port, verbosity_level=None, files_path_list=None, directories_path_list=None):
+    def __init__(self, ip_address, port, verbosity_level=None, files_path_list=None, directories_path_list=None,
+                 window_size=1, stripes=1, delta=False, dedup=False, sync=False, sync_checksum=False,
+                 upfront_checksum=False, file_hash_algorithm=None, chunk_hash_algorithm=None, compression=None,
+                 bundle_threshold=64 * 10**3, tree=True, scan_threads=8, hash_processes=0, chunk_size_range=None,
+                 read_ahead=4, raw_data_frames=True):
         self.client = Client(ip_address, port)
 
         self.files_path_list = files_path_list
@@ -45,21 +64,59 @@ class Main:
             self.exit(1)
 
         self.chunk_size = None
+        self.server_protocol_version = None
+        self.data_frame_version = None
+        self.window_size = window_size
+        self.striping = False
+        self.stripes = stripes
+        self.stripe_clients = list()
+        self.resume = False
+        self.delta = delta
+        self.dedup = dedup
+        self.sync = sync
+        self.sync_checksum = sync_checksum
+        self.streaming_checksum = not upfront_checksum
+        self.file_hash_algorithms = HashController.get_preferences(file_hash_algorithm, HashController.FILE_ALGORITHMS)
+        self.chunk_hash_algorithms = HashController.get_preferences(chunk_hash_algorithm,
+                                                                    HashController.CHUNK_ALGORITHMS)
+        self.file_hash_algorithm = HashController.DEFAULT_ALGORITHM
+        self.chunk_hash_algorithm = HashController.DEFAULT_ALGORITHM
+        self.compression = compression
+        self.bundle = bundle_threshold > 0
+        self.bundle_threshold = bundle_threshold
+        self.tree = tree
+        self.chunk_size_range = chunk_size_range  # Chunk sizes in Ko the chunk size is adapted in, fixed when None
+        self.chunk_size_controller = None
+        self.read_ahead = read_ahead  # Chunks read ahead of the sender by a reader thread, 0 disables
+        self.raw_data_frames = raw_data_frames
+
+        self.scan_threads = scan_threads
+        self.hash_processes = hash_processes
+        self.scan_controller = None
+
+        self.statistics = Statistics()
 
         self.file_view = FileView
+        self.statistics_view = StatisticsView
 
         self.main()
 
     def __del__(self):
         self.client.disconnect()
 
+        for stripe_client in self.stripe_clients:
+            stripe_client.disconnect()
+
     def exit(self, error_code: int):
         del self
         sys.exit(error_code)
 
-    def receive_packet(self, protocol_function):
+    def receive_packet(self, protocol_function, client: Client = None):
+        if client is None:
+            client = self.client
+
         try:
-            response = protocol_function(self.client.receive())
+            response = protocol_function(client.receive())
         except InvalidPacket as error:
             self.logger.critical("Unexpected error while connecting to the server")
             self.logger.error("Invalid packet received")
@@ -86,6 +143,85 @@ class Main:
             self.logger.critical("Server error")
             sys.exit(1)
 
+    def hello_options(self) -> dict:
+        return {"version": Protocol.VERSION,
+                "data_frame_versions": list(Protocol.DATA_FRAME_VERSIONS),
+                "window_size": self.window_size,
+                "resume": True,
+                "delta": self.delta,
+                "dedup": self.dedup,
+                "sync": self.sync,
+                "streaming_checksum": self.streaming_checksum,
+                "file_hash_algorithms": self.file_hash_algorithms,
+                "chunk_hash_algorithms": self.chunk_hash_algorithms,
+                "compressions": [self.compression] if self.compression is not None else [],
+                "bundle": self.bundle,
+                "tree": self.tree,
+                "chunk_size_range": list(self.chunk_size_range) if self.chunk_size_range is not None else None,
+                "raw_data_frames": self.raw_data_frames}
+
+    def negotiate(self) -> None:
+        self.logger.info("Negotiating protocol options with server...")
+        self.client.send(Protocol.send_hello(self.hello_options()))
+
+        options = self.receive_packet(Protocol.receive_hello)
+        self.data_frame_version = options.get("data_frame_version")
+        self.window_size = options.get("window_size", 1)
+        self.striping = options.get("striping", False)
+        self.resume = options.get("resume", False)
+        self.delta = options.get("delta", False)
+        self.dedup = options.get("dedup", False)
+        self.sync = options.get("sync", False)
+        self.streaming_checksum = options.get("streaming_checksum", False)
+        self.file_hash_algorithm = options.get("file_hash_algorithm", HashController.DEFAULT_ALGORITHM)
+        self.chunk_hash_algorithm = options.get("chunk_hash_algorithm", HashController.DEFAULT_ALGORITHM)
+        self.compression = options.get("compression")
+        self.bundle = options.get("bundle", False)
+        self.tree = options.get("tree", False)
+        self.chunk_size_range = options.get("chunk_size_range")
+        self.raw_data_frames = options.get("raw_data_frames", False)
+        self.logger.info("Done.")
+
+        if self.chunk_size_range is not None:
+            self.chunk_size_controller = ChunkSizeController(self.chunk_size,
+                                                             self.chunk_size_range[0],
+                                                             self.chunk_size_range[1],
+                                                             self.window_size)
+
+        self.logger.debug("Data frame version: %s" % self.data_frame_version)
+        self.logger.debug("Window size: %d" % self.window_size)
+        self.logger.debug("Striping: %s" % self.striping)
+        self.logger.debug("Resume: %s" % self.resume)
+        self.logger.debug("Delta: %s" % self.delta)
+        self.logger.debug("Deduplication: %s" % self.dedup)
+        self.logger.debug("Synchronization: %s" % self.sync)
+        self.logger.debug("Streaming checksum: %s" % self.streaming_checksum)
+        self.logger.debug("Hash algorithms: %s for files, %s for chunks" % (self.file_hash_algorithm,
+                                                                          self.chunk_hash_algorithm))
+        self.logger.debug("Compression: %s" % self.compression)
+        self.logger.debug("Bundle: %s" % self.bundle)
+        self.logger.debug("Directory tree: %s" % self.tree)
+        self.logger.debug("Chunk size range: %s" % self.chunk_size_range)
+        self.logger.debug("Raw data frames: %s" % self.raw_data_frames)
+
+    def connect_stripe_client(self) -> Client:
+        stripe_client = Client(self.client.ip_address, self.client.port)
+
+        try:
+            stripe_client.connect()
+        except socket.error as e:
+            self.logger.critical("Impossible to connect on %s:%s" % (self.client.ip_address, self.client.port))
+            self.logger.warning("Connection error: %s" % e.strerror)
+
+            self.exit(1)
+
+        self.receive_packet(Protocol.receive_chunk_size, stripe_client)
+
+        stripe_client.send(Protocol.send_hello(self.hello_options()))
+        self.receive_packet(Protocol.receive_hello, stripe_client)
+
+        return stripe_client
+
     def main(self) -> None:
         try:
             self.client.connect()
@@ -96,66 +232,546 @@ class Main:
             self.exit(1)
 
         self.logger.info("Receiving chunk size from server...")
-        self.chunk_size = self.receive_packet(Protocol.receive_chunk_size)
+        self.chunk_size, self.server_protocol_version = self.receive_packet(Protocol.receive_chunk_size)
         self.logger.info("Done.")
 
         self.logger.debug("Chunk size: %d Ko" % self.chunk_size)
+        self.logger.debug("Server protocol version: %d" % self.server_protocol_version)
+
+        if self.server_protocol_version >= 2:
+            self.negotiate()
+        else:
+            self.window_size = 1
+            self.delta = False
+            self.dedup = False
+            self.sync = False
+            self.streaming_checksum = False
+            self.compression = None
+            self.bundle = False
+            self.tree = False
+            self.chunk_size_range = None
+            self.raw_data_frames = False
+
+        if self.stripes > 1 and self.striping:
+            self.logger.info("Opening %d stripe connections..." % (self.stripes - 1))
+            self.stripe_clients = [self.connect_stripe_client() for _ in range(self.stripes - 1)]
+            self.logger.info("Done.")
+
+        self.statistics.window_size = self.window_size
+        self.statistics.stripes = len(self.stripe_clients) + 1
+        self.statistics.read_ahead_size = self.read_ahead
+        self.statistics.start_time = datetime.now()
 
         if self.files_path_list is not None:
             FileController.from_path_list(self.files_path_list, self.files_list, self.chunk_size)
             self.send_single_files()
 
         if self.directories_path_list is not None:
-            DirectoryController.from_path_list(self.directories_path_list, self.directories_list, self.chunk_size)
-            self.send_directories()
+            self.scan_controller = ScanController(self.chunk_size,
+                                                  self.statistics,
+                                                  self.scan_threads,
+                                                  self.hash_processes,
+                                                  self.file_hash_algorithm)
+
+            if self.tree:  # Directories are streamed from the scan instead of being scanned in full first
+                self.send_directories_streamed()
+            else:
+                for path in self.scan_controller.from_path_list(self.directories_path_list, self.directories_list):
+                    self.logger.critical("Directory %s could not be sent: not a directory" % path)
+
+                self.send_directories()
+
+            self.scan_controller.close()
+
+        self.statistics.end_time = datetime.now()
+        self.statistics_view.display(self.statistics)
 
         self.exit(0)
 
     def send_single_files(self):
         self.logger.info("Sending single files...")
 
-        for file in self.files_list:
-            self.send_file(file)
+        self.send_files(self.files_list)
 
     def send_directories(self):
         self.logger.info("Sending directories...")
 
         for main_directory in self.directories_list:
-            self.send_directory(main_directory)
+            needed_files = self.get_needed_files(main_directory) if self.sync else None
+
+            if self.tree:
+                self.send_directory_tree(main_directory, needed_files)
+            else:
+                self.send_directory(main_directory, needed_files)
+
+    def send_directories_streamed(self):
+        self.logger.info("Sending directories...")
+
+        for path in self.directories_path_list:
+            if not os.path.isdir(path):
+                self.logger.critical("Directory %s could not be sent: not a directory" % path)
+                continue
+
+            for directories_list, files_list in self.scan_controller.walk(path):
+                self.client.send(Protocol.send_directory_tree(directories_list))
+
+                if not self.receive_packet(Protocol.receive_confirmation_packet):
+                    self.logger.critical("Directory %s could not be sent" % path)
+                    break
+
+                if self.sync and files_list:
+                    file_table = FileTable()
+
+                    for file in files_list:
+                        DirectoryController.add_manifest_entry(file_table,
+                                                               file,
+                                                               file.relative_path,
+                                                               self.file_hash_algorithm if self.sync_checksum else None)
+
+                    needed_files = self.get_manifest_needed_files(files_list, file_table)
+                    files_list = [file for file in files_list if file.path in needed_files]
+
+                self.send_files(files_list)
+
+    def get_needed_files(self, directory: Directory) -> set:
+        files_list = list()
+        file_table = FileTable()
+
+        DirectoryController.get_manifest(directory,
+                                         files_list,
+                                         file_table,
+                                         self.file_hash_algorithm if self.sync_checksum else None)
+
+        return self.get_manifest_needed_files(files_list, file_table)
+
+    def get_manifest_needed_files(self, files_list: list, file_table: FileTable) -> set:
+        needed_files = list()
+
+        # The manifest of a large tree would not fit in a frame the server accepts
+        for first_number in range(0, len(file_table), Protocol.MANIFEST_BATCH_SIZE):
+            last_number = min(first_number + Protocol.MANIFEST_BATCH_SIZE, len(file_table))
+
+            self.client.send(Protocol.send_sync_manifest(file_table[number]
+                                                         for number in range(first_number, last_number)))
+            needed_files.extend(first_number + file_number
+                                for file_number in self.receive_packet(Protocol.receive_needed_files))
+
+        self.statistics.files_skipped += len(file_table) - len(needed_files)
+        self.statistics.bytes_skipped += file_table.get_total_size() - file_table.get_total_size(needed_files)
+
+        return {files_list[file_number].path for file_number in needed_files}
+
+    def send_files(self, files_list: list):
+        bundled_files = list()
+        bundle_size = 0
+
+        for file in files_list:
+            FileController.set_file_stat(file)
 
-    def send_file(self, file: File):
-        FileController.open(file)
+            if self.bundle and file.size <= self.bundle_threshold:
+                bundled_files.append(file)
+                bundle_size += file.size
+
+                if bundle_size >= Protocol.BUNDLE_MAX_SIZE:
+                    self.send_bundle(bundled_files)
+
+                    bundled_files = list()
+                    bundle_size = 0
+            else:
+                self.send_file(file)
+                FileController.close(file)
+
+        if bundled_files:
+            self.send_bundle(bundled_files)
+
+    def send_bundle(self, files_list: list):
+        bundle = list()
+
+        for file in files_list:
+            file.hash_algorithm = self.file_hash_algorithm
+
+            try:
+                bundle.append((file, FileController.read_whole_file(file)))
+            except IOError as error:
+                self.logger.critical("File %s could not be read: %s" % (file.path, error.strerror))
+
+        self.client.send(Protocol.send_bundle([(file.name, file.checksum, data) for file, data in bundle]))
+        results = self.receive_packet(Protocol.receive_bundle_results)
+
+        self.statistics.bundles_sent += 1
+
+        for (file, _), result in zip(bundle, results):
+            if result:
+                self.statistics.files_sent += 1
+                self.statistics.files_bundled += 1
+                self.statistics.bytes_sent += file.size
+            else:
+                self.logger.critical("Bundled file %s was rejected: sending it alone..." % file.name)
+                self.send_file(file)
+                FileController.close(file)
+
+    def send_file(self, file: File, incremental=True):
+        file.hash_algorithm = self.file_hash_algorithm
+        file.chunk_hash_algorithm = self.chunk_hash_algorithm
+        file.compression = self.compression
+
+        if self.chunk_size_controller is not None and not file.is_opened():
+            file.chunk_size = self.chunk_size_controller.get_chunk_size() * 10**3
+
+        FileController.open(file, upfront_checksum=not self.streaming_checksum)
         self.file_view.display(file)
 
-        self.client.send(Protocol.send_create_new_file(file.name, file.size, file.checksum))
+        # Delta, deduplicated and striped transfers announce the file checksum before reading the file in order
+        if incremental and self.delta and file.size > 0:
+            FileController.require_file_checksum(file)
+
+            if self.send_file_delta(file):
+                return
+
+        if incremental and self.dedup and file.size > 0:
+            FileController.require_file_checksum(file)
+            self.send_file_deduplicated(file)
+            return
+
+        if self.stripe_clients and FileController.get_chunks_count(file) > len(self.stripe_clients):
+            FileController.require_file_checksum(file)
+            self.send_file_striped(file)
+            return
+
+        if self.resume:
+            if not self.resume_file(file):
+                self.logger.critical("File could not be sent")
+                return
+        else:
+            self.client.send(Protocol.send_create_new_file(file.name, file.size, file.checksum,
+                                                           self.get_file_chunk_size(file)))
+
+            if not self.receive_packet(Protocol.receive_confirmation_packet):
+                self.logger.critical("File could not be sent")
+                return
+
+        if self.chunk_size_controller is not None:
+            file.announced_chunk_size = file.chunk_size
+
+        file.transfer_start_time = time.perf_counter()
+        file.transfer_start_bytes = file.total_bytes_sent  # Resumed files start their sample past the resumed bytes
+
+        read_ahead = ReadAheadController(file,
+                                         self.read_ahead if FileController.get_chunks_count(file) > 1 else 0,
+                                         self.statistics)
+
+        try:
+            if self.window_size > 1:
+                if self.send_file_window(file, read_ahead=read_ahead):
+                    self.send_end_of_file(file)
+                else:
+                    self.abort_file_transfer(file.name)
+
+                return
+
+            response = True
+
+            while response:
+                response = self.send_file_chunk(file, read_ahead)
+        finally:
+            read_ahead.close()
+
+    def get_file_chunk_size(self, file: File):
+        if self.chunk_size_controller is None:
+            return None
+
+        return file.chunk_size // 10**3
+
+    def resume_file(self, file: File) -> bool:
+        # Without an upfront checksum, the modification time tells a changed file of the same size apart
+        FileController.set_file_stat(file)
+
+        self.client.send(Protocol.send_resume_file(file.name, file.size, file.checksum, self.get_file_chunk_size(file),
+                                                   file.modification_time))
+        resume = self.receive_packet(Protocol.receive_resume)
+
+        if resume.get("chunk") is None:
+            return False
+
+        if self.chunk_size_controller is not None and resume.get("chunk_size") is not None:
+            file.chunk_size = resume["chunk_size"] * 10**3  # A resumed transfer goes on with its first chunk size
+
+        if resume["chunk"] > 0:
+            self.logger.info("Resuming %s from byte %d" % (file.name, resume["offset"]))
+
+            FileController.resume(file, resume["chunk"], resume["offset"])
+            self.statistics.bytes_resumed += file.total_bytes_sent
+
+        return True
+
+    def send_file_delta(self, file: File) -> bool:
+        self.client.send(Protocol.send_delta_request(file.name, file.size, file.checksum))
+        block_size, signatures = self.receive_packet(Protocol.receive_signatures)
+
+        if len(signatures) == 0:  # Nothing to rebuild the file from on the server
+            return False
+
+        signatures = DeltaController.parse_signatures(signatures)
+        instructions = bytearray()
+
+        for instruction in DeltaController.get_instructions(file, block_size, signatures):
+            if instruction[0] == 0x00:
+                self.statistics.delta_matched_bytes += Protocol.unpack(Protocol.DELTA_COPY_FORMAT,
+                                                                       instruction)[2] * block_size
+            else:
+                self.statistics.delta_literal_bytes += len(instruction) - 5
+
+            instructions.extend(instruction)
+
+            if len(instructions) >= file.chunk_size:
+                self.client.send(Protocol.send_delta_instructions(instructions))
+                instructions = bytearray()
+
+        if len(instructions) > 0:
+            self.client.send(Protocol.send_delta_instructions(instructions))
+
+        file.total_bytes_sent = file.size
+        self.file_view.update(file)
+
+        if not self.send_end_of_file(file, retry=False):
+            self.logger.critical("Delta transfer failed: sending the whole file...")
+            FileController.rewind(file)
+            self.send_file(file, incremental=False)
+
+        return True
+
+    def send_file_deduplicated(self, file: File):
+        chunks = ChunkingController.get_chunks(file)
+
+        self.client.send(Protocol.send_chunk_offer(file.name,
+                                                   file.size,
+                                                   file.checksum,
+                                                   [(digest, chunk_size) for _, chunk_size, digest in chunks]))
+        missing_chunks = self.receive_packet(Protocol.receive_missing_chunks)
+
+        with open(file.path, "rb") as file_object, \
+                mmap.mmap(file_object.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for chunk_number in missing_chunks:
+                offset, chunk_size, _ = chunks[chunk_number]
+
+                self.client.send(Protocol.send_stored_chunk(chunk_number, data[offset:offset+chunk_size]))
+                self.statistics.dedup_sent_bytes += chunk_size
+
+        self.statistics.dedup_skipped_bytes += file.size - sum(chunks[number][1] for number in missing_chunks)
+
+        file.total_bytes_sent = file.size
+        self.file_view.update(file)
+
+        if not self.send_end_of_file(file, retry=False):
+            self.logger.critical("Deduplicated transfer failed: sending the whole file...")
+            FileController.rewind(file)
+            self.send_file(file, incremental=False)
+
+    def send_end_of_file(self, file: File, retry=True) -> bool:
+        self.logger.debug("send eof packet")
+
+        if self.streaming_checksum:
+            FileController.finish_file_checksum(file)
+            self.client.send(Protocol.send_end_of_file(file.name, file.checksum))
+        else:
+            self.client.send(Protocol.send_end_of_file(file.name))
 
         if not self.receive_packet(Protocol.receive_confirmation_packet):
+            self.logger.debug("confirmation failed")
+            self.logger.critical("Server error")
+            self.exit(1)
+
+        if not self.receive_packet(Protocol.receive_file_integrity_confirmation):
+            if retry:
+                self.logger.critical("File integrity check failed: trying to send file again...")
+                FileController.rewind(file)
+                self.send_file(file)
+
+            return False
+
+        self.statistics.files_sent += 1
+        self.statistics.bytes_sent += file.size
+
+        if self.chunk_size_controller is not None and file.transfer_start_time is not None:
+            self.chunk_size_controller.record_sample(file.total_bytes_sent - file.transfer_start_bytes,
+                                                     time.perf_counter() - file.transfer_start_time,
+                                                     file.chunk_size // 10**3)
+            self.logger.debug("%s sent with %d Ko chunks, next chunk size: %d Ko" % (
+                file.name, file.chunk_size // 10**3, self.chunk_size_controller.get_chunk_size()))
+
+        if file.compression is not None and file.compression_input_size > 0:
+            self.statistics.compressed_files.append((file.name,
+                                                     file.compression_input_size,
+                                                     file.compression_output_size,
+                                                     file.compression_time))
+
+        return True
+
+    def send_file_striped(self, file: File):
+        self.client.send(Protocol.send_create_session(file.name, file.size, file.checksum,
+                                                      self.get_file_chunk_size(file)))
+        session_id = self.receive_packet(Protocol.receive_session).get("session_id")
+
+        if session_id is None:
             self.logger.critical("File could not be sent")
             return
 
-        response = True
+        file.transfer_start_time = time.perf_counter()
+        file.transfer_start_bytes = 0
+
+        for stripe_client in self.stripe_clients:
+            stripe_client.send(Protocol.send_join_session(session_id))
+
+            if not self.receive_packet(Protocol.receive_confirmation_packet, stripe_client):
+                self.logger.critical("Stripe connection could not join the transfer session")
+                self.exit(1)
+
+        stripes = FileController.split(file, len(self.stripe_clients) + 1)
+        stripes_results = [False] * len(stripes)
+        stripe_threads = list()
+
+        for stripe_number, (stripe, stripe_client) in enumerate(zip(stripes, [self.client] + self.stripe_clients)):
+            stripe_thread = threading.Thread(target=self.send_stripe,
+                                             args=(stripe, stripe_client, stripes_results, stripe_number))
+            stripe_thread.start()
+            stripe_threads.append(stripe_thread)
 
-        while response:
-            response = self.send_file_chunk(file)
+        for stripe_thread, stripe in zip(stripe_threads, stripes):
+            stripe_thread.join()
+            FileController.close(stripe)
 
-    def send_file_chunk(self, file: File):
+            file.compression_input_size += stripe.compression_input_size
+            file.compression_output_size += stripe.compression_output_size
+            file.compression_time += stripe.compression_time
+
+        file.total_bytes_sent = sum(stripe.total_bytes_sent for stripe in stripes)
+        self.file_view.update(file)
+
+        # Stripe connections lost during the transfer are not used for the next files
+        for stripe_client, stripe_result in zip(self.stripe_clients[:], stripes_results[1:]):
+            if stripe_result is None:
+                self.stripe_clients.remove(stripe_client)
+                stripe_client.disconnect()
+
+        if stripes_results[0] is None:
+            self.logger.critical("Connection lost")
+            self.exit(1)
+
+        if not all(stripes_results):
+            self.abort_file_transfer(file.name)
+            self.logger.critical("File transfer aborted: a stripe could not be sent")
+            return
+
+        self.send_end_of_file(file)
+
+    def send_stripe(self, stripe: File, stripe_client: Client, stripes_results: list, stripe_number: int):
+        # A lost connection fails its stripe only, the session is aborted by the thread that created it
+        try:
+            stripes_results[stripe_number] = self.send_file_window(stripe, stripe_client, striped=True)
+        except (socket.error, InvalidPacket) as error:
+            self.logger.error("Stripe %d connection error: %s" % (stripe_number, error))
+            stripes_results[stripe_number] = None
+
+    def send_file_window(self, file: File, client: Client = None, read_ahead: ReadAheadController = None,
+                         striped=False) -> bool:
+        if client is None:
+            client = self.client
+
+        read = FileController.read if read_ahead is None else read_ahead.read
+
+        in_flight_chunks = dict()  # Chunk number -> (data, digest, compressed) kept until acknowledged
+        send_times = dict()  # Chunk number -> time of its last sending, for the acknowledgement latency
+        retransmissions = dict()
+        end_of_file = False
+
+        while not end_of_file or in_flight_chunks:
+            while not end_of_file and len(in_flight_chunks) < self.window_size:
+                try:
+                    read(file)
+                except EndOfFile:
+                    end_of_file = True
+                except IOError as error:
+                    self.logger.info("File read error: %s" % error.strerror)
+                    self.logger.critical("File transfer aborted: could not read the file")
+
+                    return False
+                else:
+                    chunk_payload = file.current_chunk_payload
+
+                    if FileController.is_chunk_reused(file):
+                        chunk_payload = bytes(chunk_payload)
+
+                    in_flight_chunks[file.current_chunk] = (chunk_payload,
+                                                            file.current_chunk_digest,
+                                                            file.current_chunk_compressed)
+
+                    self.announce_chunk_size(file, client)
+                    FileController.update_last_chunk_time(file)
+                    send_times[file.current_chunk] = time.perf_counter()
+                    client.send_data_frame(file.current_chunk,
+                                           chunk_payload,
+                                           file.current_chunk_digest,
+                                           self.data_frame_version,
+                                           file.current_chunk_compressed,
+                                           self.raw_data_frames)
+                    self.statistics.chunks_sent += 1
+
+            if not in_flight_chunks:
+                break
+
+            if striped:  # Errors are raised to the stripe thread instead of exiting
+                acknowledgement = Protocol.receive_chunk_acknowledgement(client.receive())
+            else:
+                acknowledgement = self.receive_packet(Protocol.receive_chunk_acknowledgement, client)
+
+            chunk_number, cumulative_chunk, chunk_confirmed = acknowledgement
+
+            if chunk_confirmed:
+                if self.chunk_size_controller is not None and chunk_number in send_times:
+                    self.chunk_size_controller.record_acknowledgement(time.perf_counter() - send_times[chunk_number])
+
+                for acknowledged_chunk in [number for number in in_flight_chunks
+                                           if number == chunk_number or number <= cumulative_chunk]:
+                    del in_flight_chunks[acknowledged_chunk]
+                    send_times.pop(acknowledged_chunk, None)
+
+                if not striped:
+                    self.file_view.update(file)
+
+                self.adapt_chunk_size(file, read_ahead)
+            elif chunk_number in in_flight_chunks:
+                retransmissions[chunk_number] = retransmissions.get(chunk_number, 0) + 1
+
+                if retransmissions[chunk_number] > 5:
+                    self.logger.debug("chunk %d integrity confirmation failed" % chunk_number)
+                    self.logger.critical("File transfer aborted: integrity check failure")
+
+                    return False
+
+                chunk_data, chunk_digest, chunk_compressed = in_flight_chunks[chunk_number]
+
+                if self.chunk_size_controller is not None:
+                    self.chunk_size_controller.record_retransmission()
+
+                send_times[chunk_number] = time.perf_counter()
+                client.send_data_frame(chunk_number,
+                                       chunk_data,
+                                       chunk_digest,
+                                       self.data_frame_version,
+                                       chunk_compressed,
+                                       self.raw_data_frames)
+                self.statistics.chunks_retransmitted += 1
+
+        return True
+
+    def send_file_chunk(self, file: File, read_ahead: ReadAheadController):
         while True:
             read_error = 0
 
             try:
-                FileController.read(file)
+                read_ahead.read(file)
             except EndOfFile:
-                self.logger.debug("send eof packet")
-                self.client.send(Protocol.send_end_of_file(file.name))
-
-                if not self.receive_packet(Protocol.receive_confirmation_packet):
-                    self.logger.debug("confirmation failed")
-                    self.logger.critical("Server error")
-                    self.exit(1)
-
-                if not self.receive_packet(Protocol.receive_file_integrity_confirmation):
-                    self.logger.critical("File integrity check failed: trying to send file again...")
-                    self.send_file(file)
+                self.send_end_of_file(file)
 
                 return False
 
@@ -174,6 +790,8 @@ class Main:
                 integrity_confirmed = False
                 limit = 0
 
+                self.announce_chunk_size(file, self.client)
+
                 while not integrity_confirmed:
                     if limit > 5:
                         self.logger.debug("chunk integrity confirmation failed")
@@ -184,29 +802,103 @@ class Main:
                         return False
 
                     FileController.update_last_chunk_time(file)
-                    self.client.send(Protocol.send_file_chunk(file.name,
-                                                              file.current_chunk,
-                                                              file.current_chunk_data,
-                                                              file.current_chunk_checksum))
+                    send_time = time.perf_counter()
+
+                    if self.data_frame_version is not None:
+                        self.client.send_data_frame(file.current_chunk,
+                                                    file.current_chunk_payload,
+                                                    file.current_chunk_digest,
+                                                    self.data_frame_version,
+                                                    file.current_chunk_compressed,
+                                                    self.raw_data_frames)
+                    else:
+                        self.client.send(Protocol.send_file_chunk(file.name,
+                                                                  file.current_chunk,
+                                                                  file.current_chunk_data,
+                                                                  file.current_chunk_checksum))
 
                     integrity_confirmed = self.receive_packet(Protocol.receive_file_chunk_integrity_confirmation)
                     self.file_view.update(file)
+
+                    if self.chunk_size_controller is not None:
+                        if integrity_confirmed:
+                            self.chunk_size_controller.record_acknowledgement(time.perf_counter() - send_time)
+                        else:
+                            self.chunk_size_controller.record_retransmission()
+
+                    if limit == 0:
+                        self.statistics.chunks_sent += 1
+                    else:
+                        self.statistics.chunks_retransmitted += 1
+
                     limit += 1
 
+                self.adapt_chunk_size(file, read_ahead)
+
                 return True
 
-    def send_directory(self, current_directory: Directory):
+    def adapt_chunk_size(self, file: File, read_ahead: ReadAheadController = None) -> None:
+        # Probed every few windows of chunks, stripes keep the chunk size of their session
+        if self.chunk_size_controller is None or read_ahead is None or file.transfer_start_time is None:
+            return
+
+        sampled_size = file.total_bytes_sent - file.transfer_start_bytes
+
+        if not self.chunk_size_controller.is_sample_due(sampled_size, file.chunk_size // 10**3):
+            return
+
+        self.chunk_size_controller.record_sample(sampled_size,
+                                                 time.perf_counter() - file.transfer_start_time,
+                                                 file.chunk_size // 10**3)
+        chunk_size = self.chunk_size_controller.get_chunk_size() * 10**3
+
+        if chunk_size == file.chunk_size:
+            file.transfer_start_time = time.perf_counter()
+            file.transfer_start_bytes = file.total_bytes_sent
+            return
+
+        read_ahead.set_chunk_size(chunk_size)
+        file.transfer_start_time = None  # Sampled again from the first chunk read with the new chunk size
+
+    def announce_chunk_size(self, file: File, client: Client) -> None:
+        # The server places the chunks from this one on with the new chunk size
+        if file.announced_chunk_size is None or file.chunk_size == file.announced_chunk_size:
+            return
+
+        client.send(Protocol.send_chunk_size_change(file.current_chunk, file.chunk_size // 10**3))
+        file.announced_chunk_size = file.chunk_size
+        self.logger.debug("%s chunk size: %d Ko from chunk %d" % (file.name, file.chunk_size // 10**3,
+                                                                  file.current_chunk))
+
+        file.transfer_start_time = time.perf_counter()
+        file.transfer_start_bytes = file.total_bytes_sent - file.current_chunk_size
+
+    def send_directory_tree(self, main_directory: Directory, needed_files: set = None):
+        directories_list = list()
+        files_list = list()
+
+        DirectoryController.get_tree(main_directory, directories_list, files_list)
+
+        self.client.send(Protocol.send_directory_tree(directories_list))
+
+        if not self.receive_packet(Protocol.receive_confirmation_packet):
+            self.logger.critical("Directory %s could not be sent" % main_directory.path)
+            return
+
+        self.send_files([file for file in files_list if needed_files is None or file.path in needed_files])
+
+    def send_directory(self, current_directory: Directory, needed_files: set = None):
         self.client.send(Protocol.send_create_new_directory(current_directory.name))
 
         if not self.receive_packet(Protocol.receive_confirmation_packet):
             self.logger.critical("Directory %s could not be sent" % current_directory.path)
             return
 
-        for file in current_directory.files_list:
-            self.send_file(file)
+        self.send_files([file for file in current_directory.files_list
+                         if needed_files is None or file.path in needed_files])
 
         for sub_directory in current_directory.sub_directories_list:
-            self.send_directory(sub_directory)
+            self.send_directory(sub_directory, needed_files)
 
         self.client.send(Protocol.send_end_of_directory(current_directory.name))
 
@@ -224,7 +916,53 @@ if __name__ == '__main__':
     argument_parser.add_argument("--verbosity", "-v", help="verbosity level", action="count")
     argument_parser.add_argument("--files_path", "-f", nargs='*', help="Files paths to transfer")
     argument_parser.add_argument("--directories_path", "-d", nargs='*', help="Directories paths to transfer")
+    argument_parser.add_argument("--window_size", "-w", help="number of chunks in flight", type=int, default=1)
+    argument_parser.add_argument("--stripes", "-s", help="number of connections per file", type=int, default=1)
+    argument_parser.add_argument("--delta", help="only send the differences with existing files", action="store_true")
+    argument_parser.add_argument("--dedup", help="only send chunks missing from the server store", action="store_true")
+    argument_parser.add_argument("--sync", help="skip files unchanged on the server", action="store_true")
+    argument_parser.add_argument("--sync_checksum", help="compare checksums instead of modification times",
+                                 action="store_true")
+    argument_parser.add_argument("--upfront_checksum", help="hash files before sending them", action="store_true")
+    argument_parser.add_argument("--file_hash", help="preferred whole file hash algorithm",
+                                 choices=HashController.FILE_ALGORITHMS)
+    argument_parser.add_argument("--chunk_hash", help="preferred chunk hash algorithm",
+                                 choices=sorted(HashController.ALGORITHMS))
+    argument_parser.add_argument("--compression", "-c", help="chunk compression codec",
+                                 choices=sorted(CompressionController.CODECS))
+    argument_parser.add_argument("--bundle_threshold", help="size up to which files are sent in bundles, 0 disables",
+                                 type=int, default=64 * 10**3)
+    argument_parser.add_argument("--no_tree", help="enter and leave directories one by one", action="store_true")
+    argument_parser.add_argument("--scan_threads", help="threads listing directories", type=int, default=8)
+    argument_parser.add_argument("--prehash", help="processes hashing files while they are scanned", type=int,
+                                 default=0)
+    argument_parser.add_argument("--read_ahead", help="chunks read ahead of the network, 0 disables", type=int,
+                                 default=4)
+    argument_parser.add_argument("--no_raw_frames", help="send chunks inside the data frames", action="store_true")
+    argument_parser.add_argument("--chunk_size_range", help="adapt the chunk size between MIN and MAX Ko",
+                                 type=int, nargs=2, metavar=("MIN", "MAX"))
 
     args = argument_parser.parse_args()
 
-    Main(args.ip_address, args.port, args.verbosity, args.files_path, args.directories_path)
+    Main(args.ip_address,
+         args.port,
+         args.verbosity,
+         args.files_path,
+         args.directories_path,
+         args.window_size,
+         args.stripes,
+         args.delta,
+         args.dedup,
+         args.sync,
+         args.sync_checksum,
+         args.upfront_checksum,
+         args.file_hash,
+         args.chunk_hash,
+         args.compression,
+         args.bundle_threshold,
+         not args.no_tree,
+         args.scan_threads,
+         args.prehash,
+         args.chunk_size_range,
+         args.read_ahead,
+         not args.no_raw_frames)
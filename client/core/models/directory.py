@@ -3,8 +3,10 @@ import os
 
 class Directory:
 
-    def __init__(self, path: str, level=0):
-        if not os.path.isdir(path):
+    __slots__ = ("path", "name", "level", "sub_directories_list", "files_list")
+
+    def __init__(self, path: str, level=0, checked=False):
+        if not checked and not os.path.isdir(path):
             raise NotADirectoryError
 
         self.path = path
@@ -6,24 +6,53 @@ from client.errors.file_errors import *
 
 class File:
 
-    def __init__(self, path: str, chunk_size: int):
-        if not os.path.isfile(path):
+    __slots__ = ("path", "name", "relative_path", "file_object", "size", "checksum", "checksum_future",
+                 "modification_time", "file_mapping", "read_buffer", "checksum_function", "hash_algorithm",
+                 "chunk_hash_algorithm", "chunk_size", "current_chunk", "last_chunk", "current_chunk_size",
+                 "current_chunk_data", "current_chunk_checksum", "current_chunk_digest", "current_chunk_payload",
+                 "current_chunk_compressed", "compression", "compressible", "compression_input_size",
+                 "compression_output_size", "compression_time", "total_bytes_sent", "last_chunk_sent_time",
+                 "transfer_start_time", "transfer_start_bytes", "announced_chunk_size")
+
+    def __init__(self, path: str, chunk_size: int, checked=False):
+        if not checked and not os.path.isfile(path):
             raise FileExistsError
 
         self.path = path
         self.name = None
+        self.relative_path = None  # Name of the file when it is addressed from the root of a directory tree
         self.file_object = None
+        self.file_mapping = None  # Read only memory map chunks are sliced from
+        self.read_buffer = None  # Reused by the chunks of files that cannot be mapped
         self.size = 0
         self.checksum = None
+        self.checksum_future = None  # Checksum computed by a scanner worker process
+        self.modification_time = None  # Known when the file was found by a scanner
+        self.checksum_function = None  # Running whole file checksum when it is computed while sending
+        self.hash_algorithm = "md5"
+        self.chunk_hash_algorithm = "md5"
         self.chunk_size = chunk_size * 10**3  # Chunk in Ko
 
         self.current_chunk = 0
+        self.last_chunk = None  # Last chunk to read when the file is sent as several stripes
         self.current_chunk_size = None
         self.current_chunk_data = None
         self.current_chunk_checksum = None
+        self.current_chunk_digest = None
+        self.current_chunk_payload = None  # Chunk data as sent, compressed or not
+        self.current_chunk_compressed = False
+
+        self.compression = None
+        self.compressible = None  # Unknown until the first chunk is sampled
+        self.compression_input_size = 0
+        self.compression_output_size = 0
+        self.compression_time = 0.0
 
         self.total_bytes_sent = 0
         self.last_chunk_sent_time = None
+        self.transfer_start_time = None  # Start of the throughput sample, from when the server accepted the file
+        self.transfer_start_bytes = 0
+        self.announced_chunk_size = None  # Chunk size the server expects the next chunks with, None when not adapted
 
     def is_opened(self) -> bool:
         if self.file_object is None:
@@ -0,0 +1,69 @@
+from array import array
+from typing import Iterator, Optional, Tuple
+
+
+class StringPool:
+    """Strings stored back to back in a single buffer and addressed by their number."""
+
+    __slots__ = ("data", "offsets")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("Q", [0])
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, number: int) -> str:
+        return self.data[self.offsets[number]:self.offsets[number+1]].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[number] for number in range(len(self)))
+
+    def append(self, string: str) -> int:
+        self.data.extend(string.encode("utf-8"))
+        self.offsets.append(len(self.data))
+
+        return len(self) - 1
+
+
+class FileTable:
+    """Columnar table of files: paths and checksums in string pools, sizes and modification times in arrays.
+
+    A row costs a few dozen bytes instead of a File object with its dictionary, so manifests of millions of files
+    can be built, sent and compared without holding the file models.
+    """
+
+    __slots__ = ("paths", "sizes", "modification_times", "checksums")
+
+    def __init__(self):
+        self.paths = StringPool()
+        self.sizes = array("q")
+        self.modification_times = array("q")
+        self.checksums = StringPool()  # Empty string when the checksum is unknown
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    def __getitem__(self, number: int) -> Tuple[str, int, int, Optional[str]]:
+        return (self.paths[number],
+                self.sizes[number],
+                self.modification_times[number],
+                self.checksums[number] or None)
+
+    def __iter__(self) -> Iterator[Tuple[str, int, int, Optional[str]]]:
+        return (self[number] for number in range(len(self)))
+
+    def append(self, path: str, size: int, modification_time: int, checksum: str = None) -> int:
+        self.paths.append(path)
+        self.sizes.append(size)
+        self.modification_times.append(modification_time)
+        self.checksums.append(checksum or "")
+
+        return len(self) - 1
+
+    def get_total_size(self, numbers=None) -> int:
+        if numbers is None:
+            return sum(self.sizes)
+
+        return sum(self.sizes[number] for number in numbers)
@@ -0,0 +1,35 @@
+class Statistics:
+
+    def __init__(self):
+        self.window_size = 1
+        self.stripes = 1
+
+        self.files_sent = 0
+        self.bytes_sent = 0
+        self.bytes_resumed = 0
+        self.delta_matched_bytes = 0
+        self.delta_literal_bytes = 0
+        self.dedup_sent_bytes = 0
+        self.dedup_skipped_bytes = 0
+        self.files_skipped = 0
+        self.files_bundled = 0
+        self.bundles_sent = 0
+        self.bytes_skipped = 0
+        self.chunks_sent = 0
+        self.chunks_retransmitted = 0
+        self.compressed_files = list()  # (name, chunks size, compressed chunks size, compression time) of each file
+
+        self.read_ahead_size = 0
+        self.read_ahead_chunks = 0
+        self.read_ahead_depth = 0  # Added up over the chunks, queued chunks found by the sender
+        self.read_ahead_sender_stall_time = 0.0  # Waited by the sender for the disk
+        self.read_ahead_reader_stall_time = 0.0  # Waited by the reader for the network
+
+        self.directories_scanned = 0
+        self.files_scanned = 0
+        self.scan_time = 0.0
+        self.files_hashed = 0
+        self.hash_time = 0.0  # Added up over the hashing processes
+
+        self.start_time = None
+        self.end_time = None
@@ -10,12 +10,13 @@ class FileView:
     def display(file: File) -> None:
         values_to_display = (FileView.display_name(file.name),
                              FileView.display_size(file.size),
+                             FileView.display_chunk_size(file.chunk_size),
                              FileView.display_connection_speed(file.last_chunk_sent_time, file.current_chunk_size),
                              FileView.display_eta(file.size, file.last_chunk_sent_time, file.chunk_size, file.total_bytes_sent),
                              FileView.display_progress_bar(file.total_bytes_sent, file.size),
                              FileView.display_percentage(file.total_bytes_sent, file.size))
 
-        sys.stdout.write("%s   %s   %s   %s  %s %s\n" % values_to_display)
+        sys.stdout.write("%s   %s   %s   %s   %s  %s %s\n" % values_to_display)
 
     @staticmethod
     def update(file: File):
@@ -59,6 +60,10 @@ class FileView:
         else:
             return "%.2f TB" % round(size/(10**12), 2)
 
+    @staticmethod
+    def display_chunk_size(chunk_size: int) -> str:
+        return "%s chunks" % FileView.display_size(chunk_size)
+
     @staticmethod
     def display_connection_speed(last_chunk_sent_time: datetime.datetime, last_chunk_size: int) -> str:
         if last_chunk_sent_time is None:
@@ -0,0 +1,65 @@
+import sys
+
+from client.core.models.statistics import Statistics
+from client.core.views.file_view import FileView
+
+
+class StatisticsView:
+
+    @staticmethod
+    def display(statistics: Statistics) -> None:
+        sys.stdout.write("Files sent: %d (%s)\n" % (statistics.files_sent, FileView.display_size(statistics.bytes_sent)))
+        sys.stdout.write("Files skipped: %d (%s)\n" % (statistics.files_skipped,
+                                                         FileView.display_size(statistics.bytes_skipped)))
+        sys.stdout.write("Files bundled: %d in %d bundles\n" % (statistics.files_bundled, statistics.bundles_sent))
+        sys.stdout.write("Resumed from earlier transfers: %s\n" % FileView.display_size(statistics.bytes_resumed))
+        sys.stdout.write("Delta: %s matched, %s literal\n" % (FileView.display_size(statistics.delta_matched_bytes),
+                                                            FileView.display_size(statistics.delta_literal_bytes)))
+        sys.stdout.write("Deduplication: %s sent, %s skipped\n" % (FileView.display_size(statistics.dedup_sent_bytes),
+                                                                 FileView.display_size(statistics.dedup_skipped_bytes)))
+        StatisticsView.display_compression(statistics)
+        sys.stdout.write("Chunks sent: %d, retransmitted: %d\n" % (statistics.chunks_sent,
+                                                                   statistics.chunks_retransmitted))
+        sys.stdout.write("Scan: %d files in %d directories, %.3f s\n" % (statistics.files_scanned,
+                                                                       statistics.directories_scanned,
+                                                                       statistics.scan_time))
+        sys.stdout.write("Prehash: %d files, %.3f s\n" % (statistics.files_hashed, statistics.hash_time))
+        StatisticsView.display_read_ahead(statistics)
+        sys.stdout.write("Window size: %d, stripes: %d\n" % (statistics.window_size, statistics.stripes))
+        sys.stdout.write("Elapsed time: %s\n" % StatisticsView.display_elapsed_time(statistics))
+
+    @staticmethod
+    def display_compression(statistics: Statistics) -> None:
+        if not statistics.compressed_files:
+            return
+
+        for name, input_size, output_size, compression_time in statistics.compressed_files:
+            sys.stdout.write("Compression of %s: ratio %.2f, %.3f s CPU\n" % (FileView.display_name(name),
+                                                                            input_size / max(output_size, 1),
+                                                                            compression_time))
+
+        input_size = sum(compressed_file[1] for compressed_file in statistics.compressed_files)
+        output_size = sum(compressed_file[2] for compressed_file in statistics.compressed_files)
+
+        sys.stdout.write("Compression: %s to %s, %.3f s CPU\n" % (FileView.display_size(input_size),
+                                                                   FileView.display_size(output_size),
+                                                                   sum(compressed_file[3] for compressed_file
+                                                                       in statistics.compressed_files)))
+
+    @staticmethod
+    def display_read_ahead(statistics: Statistics) -> None:
+        if statistics.read_ahead_chunks == 0:
+            return
+
+        sys.stdout.write("Read-ahead: %.1f of %d chunks queued, sender stalled %.3f s, reader stalled %.3f s\n" % (
+            statistics.read_ahead_depth / statistics.read_ahead_chunks,
+            statistics.read_ahead_size,
+            statistics.read_ahead_sender_stall_time,
+            statistics.read_ahead_reader_stall_time))
+
+    @staticmethod
+    def display_elapsed_time(statistics: Statistics) -> str:
+        if statistics.start_time is None or statistics.end_time is None:
+            return "Unknown"
+
+        return str(statistics.end_time - statistics.start_time)
@@ -1,5 +1,7 @@
 import socket
 
+from client.network.protocol.protocol import Protocol
+
 
 class Client:
 
@@ -10,14 +12,63 @@ class Client:
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.socket.settimeout(5)
 
+        self.buffer = bytearray()
+
     def connect(self):
         self.socket.connect((self.ip_address, self.port))
 
     def send(self, data: bytes) -> None:
-        self.socket.send(data)
+        self.socket.sendall(data)
+
+    def send_buffers(self, buffers: list) -> None:
+        # Gathered by the kernel instead of being joined into a single packet first
+        if not hasattr(self.socket, "sendmsg"):
+            self.socket.sendall(b"".join(buffers))
+            return
+
+        views = [memoryview(buffer).cast("B") for buffer in buffers if len(buffer) > 0]
+
+        while views:
+            sent_size = self.socket.sendmsg(views)
+
+            while views and sent_size >= len(views[0]):
+                sent_size -= len(views[0])
+                views.pop(0)
+
+            if sent_size > 0:
+                views[0] = views[0][sent_size:]
+
+    def send_data_frame(self, chunk_number: int, chunk_data: bytes, chunk_digest: bytes, version=1,
+                        compressed=False, raw=False) -> None:
+        if raw and not compressed:
+            self.send_buffers([Protocol.send_raw_data_frame_header(chunk_number, len(chunk_data), chunk_digest),
+                               chunk_data])
+            return
+
+        self.send_buffers([Protocol.send_data_frame_header(chunk_number,
+                                                           len(chunk_data),
+                                                           chunk_digest,
+                                                           version,
+                                                           compressed),
+                           chunk_data])
 
     def receive(self) -> bytes:
-        return self.socket.recv(1024)
+        while True:
+            if len(self.buffer) > 0:
+                packet_size = Protocol.get_packet_size(self.buffer)
+
+                if packet_size is not None and len(self.buffer) >= packet_size:
+                    packet = bytes(self.buffer[:packet_size])
+                    del self.buffer[:packet_size]
+
+                    return packet
+
+            data = self.socket.recv(65536)
+
+            if not data:
+                raise ConnectionResetError("Connection closed by server")
+
+            self.buffer.extend(data)
 
     def disconnect(self):
         self.socket.close()
@@ -2,17 +2,58 @@ import struct
 import json
 import binascii
 
-from typing import Tuple
+from typing import List, Tuple, Optional, Iterable
 
 from client.errors.network_errors import *
 
 
 class Protocol:
 
+    VERSION = 2
+    DATA_FRAME_VERSIONS = (1, 2)
+    DATA_FRAME_HEADER_FORMATS = {1: "<BIIB",  # Version, chunk number, data size, digest size
+                                 2: "<BIIBB"}  # Version 1 header followed by the compressed flag
+    RAW_DATA_FRAME_HEADER_FORMAT = "<IIB"  # Chunk number, data size following the frame, digest size
+    CHUNK_ACKNOWLEDGEMENT_FORMAT = "<II?"  # Chunk number, last contiguous chunk, chunk confirmed
+    SIGNATURE_FORMAT = "<I16s"  # Rolling checksum, strong checksum of a block
+    DELTA_COPY_FORMAT = "<BII"  # 0x00, first block, blocks count
+    DELTA_LITERAL_FORMAT = "<BI"  # 0x01, data size, followed by the data
+    CHUNK_OFFER_FORMAT = "<32sI"  # sha256 digest, size of a content defined chunk
+    CHUNK_SIZE_CHANGE_FORMAT = "<II"  # First chunk sent with the new chunk size, chunk size in Ko
+    BUNDLE_MAX_SIZE = 2**20  # Content size from which a bundle of small files is sent
+    MANIFEST_BATCH_SIZE = 10000  # Files listed by a sync manifest frame, larger manifests are sent in several frames
+
     @staticmethod
     def extract_packet_code(data: bytes) -> Tuple[int, bytes]:
         return data[0], data[1:]
 
+    @staticmethod
+    def get_packet_size(data: bytes) -> Optional[int]:
+        code = data[0]
+
+        if code == 0x01:
+            # The chunk size packet length depends on the server version, nothing follows it until we speak
+            if len(data) < 5:
+                return None
+
+            return len(data)
+        elif code in (0x02, 0x03, 0x04):
+            return 2
+        elif code in (0x05, 0x07, 0x08, 0x09, 0x0A, 0x0B):
+            if len(data) < 5:
+                return None
+
+            return 5 + Protocol.bytes_to_unsigned_int(data[1:5])
+        elif code == 0x06:
+            return 1 + struct.calcsize(Protocol.CHUNK_ACKNOWLEDGEMENT_FORMAT)
+        elif code == 0x0C:
+            if len(data) < 5:
+                return None
+
+            return 5 + Protocol.bytes_to_unsigned_int(data[1:5])  # One result byte per bundled file
+
+        raise InvalidPacket(code)
+
     @staticmethod
     def unpack(data_format: str, data: bytes):
         if len(data_format) == 1:
@@ -35,6 +76,19 @@ class Protocol:
     def bytes_to_bool(data) -> bool:
         return Protocol.unpack("?", data)
 
+    @staticmethod
+    def file_options(name: str, size: int, checksum: str, chunk_size: int = None,
+                     modification_time: int = None) -> dict:
+        file = {"name": name, "size": size, "checksum": checksum}
+
+        if chunk_size is not None:  # Chunk size in Ko picked for this file in the negotiated range
+            file["chunk_size"] = chunk_size
+
+        if modification_time is not None:  # Source modification time in ns the transfer progress is tied to
+            file["modification_time"] = modification_time
+
+        return file
+
     @staticmethod
     def send_create_new_directory(name: str) -> bytearray:
         code = 0x01
@@ -46,12 +100,12 @@ class Protocol:
         return data
 
     @staticmethod
-    def send_create_new_file(name: str, size: int, checksum: str) -> bytearray:
+    def send_create_new_file(name: str, size: int, checksum: str, chunk_size: int = None) -> bytearray:
         code = 0x02
         data = bytearray()
         data.append(code)
 
-        file = {"name": name, "size": size, "checksum": checksum}
+        file = Protocol.file_options(name, size, checksum, chunk_size)
 
         file_data = Protocol.string_to_bytes(json.dumps(file))
         data.extend(file_data)
@@ -80,12 +134,52 @@ class Protocol:
         return data
 
     @staticmethod
-    def send_end_of_file(name: str) -> bytearray:
+    def send_data_frame_header(chunk_number: int, chunk_size: int, chunk_digest: bytes, version=1,
+                               compressed=False) -> bytearray:
+        # Everything of a data frame but the chunk data, which can be sent from its own buffer
+        code = 0x08
+        data = bytearray()
+        data.append(code)
+
+        header_fields = [version, chunk_number, chunk_size, len(chunk_digest)]
+
+        if version >= 2:
+            header_fields.append(compressed)
+
+        header = struct.pack(Protocol.DATA_FRAME_HEADER_FORMATS[version], *header_fields)
+
+        data.extend(struct.pack("I", len(header) + len(chunk_digest) + chunk_size))
+        data.extend(header)
+        data.extend(chunk_digest)
+
+        return data
+
+    @staticmethod
+    def send_raw_data_frame_header(chunk_number: int, chunk_size: int, chunk_digest: bytes) -> bytearray:
+        # The chunk data is not part of the length prefixed frame, the server can move it straight into the file
+        code = 0x13
+        data = bytearray()
+        data.append(code)
+
+        header = struct.pack(Protocol.RAW_DATA_FRAME_HEADER_FORMAT, chunk_number, chunk_size, len(chunk_digest))
+
+        data.extend(struct.pack("I", len(header) + len(chunk_digest)))
+        data.extend(header)
+        data.extend(chunk_digest)
+
+        return data
+
+    @staticmethod
+    def send_end_of_file(name: str, checksum: str = None) -> bytearray:
         code = 0x04
         data = bytearray()
 
         data.append(code)
-        data.extend(Protocol.string_to_bytes(name))
+
+        if checksum is None:
+            data.extend(Protocol.string_to_bytes(name))
+        else:  # Whole file checksum computed while sending the file
+            data.extend(Protocol.string_to_bytes(json.dumps({"name": name, "checksum": checksum})))
 
         return data
 
@@ -110,13 +204,234 @@ class Protocol:
         return data
 
     @staticmethod
-    def receive_chunk_size(data: bytes) -> int:
+    def send_hello(options: dict) -> bytearray:
+        code = 0x07
+        data = bytearray()
+
+        data.append(code)
+        data.extend(Protocol.string_to_bytes(json.dumps(options)))
+
+        return data
+
+    @staticmethod
+    def send_create_session(name: str, size: int, checksum: str, chunk_size: int = None) -> bytearray:
+        code = 0x09
+        data = bytearray()
+
+        data.append(code)
+        data.extend(Protocol.string_to_bytes(json.dumps(Protocol.file_options(name, size, checksum, chunk_size))))
+
+        return data
+
+    @staticmethod
+    def send_join_session(session_id: str) -> bytearray:
+        code = 0x0A
+        data = bytearray()
+
+        data.append(code)
+        data.extend(Protocol.string_to_bytes(json.dumps({"session_id": session_id})))
+
+        return data
+
+    @staticmethod
+    def send_resume_file(name: str, size: int, checksum: str, chunk_size: int = None,
+                         modification_time: int = None) -> bytearray:
+        code = 0x0B
+        data = bytearray()
+
+        data.append(code)
+        data.extend(Protocol.string_to_bytes(json.dumps(Protocol.file_options(name, size, checksum, chunk_size,
+                                                                              modification_time))))
+
+        return data
+
+    @staticmethod
+    def send_delta_request(name: str, size: int, checksum: str) -> bytearray:
+        code = 0x0C
+        data = bytearray()
+
+        data.append(code)
+        data.extend(Protocol.string_to_bytes(json.dumps({"name": name, "size": size, "checksum": checksum})))
+
+        return data
+
+    @staticmethod
+    def send_delta_instructions(instructions: bytes) -> bytearray:
+        code = 0x0D
+        data = bytearray()
+
+        data.append(code)
+        data.extend(struct.pack("I", len(instructions)))
+        data.extend(instructions)
+
+        return data
+
+    @staticmethod
+    def send_chunk_offer(name: str, size: int, checksum: str, chunks: List[Tuple[bytes, int]]) -> bytearray:
+        code = 0x0E
+        data = bytearray()
+        data.append(code)
+
+        file_data = Protocol.string_to_bytes(json.dumps({"name": name, "size": size, "checksum": checksum}))
+        chunks_data = b"".join(struct.pack(Protocol.CHUNK_OFFER_FORMAT, digest, chunk_size)
+                               for digest, chunk_size in chunks)
+
+        data.extend(struct.pack("I", len(file_data) + len(chunks_data)))
+        data.extend(file_data)
+        data.extend(chunks_data)
+
+        return data
+
+    @staticmethod
+    def send_stored_chunk(chunk_number: int, chunk_data: bytes) -> bytearray:
+        code = 0x0F
+        data = bytearray()
+
+        data.append(code)
+        data.extend(struct.pack("II", len(chunk_data) + 4, chunk_number))
+        data.extend(chunk_data)
+
+        return data
+
+    @staticmethod
+    def send_chunk_size_change(first_chunk: int, chunk_size: int) -> bytearray:
+        code = 0x14
+        data = bytearray()
+
+        data.append(code)
+        data.extend(struct.pack("I", struct.calcsize(Protocol.CHUNK_SIZE_CHANGE_FORMAT)))
+        data.extend(struct.pack(Protocol.CHUNK_SIZE_CHANGE_FORMAT, first_chunk, chunk_size))
+
+        return data
+
+    @staticmethod
+    def send_sync_manifest(entries: Iterable[tuple]) -> bytearray:
+        code = 0x10
+        data = bytearray()
+
+        data.append(code)
+        data.extend(Protocol.string_to_bytes(json.dumps({"files": list(entries)}, separators=(",", ":"))))
+
+        return data
+
+    @staticmethod
+    def send_bundle(files: List[Tuple[str, str, bytes]]) -> bytearray:
+        code = 0x11
+        data = bytearray()
+        data.append(code)
+
+        files_data = Protocol.string_to_bytes(json.dumps({"files": [{"name": name, "size": len(file_data),
+                                                                     "checksum": checksum}
+                                                                    for name, checksum, file_data in files]}))
+
+        data.extend(struct.pack("I", len(files_data) + sum(len(file_data) for _, _, file_data in files)))
+        data.extend(files_data)
+
+        for _, _, file_data in files:
+            data.extend(file_data)
+
+        return data
+
+    @staticmethod
+    def send_directory_tree(directories: List[Tuple[int, str]]) -> bytearray:
+        code = 0x12
+        data = bytearray()
+
+        data.append(code)
+        data.extend(Protocol.string_to_bytes(json.dumps({"directories": directories}, separators=(",", ":"))))
+
+        return data
+
+    @staticmethod
+    def receive_chunk_size(data: bytes) -> Tuple[int, int]:
         code, packet_data = Protocol.extract_packet_code(data)
 
         if code != 0x01:
             raise InvalidPacket(code)
 
-        return Protocol.bytes_to_unsigned_int(packet_data)
+        chunk_size = Protocol.bytes_to_unsigned_int(packet_data)
+
+        if len(packet_data) > 4:  # Servers speaking version 2 or later append their protocol version
+            return chunk_size, packet_data[4]
+
+        return chunk_size, 1
+
+    @staticmethod
+    def receive_hello(data: bytes) -> dict:
+        code, packet_data = Protocol.extract_packet_code(data)
+
+        if code != 0x05:
+            raise InvalidPacket(code)
+
+        length = Protocol.bytes_to_unsigned_int(packet_data)
+
+        return json.loads(packet_data[4:4+length].decode("utf-8"))
+
+    @staticmethod
+    def receive_resume(data: bytes) -> dict:
+        code, packet_data = Protocol.extract_packet_code(data)
+
+        if code != 0x08:
+            raise InvalidPacket(code)
+
+        length = Protocol.bytes_to_unsigned_int(packet_data)
+
+        return json.loads(packet_data[4:4+length].decode("utf-8"))
+
+    @staticmethod
+    def receive_signatures(data: bytes) -> Tuple[int, bytes]:
+        code, packet_data = Protocol.extract_packet_code(data)
+
+        if code != 0x09:
+            raise InvalidPacket(code)
+
+        length = Protocol.bytes_to_unsigned_int(packet_data)
+
+        return Protocol.bytes_to_unsigned_int(packet_data[4:]), packet_data[8:4+length]
+
+    @staticmethod
+    def receive_missing_chunks(data: bytes) -> List[int]:
+        code, packet_data = Protocol.extract_packet_code(data)
+
+        if code != 0x0A:
+            raise InvalidPacket(code)
+
+        length = Protocol.bytes_to_unsigned_int(packet_data)
+
+        return list(struct.unpack("%dI" % (length // 4), packet_data[4:4+length]))
+
+    @staticmethod
+    def receive_needed_files(data: bytes) -> List[int]:
+        code, packet_data = Protocol.extract_packet_code(data)
+
+        if code != 0x0B:
+            raise InvalidPacket(code)
+
+        length = Protocol.bytes_to_unsigned_int(packet_data)
+
+        return list(struct.unpack("%dI" % (length // 4), packet_data[4:4+length]))
+
+    @staticmethod
+    def receive_bundle_results(data: bytes) -> List[bool]:
+        code, packet_data = Protocol.extract_packet_code(data)
+
+        if code != 0x0C:
+            raise InvalidPacket(code)
+
+        length = Protocol.bytes_to_unsigned_int(packet_data)
+
+        return list(struct.unpack("%d?" % length, packet_data[4:4+length]))
+
+    @staticmethod
+    def receive_session(data: bytes) -> dict:
+        code, packet_data = Protocol.extract_packet_code(data)
+
+        if code != 0x07:
+            raise InvalidPacket(code)
+
+        length = Protocol.bytes_to_unsigned_int(packet_data)
+
+        return json.loads(packet_data[4:4+length].decode("utf-8"))
 
     @staticmethod
     def receive_confirmation_packet(data: bytes) -> bool:
@@ -134,7 +449,7 @@ class Protocol:
         if code != 0x03:
             raise InvalidPacket(code)
 
-        return Protocol.bytes_to_bool(data)
+        return Protocol.bytes_to_bool(packet_data)
 
     @staticmethod
     def receive_file_integrity_confirmation(data: bytes) -> bool:
@@ -143,4 +458,13 @@ class Protocol:
         if code != 0x04:
             raise InvalidPacket(code)
 
-        return Protocol.bytes_to_bool(data)
+        return Protocol.bytes_to_bool(packet_data)
+
+    @staticmethod
+    def receive_chunk_acknowledgement(data: bytes) -> Tuple[int, int, bool]:
+        code, packet_data = Protocol.extract_packet_code(data)
+
+        if code != 0x06:
+            raise InvalidPacket(code)
+
+        return Protocol.unpack(Protocol.CHUNK_ACKNOWLEDGEMENT_FORMAT, packet_data)
@@ -11,11 +11,14 @@ class Configuration:
         if configuration_path is not None and os.path.exists(configuration_path):
             os.chdir(configuration_path)
 
-    def read_config(self, section, option=None):
+    def read_config(self, section, option=None, fallback=None):
         self.__config.read(self.__configuration_name)
 
         if option is not None:
             if self.__config.has_option(section, option):
                 return self.__config[section][option]
 
+            if fallback is not None:
+                return fallback
+
         return dict(self.__config.items(section))
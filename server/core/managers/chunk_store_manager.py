@@ -0,0 +1,173 @@
+import os
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from typing import List, Optional, Tuple
+
+from server.core.models.file import File
+
+
+class ChunkStoreManager:
+    """Content addressed store of file chunks shared by every connection of a server.
+
+    Chunks are appended to pack files and indexed by their sha256 digest in a sqlite database. Complete files are
+    also kept named after their recipe (the digest of their chunk digests) to copy identical files at once. They are
+    copies rather than hardlinks, so that setting the modification time of a destination file or editing it leaves
+    the store and the other destinations alone; file systems supporting reflinks still share their extents.
+    """
+
+    def __init__(self, path: str, pack_size=2**30):
+        self.path = path
+        self.pack_size = pack_size
+
+        os.makedirs(os.path.join(path, "packs"), exist_ok=True)
+        os.makedirs(os.path.join(path, "files"), exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(os.path.join(path, "index.sqlite"), check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS chunks "
+                                "(digest BLOB PRIMARY KEY, pack INTEGER, offset INTEGER, length INTEGER)")
+        self.connection.commit()
+
+        self.pack_number = self.connection.execute("SELECT COALESCE(MAX(pack), 0) FROM chunks").fetchone()[0]
+        self.pack = open(self.get_pack_path(self.pack_number), "ab")
+
+    def get_pack_path(self, pack_number: int) -> str:
+        return os.path.join(self.path, "packs", "pack-%06d" % pack_number)
+
+    def get_file_path(self, recipe_id: str) -> str:
+        return os.path.join(self.path, "files", recipe_id)
+
+    @staticmethod
+    def get_recipe_id(recipe: List[Tuple[bytes, int]]) -> str:
+        return hashlib.sha256(b"".join(digest for digest, _ in recipe)).hexdigest()
+
+    def get_location(self, digest: bytes) -> Optional[Tuple[int, int, int]]:
+        with self.lock:
+            return self.connection.execute("SELECT pack, offset, length FROM chunks WHERE digest = ?",
+                                           (digest,)).fetchone()
+
+    def get_missing_chunks(self, recipe: List[Tuple[bytes, int]]) -> List[int]:
+        missing_chunks = list()
+        offered_digests = set()
+
+        for chunk_number, (digest, _) in enumerate(recipe):
+            if digest not in offered_digests and self.get_location(digest) is None:
+                missing_chunks.append(chunk_number)
+
+            offered_digests.add(digest)
+
+        return missing_chunks
+
+    def add_chunk(self, digest: bytes, data: bytes) -> None:
+        with self.lock:
+            if self.connection.execute("SELECT 1 FROM chunks WHERE digest = ?", (digest,)).fetchone() is not None:
+                return
+
+            if self.pack.tell() >= self.pack_size:
+                self.pack.close()
+                self.pack_number += 1
+                self.pack = open(self.get_pack_path(self.pack_number), "ab")
+
+            offset = self.pack.tell()
+            self.pack.write(data)
+
+            self.connection.execute("INSERT INTO chunks VALUES (?, ?, ?, ?)",
+                                    (digest, self.pack_number, offset, len(data)))
+
+    def commit(self) -> None:
+        with self.lock:
+            self.pack.flush()
+            os.fsync(self.pack.fileno())
+            self.connection.commit()
+
+    def copy_stored_file(self, file: File) -> bool:
+        stored_path = self.get_file_path(ChunkStoreManager.get_recipe_id(file.recipe))
+
+        if not os.path.exists(stored_path):
+            return False
+
+        file.close()
+        file.open("wb")
+
+        try:
+            with open(stored_path, "rb") as stored_file:
+                ChunkStoreManager.copy_range(stored_file, 0, os.fstat(stored_file.fileno()).st_size, file.file)
+        except OSError:  # Copied from the chunks instead
+            return False
+        finally:
+            file.close()
+
+        return True
+
+    def materialize(self, file: File) -> bool:
+        if self.copy_stored_file(file):
+            return True
+
+        file.close()
+        file.open("wb")
+        destination = file.file
+        destination.flush()
+
+        try:
+            for digest, _ in file.recipe:
+                location = self.get_location(digest)
+
+                if location is None:
+                    return False
+
+                pack_number, offset, length = location
+
+                with open(self.get_pack_path(pack_number), "rb") as pack:
+                    ChunkStoreManager.copy_range(pack, offset, length, destination)
+        finally:  # Closed on a missing chunk as well, the file is then removed
+            file.close()
+
+        return True
+
+    @staticmethod
+    def copy_range(source, offset: int, length: int, destination) -> None:
+        if hasattr(os, "copy_file_range"):  # Done by the kernel, shares extents on file systems supporting reflinks
+            try:
+                while length > 0:
+                    copied = os.copy_file_range(source.fileno(), destination.fileno(), length, offset)
+
+                    if copied == 0:
+                        break
+
+                    offset += copied
+                    length -= copied
+
+                return
+            except OSError:
+                pass
+
+        source.seek(offset)
+
+        while length > 0:
+            data = source.read(min(length, 2**20))
+
+            if not data:
+                break
+
+            destination.write(data)
+            length -= len(data)
+
+        destination.flush()
+
+    def add_file(self, file: File) -> None:
+        stored_path = self.get_file_path(ChunkStoreManager.get_recipe_id(file.recipe))
+
+        if os.path.exists(stored_path):
+            return
+
+        stored_file = tempfile.NamedTemporaryFile(dir=os.path.dirname(stored_path), delete=False)
+
+        try:
+            with open(file.path, "rb") as source, stored_file:
+                ChunkStoreManager.copy_range(source, 0, os.fstat(source.fileno()).st_size, stored_file)
+
+            os.replace(stored_file.name, stored_path)  # Complete or absent for the other connections
+        except OSError:
+            os.remove(stored_file.name)
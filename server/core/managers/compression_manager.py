@@ -0,0 +1,47 @@
+import zlib
+import lzma
+from typing import List, Optional
+
+from server.errors.file_errors import *
+
+
+def zlib_decompress(data, max_size: int) -> bytes:
+    decompressor = zlib.decompressobj()
+    decompressed_data = decompressor.decompress(data, max_size)
+
+    if decompressor.unconsumed_tail or not decompressor.eof:
+        raise InvalidCompressedChunk
+
+    return decompressed_data
+
+
+def lzma_decompress(data, max_size: int) -> bytes:
+    decompressor = lzma.LZMADecompressor()
+    decompressed_data = decompressor.decompress(data, max_size)
+
+    if not decompressor.eof:
+        raise InvalidCompressedChunk
+
+    return decompressed_data
+
+
+class CompressionManager:
+    """Registry of the codecs compressed chunks can be negotiated with, by name in the client order of preference."""
+
+    CODECS = {"zlib": zlib_decompress,
+              "lzma": lzma_decompress}
+
+    @staticmethod
+    def select(proposed_codecs: List[str]) -> Optional[str]:
+        for codec in proposed_codecs:
+            if codec in CompressionManager.CODECS:
+                return codec
+
+        return None
+
+    @staticmethod
+    def decompress(codec: str, data, max_size: int) -> bytes:
+        try:
+            return CompressionManager.CODECS[codec](data, max_size)  # Output beyond a chunk is never inflated
+        except (zlib.error, lzma.LZMAError):
+            raise InvalidCompressedChunk
@@ -0,0 +1,66 @@
+import zlib
+import struct
+import hashlib
+
+from server.core.models.file import File
+from server.core.managers.file_manager import FileManager
+from server.network.protocol import Protocol
+from server.errors.file_errors import *
+
+
+class DeltaManager:
+
+    @staticmethod
+    def get_block_size(size: int) -> int:
+        # Square root of the size like rsync, so that signatures stay small for very large files
+        return max(2048, int(size ** 0.5) // 64 * 64)
+
+    @staticmethod
+    def get_signatures(path: str, block_size: int) -> bytearray:
+        signatures = bytearray()
+
+        with open(path, "rb") as basis:
+            for block in iter(lambda: basis.read(block_size), b""):
+                if len(block) < block_size:  # The client only matches full blocks
+                    break
+
+                signatures.extend(struct.pack(Protocol.SIGNATURE_FORMAT,
+                                              zlib.adler32(block),
+                                              hashlib.md5(block).digest()))
+
+        return signatures
+
+    @staticmethod
+    def apply_instructions(file: File, instructions: memoryview) -> None:
+        copy_size = struct.calcsize(Protocol.DELTA_COPY_FORMAT)
+        literal_size = struct.calcsize(Protocol.DELTA_LITERAL_FORMAT)
+        offset = 0
+
+        while offset < len(instructions):
+            if instructions[offset] == 0x00:
+                _, first_block, blocks_count = struct.unpack_from(Protocol.DELTA_COPY_FORMAT, instructions, offset)
+                offset += copy_size
+
+                DeltaManager.copy_blocks(file, first_block, blocks_count)
+            elif instructions[offset] == 0x01:
+                _, length = struct.unpack_from(Protocol.DELTA_LITERAL_FORMAT, instructions, offset)
+                offset += literal_size
+
+                FileManager.append(file, instructions[offset:offset+length])
+                offset += length
+            else:
+                raise InvalidDeltaInstruction
+
+    @staticmethod
+    def copy_blocks(file: File, first_block: int, blocks_count: int) -> None:
+        file.basis.seek(first_block * file.basis_block_size)
+        remaining_size = blocks_count * file.basis_block_size
+
+        while remaining_size > 0:
+            data = file.basis.read(min(remaining_size, file.chunk_size))
+
+            if not data:
+                raise InvalidDeltaInstruction
+
+            FileManager.append(file, data)
+            remaining_size -= len(data)
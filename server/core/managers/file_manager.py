@@ -1,26 +1,42 @@
-import hashlib
+import os
+import json
 
 from server.core.models.file import File
+from server.core.managers.hash_manager import HashManager
+from server.core.models.session import Session
+from server.core.models.chunk_stream import ChunkStream
 from server.errors.file_errors import *
 
 
 class FileManager:
 
     @staticmethod
-    def is_chunk_checksum_match(data: bytes, checksum: str) -> bool:
-        checksum_function = hashlib.md5()
+    def is_chunk_checksum_match(data: bytes, checksum, algorithm=HashManager.DEFAULT_ALGORITHM) -> bool:
+        checksum_function = HashManager.new(algorithm)
 
         checksum_function.update(data)
+
+        if isinstance(checksum, bytes):  # Raw digest from a binary data frame
+            return checksum == checksum_function.digest()
+
         expected_checksum = checksum_function.hexdigest()
 
         return checksum == expected_checksum
 
     @staticmethod
-    def is_file_checksum_match(file: File) -> bool:
+    def is_file_checksum_match(file: File, from_disk=False) -> bool:
+        try:
+            file.flush()
+        except IOError:  # Chunks the writer threads could not write
+            return False
+
+        if not from_disk and file.hashed_size == file.size:  # Every byte went through the running checksum
+            return file.checksum == file.checksum_function.hexdigest()
+
         if file.is_file_opened():
             file.close()
 
-        checksum_function = hashlib.md5()
+        checksum_function = HashManager.new(file.hash_algorithm)
 
         file.open("rb")
 
@@ -30,15 +46,294 @@ class FileManager:
         return file.checksum == checksum_function.hexdigest()
 
     @staticmethod
-    def write_new_chunk(file: File, chunk_number: int, chunk_data: bytes, chunk_checksum: str):
-        if chunk_number != file.current_chunk + 1:
+    def is_chunk_expected(file: File, chunk_number: int, window_size: int = 0) -> bool:
+        if window_size == 0:
+            if chunk_number != file.current_chunk + 1:
+                raise InvalidChunkNumber
+
+            return True
+
+        if chunk_number <= file.current_chunk or chunk_number in file.received_chunks:
+            return False  # Retransmission of a chunk already written
+
+        if chunk_number > file.current_chunk + window_size:
             raise InvalidChunkNumber
 
-        if not FileManager.is_chunk_checksum_match(chunk_data, chunk_checksum):
+        return True
+
+    @staticmethod
+    def is_session_chunk_expected(session: Session, chunk_number: int) -> bool:
+        if session.closed or not 1 <= chunk_number <= session.chunks_count:
+            raise InvalidChunkNumber
+
+        with session.lock:
+            return not (chunk_number <= session.file.current_chunk or chunk_number in session.file.received_chunks)
+
+    @staticmethod
+    def write_new_chunk(file: File, chunk_number: int, chunk_data: bytes, chunk_checksum, written=False):
+        FileManager.is_chunk_expected(file, chunk_number)
+
+        if not FileManager.is_chunk_checksum_match(chunk_data, chunk_checksum, file.chunk_hash_algorithm):
             raise ChecksumDoesNotMatch
 
         if not file.is_file_opened():
             file.open()
 
-        file.write(chunk_data)
+        FileManager.update_checksum(file, file.get_chunk_offset(chunk_number), chunk_data)
+
+        if not written:  # Chunks of raw data frames are written to the file before being checked
+            file.write_at(file.get_chunk_offset(chunk_number), chunk_data)
+
         file.current_chunk += 1
+
+    @staticmethod
+    def write_window_chunk(file: File, chunk_number: int, chunk_data: bytes, chunk_checksum, window_size: int,
+                           written=False):
+        if not FileManager.is_chunk_expected(file, chunk_number, window_size):
+            return
+
+        if not FileManager.is_chunk_checksum_match(chunk_data, chunk_checksum, file.chunk_hash_algorithm):
+            raise ChecksumDoesNotMatch
+
+        FileManager.update_checksum(file, file.get_chunk_offset(chunk_number), chunk_data, window_size)
+
+        if not written:
+            file.write_at(file.get_chunk_offset(chunk_number), chunk_data)
+
+        FileManager.add_received_chunk(file, chunk_number)
+
+    @staticmethod
+    def write_session_chunk(session: Session, chunk_number: int, chunk_data: bytes, chunk_checksum, written=False):
+        file = session.file
+
+        if not FileManager.is_session_chunk_expected(session, chunk_number):
+            return
+
+        if not FileManager.is_chunk_checksum_match(chunk_data, chunk_checksum, file.chunk_hash_algorithm):
+            raise ChecksumDoesNotMatch
+
+        if not written:
+            file.write_at(file.get_chunk_offset(chunk_number), chunk_data)
+
+        with session.lock:
+            FileManager.add_received_chunk(file, chunk_number)
+
+    @staticmethod
+    def change_chunk_size(file: File, first_chunk: int, chunk_size: int) -> None:
+        # Only chunks that were not received yet can change size, the received ones keep their offsets
+        if (first_chunk <= max(file.current_chunk, file.chunk_segments[-1][0], *file.received_chunks) or
+                file.get_chunk_offset(first_chunk) >= file.size):
+            raise InvalidChunkNumber
+
+        file.set_chunk_size(first_chunk, chunk_size * 1000)
+
+    @staticmethod
+    def write_chunk_stream(chunk_stream: ChunkStream, data) -> None:
+        if chunk_stream.file is not None:  # Dropped otherwise
+            # Written before the chunk digest is checked: kept out of the writer threads, which could write a rejected
+            # chunk after its retransmission
+            chunk_stream.file.write_through(chunk_stream.offset + chunk_stream.received_size, data)
+            chunk_stream.checksum_function.update(data)
+
+            if chunk_stream.file_checksum_function is not None:
+                chunk_stream.file_checksum_function.update(data)
+
+        chunk_stream.received_size += len(data)
+
+    @staticmethod
+    def close_chunk_stream(chunk_stream: ChunkStream, session: Session = None) -> None:
+        file = chunk_stream.file
+
+        if chunk_stream.checksum != chunk_stream.checksum_function.digest():
+            raise ChecksumDoesNotMatch
+
+        if chunk_stream.file_checksum_function is not None and chunk_stream.offset == file.hashed_size:
+            file.checksum_function = chunk_stream.file_checksum_function
+            file.hashed_size += chunk_stream.size
+
+            FileManager.update_unhashed_chunks(file)
+
+        if session is None:
+            FileManager.add_received_chunk(file, chunk_stream.chunk_number)
+            return
+
+        with session.lock:
+            FileManager.add_received_chunk(file, chunk_stream.chunk_number)
+
+    @staticmethod
+    def add_received_chunk(file: File, chunk_number: int) -> None:
+        file.received_chunks.add(chunk_number)
+
+        while file.current_chunk + 1 in file.received_chunks:
+            file.received_chunks.remove(file.current_chunk + 1)
+            file.current_chunk += 1
+
+    @staticmethod
+    def update_checksum(file: File, offset: int, data: bytes, window_size: int = 0) -> None:
+        if offset == file.hashed_size:
+            file.checksum_function.update(data)
+            file.hashed_size += len(data)
+
+            FileManager.update_unhashed_chunks(file)
+        elif offset > file.hashed_size and len(file.unhashed_chunks) < window_size:
+            # Chunks written ahead are kept until the checksum reaches them, else it is computed from disk at the end
+            file.unhashed_chunks[offset] = bytes(data)
+
+    @staticmethod
+    def update_unhashed_chunks(file: File) -> None:
+        while file.hashed_size in file.unhashed_chunks:
+            data = file.unhashed_chunks.pop(file.hashed_size)
+
+            file.checksum_function.update(data)
+            file.hashed_size += len(data)
+
+    @staticmethod
+    def save_progress(file: File) -> None:
+        file.sync()
+
+        progress = {"size": file.size,
+                    "checksum": file.checksum,
+                    "modification_time": file.modification_time,
+                    "hash_algorithm": file.hash_algorithm,
+                    "chunk_size": file.chunk_size,
+                    "chunk_segments": file.chunk_segments,
+                    "current_chunk": file.current_chunk,
+                    "received_chunks": sorted(file.received_chunks),
+                    "hashed_size": file.hashed_size,
+                    "prefix_checksum": file.checksum_function.hexdigest()}
+
+        with open(file.progress_path + ".tmp", "w") as progress_file:
+            json.dump(progress, progress_file)
+            progress_file.flush()
+            os.fsync(progress_file.fileno())
+
+        os.replace(file.progress_path + ".tmp", file.progress_path)
+        file.saved_size = file.get_committed_size()
+
+    @staticmethod
+    def is_progress_due(file: File, interval: int) -> bool:
+        return 0 < interval <= file.get_committed_size() - file.saved_size
+
+    @staticmethod
+    def restore_progress(file: File, chunk_size_range: list = None) -> bool:
+        try:
+            with open(file.progress_path) as progress_file:
+                progress = json.load(progress_file)
+        except (OSError, ValueError):
+            return False
+
+        if (progress["size"], progress["checksum"]) != (file.size, file.checksum):
+            return False
+
+        # Without a checksum, a source changed since the progress was saved is only told apart by its modification time
+        if progress.get("modification_time") != file.modification_time:
+            return False
+
+        if progress.get("hash_algorithm", HashManager.DEFAULT_ALGORITHM) != file.hash_algorithm:
+            return False
+
+        # A client adapting its chunk size goes on with the chunk sizes the transfer was sent with
+        if progress["chunk_size"] != file.chunk_size and (
+                chunk_size_range is None or
+                not chunk_size_range[0] <= progress["chunk_size"] // 1000 <= chunk_size_range[1]):
+            return False
+
+        file.chunk_size = progress["chunk_size"]
+        file.chunk_segments = [tuple(segment) for segment in progress.get("chunk_segments",
+                                                                          [(1, 0, file.chunk_size)])]
+        file.current_chunk = progress["current_chunk"]
+        file.received_chunks = set(progress["received_chunks"])
+
+        # Checksum states cannot be persisted: rebuild the running checksum from the committed bytes on disk
+        file.checksum_function = HashManager.new(file.hash_algorithm)
+        file.hashed_size = 0
+        file.seek(0)
+
+        if not FileManager.hash_from_disk(file, progress["hashed_size"]):
+            return False
+
+        if file.checksum_function.hexdigest() != progress["prefix_checksum"]:
+            return False
+
+        if not FileManager.hash_from_disk(file, file.get_committed_size()):
+            return False
+
+        file.saved_size = file.get_committed_size()
+        file.seek(file.saved_size)
+
+        return True
+
+    @staticmethod
+    def hash_from_disk(file: File, size: int) -> bool:
+        while file.hashed_size < size:
+            data = file.read(min(file.chunk_size, size - file.hashed_size))
+
+            if not data:  # Partial file shorter than its saved progress
+                return False
+
+            file.checksum_function.update(data)
+            file.hashed_size += len(data)
+
+        return True
+
+    @staticmethod
+    def remove_progress(file: File) -> None:
+        try:
+            os.remove(file.progress_path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def append(file: File, data: bytes) -> None:
+        FileManager.update_checksum(file, file.hashed_size, data)
+        file.write(data)
+
+    @staticmethod
+    def commit(file: File) -> None:
+        file.close()
+
+        if file.final_path is not None:
+            os.replace(file.path, file.final_path)
+
+    @staticmethod
+    def write_bundled_file(path: str, data, checksum: str, algorithm: str) -> bool:
+        checksum_function = HashManager.new(algorithm)
+        checksum_function.update(data)
+
+        if checksum != checksum_function.hexdigest():
+            return False
+
+        temporary_path = File.get_temporary_path(path, ".bundle")
+
+        with open(temporary_path, "wb") as file_object:
+            file_object.write(data)
+
+        os.replace(temporary_path, path)  # Replace instead of truncating, the path may be a hardlink to a stored file
+
+        return True
+
+    @staticmethod
+    def is_synchronized(path: str, size: int, modification_time: int, checksum: str = None,
+                        algorithm=HashManager.DEFAULT_ALGORITHM) -> bool:
+        try:
+            file_stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+
+        if file_stat.st_size != size or os.path.exists(File.get_progress_path(path)):
+            return False
+
+        if checksum is None:
+            return file_stat.st_mtime_ns == modification_time
+
+        checksum_function = HashManager.new(algorithm)
+
+        with open(path, "rb") as file_object:
+            for chunk in iter(lambda: file_object.read(2**20), b""):
+                checksum_function.update(chunk)
+
+        return checksum == checksum_function.hexdigest()
+
+    @staticmethod
+    def set_modification_time(path: str, modification_time: int) -> None:
+        os.utime(path, ns=(modification_time, modification_time))
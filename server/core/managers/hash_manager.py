@@ -0,0 +1,49 @@
+import zlib
+import hashlib
+from typing import List, Optional
+
+
+class Crc32:
+    """hashlib-like wrapper of zlib.crc32, cheap enough to check every chunk."""
+
+    digest_size = 4
+
+    def __init__(self, value=0):
+        self.value = value
+
+    def update(self, data) -> None:
+        self.value = zlib.crc32(data, self.value)
+
+    def digest(self) -> bytes:
+        return self.value.to_bytes(4, "big")
+
+    def hexdigest(self) -> str:
+        return self.digest().hex()
+
+    def copy(self):
+        return Crc32(self.value)
+
+
+class HashManager:
+    """Registry of the hash algorithms that can be negotiated for chunks and whole files."""
+
+    ALGORITHMS = {"md5": hashlib.md5,
+                  "sha256": hashlib.sha256,
+                  "blake2b": lambda: hashlib.blake2b(digest_size=32),
+                  "blake2s": lambda: hashlib.blake2s(digest_size=16),
+                  "crc32": Crc32}
+
+    DEFAULT_ALGORITHM = "md5"  # Used with clients that do not negotiate an algorithm
+    FILE_ALGORITHMS = ("md5", "sha256", "blake2b", "blake2s")  # crc32 is too weak to identify a whole file
+
+    @staticmethod
+    def new(algorithm: str):
+        return HashManager.ALGORITHMS[algorithm]()
+
+    @staticmethod
+    def select(proposed_algorithms: List[str], supported_algorithms) -> Optional[str]:
+        for algorithm in proposed_algorithms:  # Client order of preference
+            if algorithm in supported_algorithms:
+                return algorithm
+
+        return None
@@ -0,0 +1,59 @@
+import uuid
+import threading
+from typing import Optional
+
+from server.core.models.file import File
+from server.core.models.session import Session
+
+
+class SessionManager:
+    """Registry of the striped transfer sessions shared by every connection of a server."""
+
+    def __init__(self):
+        self.sessions = dict()
+        self.lock = threading.Lock()
+
+    def create_session(self, file: File) -> Session:
+        chunks_count = -(-file.size // file.chunk_size)  # Ceiling division
+        session = Session(uuid.uuid4().hex, file, chunks_count)
+
+        with self.lock:
+            self.sessions[session.session_id] = session
+
+        return session
+
+    def get_session(self, session_id: str) -> Optional[Session]:
+        with self.lock:
+            return self.sessions.get(session_id)
+
+    def join_session(self, session_id: str) -> Optional[Session]:
+        session = self.get_session(session_id)
+
+        if session is None:
+            return None
+
+        with session.lock:
+            if session.closed:
+                return None
+
+            session.connections += 1
+
+        return session
+
+    def leave_session(self, session: Session) -> bool:
+        # True when the last connection left before the session was closed, its file is then abandoned
+        with session.lock:
+            session.connections -= 1
+            abandoned = session.connections == 0 and not session.closed
+
+        if abandoned:
+            self.close_session(session)
+
+        return abandoned
+
+    def close_session(self, session: Session) -> None:
+        with session.lock:
+            session.closed = True
+
+        with self.lock:
+            self.sessions.pop(session.session_id, None)
@@ -0,0 +1,109 @@
+import os
+import queue
+import threading
+
+from server.core.models.file import File
+
+
+class WriterManager:
+    """Pool of threads writing the received chunks of every connection of a server to disk.
+
+    Contiguous chunks of a file are gathered into buffers of buffer_size bytes, each written with a single positional
+    write. The queue of buffers is bounded: when the disk falls behind, the connections wait for it instead of
+    holding more data in memory.
+    """
+
+    def __init__(self, threads=4, queue_size=64, buffer_size=2**20, fsync_interval=0, fsync_on_close=False):
+        self.buffer_size = buffer_size
+        self.fsync_interval = fsync_interval  # Bytes written to a file between two fsync, 0 disables
+        self.fsync_on_close = fsync_on_close
+
+        self.buffers = queue.Queue(queue_size)
+        self.threads = [threading.Thread(target=self.write_buffers, daemon=True) for _ in range(threads)]
+
+        for thread in self.threads:
+            thread.start()
+
+    def write(self, file: File, offset: int, data) -> None:
+        buffers = list()
+
+        with file.write_condition:
+            WriterManager.raise_write_error(file)
+
+            if len(file.write_buffer) > 0 and (offset != file.write_buffer_offset + len(file.write_buffer) or
+                                               len(file.write_buffer) + len(data) > self.buffer_size):
+                buffers.append(WriterManager.take_buffer(file))
+
+            if len(file.write_buffer) == 0:
+                file.write_buffer_offset = offset
+
+            file.write_buffer.extend(data)  # The received data does not outlive the receive buffer, copy it now
+
+            if len(file.write_buffer) >= self.buffer_size:
+                buffers.append(WriterManager.take_buffer(file))
+
+        # Queued without holding the file lock, the writer threads need it to release the buffers they wrote
+        for buffer in buffers:
+            self.buffers.put(buffer)
+
+    def flush(self, file: File) -> None:
+        with file.write_condition:
+            buffer = WriterManager.take_buffer(file) if len(file.write_buffer) > 0 else None
+
+        if buffer is not None:
+            self.buffers.put(buffer)
+
+        with file.write_condition:
+            file.write_condition.wait_for(lambda: file.pending_writes == 0)
+            WriterManager.raise_write_error(file)
+
+    def close_file(self, file: File) -> None:
+        self.flush(file)
+
+        if self.fsync_on_close:
+            os.fsync(file.file.fileno())
+
+    @staticmethod
+    def take_buffer(file: File) -> tuple:
+        buffer = (file, file.write_buffer_offset, file.write_buffer)
+
+        file.write_buffer = bytearray()
+        file.pending_writes += 1
+
+        return buffer
+
+    @staticmethod
+    def raise_write_error(file: File) -> None:
+        if file.write_error is not None:
+            raise IOError(file.write_error)
+
+    def write_buffers(self) -> None:
+        while True:
+            file, offset, data = self.buffers.get()
+            error = None
+
+            try:
+                with memoryview(data) as data_view:
+                    written = 0
+
+                    while written < len(data_view):
+                        written += os.pwrite(file.file.fileno(), data_view[written:], offset + written)
+
+                with file.write_condition:
+                    file.unsynced_size += len(data)
+                    synchronize = 0 < self.fsync_interval <= file.unsynced_size
+
+                    if synchronize:
+                        file.unsynced_size = 0
+
+                if synchronize:
+                    os.fsync(file.file.fileno())
+            except OSError as exception:
+                error = exception
+
+            with file.write_condition:
+                if error is not None and file.write_error is None:
+                    file.write_error = error
+
+                file.pending_writes -= 1
+                file.write_condition.notify_all()
@@ -0,0 +1,34 @@
+from server.core.models.file import File
+from server.core.managers.hash_manager import HashManager
+
+
+class ChunkStream:
+    """Chunk of a data frame too large to be buffered, written to its file piece by piece as it is received.
+
+    The chunk digest is computed over the pieces on the way, as is the running checksum of the file when the chunk
+    follows its hashed bytes: the checksum is updated on a copy, kept only once the chunk digest matches.
+    """
+
+    def __init__(self, file: File, chunk_number: int, size: int, checksum: bytes, valid=True, hashed=True):
+        self.file = file  # None when the payload is dropped, either invalid or a retransmission
+        self.chunk_number = chunk_number
+        self.size = size
+        self.received_size = 0
+
+        self.valid = valid
+        self.checksum = checksum
+
+        self.offset = 0
+        self.checksum_function = None
+        self.file_checksum_function = None
+
+        if file is not None:
+            self.offset = file.get_chunk_offset(chunk_number)
+            self.checksum_function = HashManager.new(file.chunk_hash_algorithm)
+
+            # Chunks received ahead of the hashed bytes are not kept, the file is then checked from disk
+            if hashed and self.offset == file.hashed_size:
+                self.file_checksum_function = file.checksum_function.copy()
+
+    def is_complete(self) -> bool:
+        return self.received_size == self.size
@@ -1,19 +1,68 @@
+import os
+import threading
+
+from server.core.managers.hash_manager import HashManager
+
+
 class File:
 
-    def __init__(self, path, size, checksum, chunk_size):
+    __slots__ = ("path", "file", "size", "checksum", "chunk_size", "current_chunk", "received_chunks", "hash_algorithm",
+                 "chunk_hash_algorithm", "checksum_function", "hashed_size", "unhashed_chunks", "progress_path",
+                 "saved_size", "final_path", "basis", "basis_block_size", "recipe", "writer", "write_buffer",
+                 "write_buffer_offset", "write_condition", "pending_writes", "write_error", "unsynced_size",
+                 "chunk_segments", "modification_time")
+
+    def __init__(self, path, size, checksum, chunk_size, mode="wb",
+                 hash_algorithm=HashManager.DEFAULT_ALGORITHM, chunk_hash_algorithm=HashManager.DEFAULT_ALGORITHM,
+                 writer=None):
         self.path = path
         self.file = None
         self.size = size
         self.checksum = checksum
+        self.modification_time = None  # Client modification time in ns of the source, when it resumes transfers
 
-        self.chunk_size = chunk_size * 1000  # Chunk in Ko
+        self.chunk_size = chunk_size * 1000  # Chunk in Ko, of the first chunks when the client adapts it
+        self.chunk_segments = [(1, 0, self.chunk_size)]  # First chunk, offset and chunk size of each size change
         self.current_chunk = 0
+        self.received_chunks = set()  # Chunks written ahead of current_chunk in windowed mode
+
+        self.hash_algorithm = hash_algorithm
+        self.chunk_hash_algorithm = chunk_hash_algorithm
+
+        self.checksum_function = HashManager.new(hash_algorithm)  # Running checksum of the first hashed_size bytes
+        self.hashed_size = 0
+        self.unhashed_chunks = dict()  # Offset -> data of the chunks written ahead of hashed_size
+
+        self.progress_path = File.get_progress_path(path)
+        self.saved_size = 0
 
-        self.open()
+        self.final_path = None  # Set when the file is built under a temporary path
+        self.basis = None  # Existing copy the file is rebuilt from in delta mode
+        self.basis_block_size = 0
+
+        self.recipe = None  # (digest, size) of every chunk of a file built from the chunk store
+
+        self.writer = writer  # Writer threads the positional writes are handed to, written in place when None
+        self.write_buffer = bytearray()  # Contiguous data waiting to be handed to the writer
+        self.write_buffer_offset = 0
+        self.write_condition = threading.Condition()
+        self.pending_writes = 0  # Buffers handed to the writer and not written yet
+        self.write_error = None
+        self.unsynced_size = 0
+
+        self.open(mode)
 
     def __del__(self):
         self.close()
 
+    @staticmethod
+    def get_progress_path(path):
+        return File.get_temporary_path(path, ".partial")
+
+    @staticmethod
+    def get_temporary_path(path, suffix):
+        return os.path.join(os.path.dirname(path), "." + os.path.basename(path) + suffix)
+
     def is_file_opened(self):
         if self.file is None:
             return False
@@ -22,7 +71,11 @@ class File:
 
     def open(self, mode="wb"):
         if not self.is_file_opened():
-            self.file = open(self.path, mode)
+            if mode == "wb" and os.path.lexists(self.path):
+                os.remove(self.path)  # Replace instead of truncating, the path may be a hardlink to a stored file
+
+            # New files are readable as well, chunks written by the kernel are read back to be checked
+            self.file = open(self.path, "w+b" if mode == "wb" else mode)
 
     def write(self, data):
         if not self.is_file_opened():
@@ -33,13 +86,107 @@ class File:
         except IOError as error:
             raise IOError(error)
 
+    def write_at(self, offset, data):
+        if not self.is_file_opened():
+            self.open()
+
+        if self.writer is not None:
+            self.writer.write(self, offset, data)
+            return
+
+        self.write_through(offset, data)
+
+    def write_through(self, offset, data):
+        # Written in place even when the file has a writer, ranges written this way are not written by the writer
+        if not self.is_file_opened():
+            self.open()
+
+        try:
+            if hasattr(os, "pwrite"):  # Positional writes do not share the file position between connections
+                self.file.flush()
+
+                with memoryview(data) as data_view:
+                    written = 0
+
+                    while written < len(data_view):
+                        written += os.pwrite(self.file.fileno(), data_view[written:], offset + written)
+            else:
+                self.file.seek(offset)
+                self.file.write(data)
+        except IOError as error:
+            raise IOError(error)
+
+    def preallocate(self, size):
+        if not self.is_file_opened():
+            self.open()
+
+        try:
+            os.posix_fallocate(self.file.fileno(), 0, size)
+        except (AttributeError, OSError):
+            self.file.truncate(size)
+
+    def seek(self, offset):
+        if not self.is_file_opened():
+            self.open()
+
+        self.file.seek(offset)
+
+    def flush(self):
+        if self.is_file_opened():
+            if self.writer is not None:
+                self.writer.flush(self)
+
+            self.file.flush()
+
+    def sync(self):
+        if self.is_file_opened():
+            self.flush()
+            os.fsync(self.file.fileno())
+
+    def get_committed_size(self):
+        return min(self.get_chunk_offset(self.current_chunk + 1), self.size)
+
+    def get_chunk_segment(self, chunk_number):
+        for segment in reversed(self.chunk_segments):  # Chunks are mostly received in the last segment
+            if segment[0] <= chunk_number:
+                return segment
+
+        return self.chunk_segments[0]
+
+    def get_chunk_offset(self, chunk_number):
+        first_chunk, offset, chunk_size = self.get_chunk_segment(chunk_number)
+
+        return offset + (chunk_number - first_chunk) * chunk_size
+
+    def get_chunk_size(self, chunk_number):
+        return self.get_chunk_segment(chunk_number)[2]
+
+    def set_chunk_size(self, first_chunk, chunk_size):
+        self.chunk_segments.append((first_chunk, self.get_chunk_offset(first_chunk), chunk_size))
+
     def read(self, size):
         if not self.is_file_opened():
             self.open("rb")
 
+        self.flush()
+
         return self.file.read(size)
 
+    def open_basis(self, path, block_size):
+        self.basis = open(path, "rb")
+        self.basis_block_size = block_size
+
     def close(self):
         if self.file is not None:
+            if self.writer is not None:
+                try:
+                    self.writer.close_file(self)
+                except IOError:
+                    pass  # Reported by the checksum check of the file
+
             self.file.close()
             self.file = None
+
+        if self.basis is not None:
+            self.basis.close()
+            self.basis = None
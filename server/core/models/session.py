@@ -0,0 +1,18 @@
+import threading
+
+from server.core.models.file import File
+
+
+class Session:
+
+    def __init__(self, session_id: str, file: File, chunks_count: int):
+        self.session_id = session_id
+        self.file = file
+        self.chunks_count = chunks_count
+
+        self.lock = threading.Lock()
+        self.closed = False
+        self.connections = 1  # Connections attached to the session, starting with the one that created it
+
+    def is_complete(self) -> bool:
+        return self.file.current_chunk == self.chunks_count
@@ -12,3 +12,11 @@ class FileAlreadyExists(Exception):
 
 class ZeroSize(Exception):
     pass
+
+
+class InvalidDeltaInstruction(Exception):
+    pass
+
+
+class InvalidCompressedChunk(Exception):
+    pass
@@ -0,0 +1,2 @@
+class FrameTooLarge(Exception):
+    pass
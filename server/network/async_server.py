@@ -0,0 +1,116 @@
+import asyncio
+
+
+class TransportSocket:
+    """Exposes an asyncio transport through the socket methods used by Handler."""
+
+    def __init__(self, transport: asyncio.Transport):
+        self.transport = transport
+
+    def send(self, data: bytes) -> int:
+        self.transport.write(data)
+
+        return len(data)
+
+    def close(self):
+        self.transport.close()
+
+
+class HandlerProtocol(getattr(asyncio, "BufferedProtocol", asyncio.Protocol)):  # BufferedProtocol needs Python 3.7
+    """Drives the Handler of a client from the event loop.
+
+    Every client is handled on the event loop thread, disk writes included: a slow disk, or writer threads whose
+    queue is full, delays every client of the server. The threaded engine keeps the clients apart.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.handler = None
+        self.client_address = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.client_address = transport.get_extra_info("peername")
+
+        if len(self.server.connections) >= self.server.max_connections:
+            print("Connection limit reached, client with address", self.client_address, "refused")
+            transport.close()
+            return
+
+        self.server.connections.add(self)
+        print("Client connected with address:", self.client_address)
+
+        self.handler = self.server.handler_factory(TransportSocket(transport), self.client_address)
+        self.handler.send_chunk_size()
+
+    def get_buffer(self, sizehint):
+        if self.handler is None:
+            return bytearray(1)
+
+        return self.handler.receive_buffer.reserve(self.handler.receive_size)
+
+    def buffer_updated(self, nbytes):
+        if self.handler is None:
+            return
+
+        self.handler.receive_buffer.commit(nbytes)
+
+        self.handle()
+
+    def data_received(self, data):
+        # Only called without BufferedProtocol, the data is then copied into the receive buffer
+        if self.handler is None:
+            return
+
+        self.handler.receive_buffer.extend(data)
+
+        self.handle()
+
+    def handle(self):
+        try:
+            self.handler.handle()
+        except OSError:  # The handler is closed with the connection
+            self.transport.close()
+
+    def connection_lost(self, exc):
+        if self.handler is not None:
+            self.handler.close()
+
+        if self in self.server.connections:
+            self.server.connections.remove(self)
+            print("Client with address", self.client_address, "disconnected")
+
+        self.handler = None
+
+
+class AsyncServer:
+
+    def __init__(self, port, backlog, max_connections, handler_factory):
+        self.port = port
+        self.backlog = backlog
+        self.max_connections = max_connections
+        self.handler_factory = handler_factory
+
+        self.connections = set()
+
+    def serve(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        server = loop.run_until_complete(loop.create_server(lambda: HandlerProtocol(self),
+                                                            "0.0.0.0",
+                                                            self.port,
+                                                            backlog=self.backlog,
+                                                            reuse_address=True))
+
+        print("Server now listening on port", self.port)
+
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+            loop.close()
@@ -1,93 +1,241 @@
 import struct
 import binascii
+import hashlib
 import json
 import os
+import socket
+from typing import Tuple, Optional
 
 from server.core.models.file import File
+from server.core.models.chunk_stream import ChunkStream
 from server.core.managers.file_manager import FileManager
+from server.core.managers.delta_manager import DeltaManager
+from server.core.managers.chunk_store_manager import ChunkStoreManager
+from server.core.managers.hash_manager import HashManager
+from server.core.managers.compression_manager import CompressionManager
 
 from server.network.protocol import Protocol
+from server.network.receive_buffer import ReceiveBuffer
 
 from server.errors.file_errors import *
+from server.errors.network_errors import *
 
 
 class Handler:
 
-    def __init__(self, client_socket, client_address, chunk_size, default_path):
+    def __init__(self, client_socket, client_address, chunk_size, default_path, max_window_size=1,
+                 receive_size=65536, session_manager=None, progress_interval=8 * 2**20, chunk_store_manager=None,
+                 verify_from_disk=False, max_chunk_size=None, writer_manager=None, splice=False,
+                 max_frame_size=65536 * 1000):
         self.base_path = default_path
         self.current_path = self.base_path
 
         self.client_socket = client_socket
         self.client_address = client_address
 
-        self.main_buffer = bytearray()
-        self.packet_buffer = bytearray()
-
-        self.missing_packet_bytes = int()
+        self.receive_size = receive_size
+        self.receive_buffer = ReceiveBuffer(2 * receive_size)
+        self.packet_buffer = None  # memoryview over the receive buffer of the packet being handled
+        self.max_frame_size = max_frame_size  # Larger frames are not buffered, the connection is closed instead
+        self.chunk_stream = None  # Chunk larger than the receive size being written to its file as it arrives
 
         self.current_file = None
+        self.current_session = None
+        self.session_manager = session_manager
 
         self.chunk_size = chunk_size
+        self.max_chunk_size = max_chunk_size if max_chunk_size is not None else chunk_size
+        self.chunk_size_range = None  # Chunk sizes the client may pick for each file, in Ko
+        self.data_frame_version = None
 
-    def handle(self) -> None:
-        if not self.get_last_packet():  # Incomplete packet
-            return
+        self.max_window_size = max_window_size
+        self.window_size = 1
+
+        self.resume = False
+        self.progress_interval = progress_interval
+
+        self.delta = False
+
+        self.dedup = False
+        self.chunk_store_manager = chunk_store_manager
+
+        self.sync = False
+        self.streaming_checksum = False  # The whole file checksum comes with the end of file packet
+        self.verify_from_disk = verify_from_disk
+        self.writer_manager = writer_manager
+
+        self.file_hash_algorithm = HashManager.DEFAULT_ALGORITHM
+        self.chunk_hash_algorithm = HashManager.DEFAULT_ALGORITHM
+
+        self.compression = None
 
+        self.bundle = False
+        self.tree = False
+
+        self.raw_data_frames = False
+        # Payloads of raw data frames are moved from the socket to the files by the kernel, which needs a real socket
+        self.splice_enabled = splice and hasattr(os, "splice") and isinstance(client_socket, socket.socket)
+        self.splice = False
+        self.splice_pipe = None
+        self.sync_modification_times = dict()  # Client modification time of the needed files not received yet
+
+    def handle(self) -> int:
+        handled_packets = 0
+
+        try:
+            # Dispatch every complete packet once the streamed chunk is received, an incomplete one waits for more data
+            while self.receive_chunk_stream() and self.get_last_packet():
+                self.dispatch_packet()
+                handled_packets += 1
+        except FrameTooLarge:
+            # The following frames cannot be found without reading this one
+            self.receive_buffer.consume(len(self.receive_buffer))
+            self.client_socket.close()
+
+        return handled_packets
+
+    def dispatch_packet(self) -> None:
         code = self.packet_buffer[0]
 
-        if code == 0x01:
-            self.create_new_directory()
-        elif code == 0x02:
-            self.create_new_file()
-        elif code == 0x03:
-            self.receive_file_chunk()
-        elif code == 0x04:
-            self.end_of_file()
-        elif code == 0x05:
-            self.end_of_directory()
-        elif code == 0x06:
-            self.file_transfer_abort()
-        else:
-            return
+        try:
+            if code == 0x01:
+                self.create_new_directory()
+            elif code == 0x02:
+                self.create_new_file()
+            elif code == 0x03:
+                self.receive_file_chunk()
+            elif code == 0x04:
+                self.end_of_file()
+            elif code == 0x05:
+                self.end_of_directory()
+            elif code == 0x06:
+                self.file_transfer_abort()
+            elif code == 0x07:
+                self.hello()
+            elif code == 0x08:
+                self.receive_data_frame()
+            elif code == 0x09:
+                self.create_session()
+            elif code == 0x0A:
+                self.join_session()
+            elif code == 0x0B:
+                self.resume_file()
+            elif code == 0x0C:
+                self.delta_request()
+            elif code == 0x0D:
+                self.receive_delta_instructions()
+            elif code == 0x0E:
+                self.receive_chunk_offer()
+            elif code == 0x0F:
+                self.receive_stored_chunk()
+            elif code == 0x10:
+                self.receive_sync_manifest()
+            elif code == 0x11:
+                self.receive_bundle()
+            elif code == 0x12:
+                self.create_directory_tree()
+            elif code == 0x13:
+                self.receive_raw_data_frame()
+            elif code == 0x14:
+                self.change_chunk_size()
+        finally:
+            self.release_packet()
 
     def packet_json_deserialize(self) -> dict:
-        return json.loads(self.packet_buffer[5:])
+        return json.loads(bytes(self.packet_buffer[5:]))
+
+    def packet_data_frame_deserialize(self, packet_view: memoryview) -> Tuple[int, int, bytes, memoryview, bool]:
+        # Unknown versions are read as version 1 headers and rejected by the caller
+        header_format = Protocol.DATA_FRAME_HEADER_FORMATS.get(packet_view[5], Protocol.DATA_FRAME_HEADER_FORMATS[1])
+        header_size = struct.calcsize(header_format)
+        version, chunk_number, data_size, digest_size, *compressed = struct.unpack_from(header_format, packet_view, 5)
+
+        digest_start = 5 + header_size
+        data_start = digest_start + digest_size
+
+        return (version,
+                chunk_number,
+                bytes(packet_view[digest_start:data_start]),
+                packet_view[data_start:data_start+data_size],
+                bool(compressed and compressed[0]))
+
+    @staticmethod
+    def packet_raw_data_frame_deserialize(packet_view: memoryview) -> Tuple[int, int, bytes, int]:
+        chunk_number, data_size, digest_size = struct.unpack_from(Protocol.RAW_DATA_FRAME_HEADER_FORMAT, packet_view, 5)
+
+        digest_start = 5 + struct.calcsize(Protocol.RAW_DATA_FRAME_HEADER_FORMAT)
+        data_start = digest_start + digest_size  # The raw data follows the length prefixed frame
+
+        return chunk_number, data_size, bytes(packet_view[digest_start:data_start]), data_start
 
     def packet_string_decode(self) -> str:
-        packet_string = self.packet_buffer[5:].decode()
+        packet_string = bytes(self.packet_buffer[5:]).decode()
 
         return packet_string
 
+    def receive(self) -> int:
+        return self.receive_buffer.receive_from(self.client_socket, self.receive_size)
+
     def get_last_packet(self) -> bool:
-        if len(self.packet_buffer) == 0:
-            if len(self.main_buffer) >= 5:
-                packet_size = struct.unpack("I", self.main_buffer[1:5])[0]
+        if len(self.receive_buffer) < 5:
+            return False
 
-                if len(self.main_buffer) >= packet_size+5:
-                    self.packet_buffer.extend(self.main_buffer[:packet_size+5])
-                    del self.main_buffer[:packet_size+5]
+        with self.receive_buffer.peek(5) as packet_header:
+            code = packet_header[0]
+            packet_size = struct.unpack_from("I", packet_header, 1)[0] + 5
 
-                    return True
-                else:
-                    self.packet_buffer.extend(self.main_buffer)
-                    self.missing_packet_bytes = (packet_size+5) - len(self.main_buffer)
-                    del self.main_buffer[:]
+        if packet_size - 5 > self.max_frame_size:
+            raise FrameTooLarge
 
+        if code == 0x08 and packet_size > self.receive_size:
+            header_size = self.get_data_frame_header_size()
+
+            if header_size is not None:  # Only the header is handled as a packet, the chunk is streamed
+                packet_size = header_size
+
+        if len(self.receive_buffer) < packet_size:
+            return False
+
+        if code == 0x13 and not self.splice:
+            with self.receive_buffer.peek(packet_size) as packet_header:
+                data_size = struct.unpack_from("I", packet_header, 9)[0]
+
+            if packet_size + data_size <= self.receive_size:  # Received with the frame, else streamed
+                packet_size += data_size
+
+                if len(self.receive_buffer) < packet_size:
                     return False
-            else:
-                return False
-        else:
-            if len(self.main_buffer) >= self.missing_packet_bytes:
-                self.packet_buffer.extend(self.main_buffer[:self.missing_packet_bytes])
-                del self.main_buffer[:self.missing_packet_bytes]
 
-                return True
-            else:
-                self.packet_buffer.extend(self.main_buffer)
-                self.missing_packet_bytes -= len(self.main_buffer)
-                del self.main_buffer[:]
+        self.packet_buffer = self.receive_buffer.peek(packet_size)
+
+        return True
+
+    def get_data_frame_header_size(self) -> Optional[int]:
+        # Header and digest of a data frame whose chunk can be streamed, compressed chunks are decompressed whole
+        if self.data_frame_version is None:
+            return None
+
+        header_format = Protocol.DATA_FRAME_HEADER_FORMATS[self.data_frame_version]
+        header_size = 5 + struct.calcsize(header_format)
+
+        if len(self.receive_buffer) < header_size:
+            return None
+
+        with self.receive_buffer.peek(header_size) as packet_header:
+            version, _, _, digest_size, *compressed = struct.unpack_from(header_format, packet_header, 5)
+
+        if version != self.data_frame_version or (compressed and compressed[0]):
+            return None
+
+        return header_size + digest_size
 
-                return False
+    def release_packet(self) -> None:
+        self.receive_buffer.consume(len(self.packet_buffer))
+
+        self.packet_buffer.release()
+        self.packet_buffer = None
+
+        self.receive_buffer.shrink()  # Memory of a frame larger than the receive buffer is given back
 
     def create_new_directory(self):
         packet_string = self.packet_string_decode()
@@ -101,12 +249,38 @@ class Handler:
         try:
             os.mkdir(new_directory_path)
         except FileExistsError:
-            self.client_socket.send(Protocol.confirmation_packet(False))
+            if (self.resume or self.sync) and os.path.isdir(new_directory_path):  # Directory of an earlier transfer
+                self.current_path = new_directory_path+"/"
+                self.client_socket.send(Protocol.confirmation_packet(True))
+            else:
+                self.client_socket.send(Protocol.confirmation_packet(False))
         else:
             self.current_path = new_directory_path+"/"
             self.client_socket.send(Protocol.confirmation_packet(True))
 
-        del self.packet_buffer[:]
+    def create_directory_tree(self):
+        directories_paths = list()
+
+        # Every directory is a (parent directory number, name) pair, -1 standing for the current directory in which
+        # case the name can be a relative path
+        for parent_number, name in self.packet_json_deserialize()["directories"]:
+            if (not self.tree or
+                    not -1 <= parent_number < len(directories_paths) or
+                    (parent_number != -1 and "/" in name) or
+                    any(part in ("", ".", "..") for part in name.split("/"))):
+                self.client_socket.send(Protocol.confirmation_packet(False))
+                return
+
+            parent_path = self.current_path if parent_number == -1 else directories_paths[parent_number]
+            directories_paths.append(os.path.join(parent_path, name))
+
+        try:
+            for directory_path in directories_paths:
+                os.makedirs(directory_path, exist_ok=self.resume or self.sync)  # Same rule as create_new_directory
+        except OSError:
+            self.client_socket.send(Protocol.confirmation_packet(False))
+        else:
+            self.client_socket.send(Protocol.confirmation_packet(True))
 
     def create_new_file(self):
         if self.current_file is not None:
@@ -114,15 +288,47 @@ class Handler:
             return
 
         file_dict = self.packet_json_deserialize()
-        file_path = self.current_path+file_dict["name"]
+        file_path = self.get_file_path(file_dict["name"])
+
+        if file_path is None:
+            self.client_socket.send(Protocol.confirmation_packet(False))
+            return
 
-        self.current_file = File(file_path,
-                                 file_dict["size"],
-                                 file_dict["checksum"],
-                                 self.chunk_size)
+        self.current_file = self.new_file(file_path, file_dict)
+        self.current_file.preallocate(file_dict["size"])  # Allocated in as few extents as the file system can
 
         self.client_socket.send(Protocol.confirmation_packet(True))
-        del self.packet_buffer[:]
+
+    def new_file(self, path: str, file_dict: dict, mode="wb") -> File:
+        file = File(path,
+                    file_dict["size"],
+                    file_dict["checksum"],
+                    self.get_file_chunk_size(file_dict),
+                    mode,
+                    self.file_hash_algorithm,
+                    self.chunk_hash_algorithm,
+                    self.writer_manager)
+        file.modification_time = file_dict.get("modification_time")
+
+        return file
+
+    def get_file_path(self, name: str) -> Optional[str]:
+        # Names leading out of the receiving directory are refused, None is returned for them
+        file_path = os.path.normpath(os.path.join(self.current_path, name))
+
+        if not file_path.startswith(os.path.normpath(self.base_path) + os.sep):
+            return None
+
+        return file_path
+
+    def get_file_chunk_size(self, file_dict: dict) -> int:
+        chunk_size = file_dict.get("chunk_size")
+
+        if (self.chunk_size_range is not None and isinstance(chunk_size, int) and
+                self.chunk_size_range[0] <= chunk_size <= self.chunk_size_range[1]):
+            return chunk_size
+
+        return self.chunk_size
 
     def receive_file_chunk(self):
         file_chunk = self.packet_json_deserialize()
@@ -139,56 +345,628 @@ class Handler:
         else:
             self.client_socket.send(Protocol.file_chunk_integrity_confirmation(True))
 
-        del self.packet_buffer[:]
+    def receive_data_frame(self):
+        version, chunk_number, chunk_digest, chunk_view, compressed = self.packet_data_frame_deserialize(
+            self.packet_buffer)
+        chunk_data = chunk_view
+        streamed_size = struct.unpack_from("I", self.packet_buffer, 1)[0] + 5 - len(self.packet_buffer)
+
+        if streamed_size > 0:
+            data_size = struct.unpack_from("I", self.packet_buffer, 10)[0]
+            chunk_view.release()
+
+            self.open_chunk_stream(chunk_number, streamed_size, chunk_digest, data_size == streamed_size)
+            return
+
+        try:
+            if version != self.data_frame_version or (compressed and self.compression is None):
+                raise InvalidChunkNumber
+
+            if compressed:
+                chunk_data = CompressionManager.decompress(self.compression, chunk_view, self.max_chunk_size * 1000)
+
+            self.write_chunk(chunk_number, chunk_data, chunk_digest)
+        except InvalidChunkNumber:
+            confirmed = None
+        except (ChecksumDoesNotMatch, InvalidCompressedChunk):
+            confirmed = False
+        else:
+            confirmed = True
+            self.save_progress()
+        finally:
+            chunk_view.release()
+
+        self.acknowledge_chunk(chunk_number, confirmed)
+
+    def receive_raw_data_frame(self):
+        chunk_number, data_size, chunk_digest, data_start = self.packet_raw_data_frame_deserialize(self.packet_buffer)
+        chunk_data = None
+
+        if not self.splice and len(self.packet_buffer) < data_start + data_size:
+            self.open_chunk_stream(chunk_number, data_size, chunk_digest, self.raw_data_frames)
+            return
+
+        try:
+            if not self.raw_data_frames:
+                raise InvalidChunkNumber
+
+            if self.splice:
+                chunk_data = self.splice_chunk(chunk_number, data_size)
+
+                if chunk_data is not None:
+                    self.write_chunk(chunk_number, chunk_data, chunk_digest, written=True)
+            else:
+                chunk_data = self.packet_buffer[data_start:data_start+data_size]
+                self.write_chunk(chunk_number, chunk_data, chunk_digest)
+        except InvalidChunkNumber:
+            confirmed = None
+        except ChecksumDoesNotMatch:
+            confirmed = False
+        else:
+            confirmed = True
+            self.save_progress()
+        finally:
+            if isinstance(chunk_data, memoryview):
+                chunk_data.release()
+
+        self.acknowledge_chunk(chunk_number, confirmed)
+
+    def change_chunk_size(self):
+        first_chunk, chunk_size = struct.unpack_from(Protocol.CHUNK_SIZE_CHANGE_FORMAT, self.packet_buffer, 5)
+
+        # Not answered: an ignored change moves the following chunks and the file integrity check fails
+        if (self.current_file is None or self.current_session is not None or self.chunk_size_range is None or
+                not self.chunk_size_range[0] <= chunk_size <= self.chunk_size_range[1]):
+            return
+
+        try:
+            FileManager.change_chunk_size(self.current_file, first_chunk, chunk_size)
+        except InvalidChunkNumber:
+            pass
+
+    def write_chunk(self, chunk_number: int, chunk_data, chunk_digest: bytes, written=False):
+        if self.current_session is not None:
+            FileManager.write_session_chunk(self.current_session, chunk_number, chunk_data, chunk_digest, written)
+        elif self.window_size > 1:
+            FileManager.write_window_chunk(self.current_file,
+                                           chunk_number,
+                                           chunk_data,
+                                           chunk_digest,
+                                           self.window_size,
+                                           written)
+        else:
+            FileManager.write_new_chunk(self.current_file, chunk_number, chunk_data, chunk_digest, written)
+
+    def get_expected_chunk_file(self, chunk_number: int, data_size: int) -> Optional[File]:
+        if self.current_session is not None:
+            file = self.current_session.file
+            expected = FileManager.is_session_chunk_expected(self.current_session, chunk_number)
+        elif self.current_file is not None:
+            file = self.current_file
+            expected = FileManager.is_chunk_expected(file,
+                                                     chunk_number,
+                                                     self.window_size if self.window_size > 1 else 0)
+        else:
+            raise InvalidChunkNumber
+
+        if not expected:
+            return None
+
+        if data_size > min(file.get_chunk_size(chunk_number), file.size - file.get_chunk_offset(chunk_number)):
+            raise InvalidChunkNumber
+
+        return file
+
+    def splice_chunk(self, chunk_number: int, data_size: int) -> Optional[bytes]:
+        # The payload is consumed from the socket whether the chunk is expected or not, into its file when it is
+        file = None
+
+        try:
+            file = self.get_expected_chunk_file(chunk_number, data_size)
+        finally:
+            offset = file.get_chunk_offset(chunk_number) if file is not None else 0
+            self.receive_raw_payload(file, offset, data_size)
+
+        if file is None:
+            return None
+
+        # Checked against the chunk digest once written, the data never went through a Python buffer before
+        return os.pread(file.file.fileno(), data_size, offset)
+
+    def receive_raw_payload(self, file: Optional[File], offset: int, size: int):
+        packet_size = len(self.packet_buffer)
+        buffered_size = min(size, len(self.receive_buffer) - packet_size)
+
+        with self.receive_buffer.peek(packet_size + buffered_size) as buffered_view:  # Received with the header
+            if file is not None:
+                file.write_through(offset, buffered_view[packet_size:])
+
+        self.receive_buffer.consume(buffered_size)
+
+        offset += buffered_size
+        size -= buffered_size
+
+        if size > 0 and self.splice_pipe is None:
+            self.splice_pipe = os.pipe()
+
+        while size > 0:
+            spliced_size = os.splice(self.client_socket.fileno(), self.splice_pipe[1], size)
+
+            if spliced_size == 0:
+                raise ConnectionResetError
+
+            moved_size = 0
+
+            while moved_size < spliced_size:
+                if file is None:  # Dropped with the chunk
+                    moved_size += len(os.read(self.splice_pipe[0], spliced_size - moved_size))
+                else:
+                    moved_size += os.splice(self.splice_pipe[0],
+                                            file.file.fileno(),
+                                            spliced_size - moved_size,
+                                            offset_dst=offset + moved_size)
+
+            offset += spliced_size
+            size -= spliced_size
+
+    def open_chunk_stream(self, chunk_number: int, size: int, chunk_digest: bytes, valid: bool):
+        file = None
+
+        if valid:
+            try:
+                file = self.get_expected_chunk_file(chunk_number, size)
+            except InvalidChunkNumber:
+                valid = False
+
+        self.chunk_stream = ChunkStream(file, chunk_number, size, chunk_digest, valid, self.current_session is None)
+
+    def receive_chunk_stream(self) -> bool:
+        chunk_stream = self.chunk_stream
+
+        if chunk_stream is None:
+            return True
+
+        size = min(len(self.receive_buffer), chunk_stream.size - chunk_stream.received_size)
+
+        with self.receive_buffer.peek(size) as chunk_data:
+            FileManager.write_chunk_stream(chunk_stream, chunk_data)
+
+        self.receive_buffer.consume(size)
+
+        if not chunk_stream.is_complete():
+            return False
+
+        self.chunk_stream = None
+
+        try:
+            if not chunk_stream.valid:
+                raise InvalidChunkNumber
+
+            if chunk_stream.file is not None:
+                FileManager.close_chunk_stream(chunk_stream, self.current_session)
+        except InvalidChunkNumber:
+            confirmed = None
+        except ChecksumDoesNotMatch:
+            confirmed = False
+        else:
+            confirmed = True
+            self.save_progress()
+
+        self.acknowledge_chunk(chunk_stream.chunk_number, confirmed)
+
+        return True
+
+    def acknowledge_chunk(self, chunk_number: int, confirmed: Optional[bool]):
+        if self.current_session is not None:
+            self.client_socket.send(Protocol.chunk_acknowledgement(chunk_number,
+                                                                   self.current_session.file.current_chunk,
+                                                                   bool(confirmed)))
+        elif self.window_size > 1:
+            self.client_socket.send(Protocol.chunk_acknowledgement(chunk_number,
+                                                                   self.current_file.current_chunk,
+                                                                   bool(confirmed)))
+        elif confirmed is None:
+            self.client_socket.send(Protocol.confirmation_packet(False))
+        else:
+            self.client_socket.send(Protocol.file_chunk_integrity_confirmation(confirmed))
+
+    def resume_file(self):
+        if self.current_file is not None:
+            self.client_socket.send(Protocol.resume_packet({"chunk": None, "offset": None}))
+            return
+
+        file_dict = self.packet_json_deserialize()
+        file_path = self.get_file_path(file_dict["name"])
+
+        if file_path is None:
+            self.client_socket.send(Protocol.resume_packet({"chunk": None, "offset": None}))
+            return
+
+        try:
+            self.current_file = self.new_file(file_path, file_dict, "r+b")
+        except FileNotFoundError:
+            self.current_file = self.new_file(file_path, file_dict)
+        else:
+            if not FileManager.restore_progress(self.current_file, self.chunk_size_range):
+                self.current_file.close()
+                FileManager.remove_progress(self.current_file)
+
+                self.current_file = self.new_file(file_path, file_dict)
+
+        self.current_file.preallocate(file_dict["size"])
+        # The transfer goes on with the chunk size the next chunk was to be sent with
+        chunk_size = self.current_file.get_chunk_size(self.current_file.current_chunk + 1)
+
+        self.client_socket.send(Protocol.resume_packet({"chunk": self.current_file.current_chunk,
+                                                        "offset": self.current_file.get_committed_size(),
+                                                        "chunk_size": chunk_size // 1000}))
+
+    def is_resumable(self) -> bool:
+        return (self.resume and
+                self.current_file is not None and
+                self.current_session is None and
+                self.current_file.final_path is None)
+
+    def save_progress(self):
+        if self.is_resumable() and FileManager.is_progress_due(self.current_file, self.progress_interval):
+            FileManager.save_progress(self.current_file)
+
+    def delta_request(self):
+        file_dict = self.packet_json_deserialize()
+        file_path = self.get_file_path(file_dict["name"])
+
+        # Partial files are completed by resuming them instead
+        if (self.current_file is not None or
+                file_path is None or
+                not os.path.isfile(file_path) or
+                os.path.exists(File.get_progress_path(file_path))):
+            self.client_socket.send(Protocol.signatures_packet(0, b""))
+            return
+
+        block_size = DeltaManager.get_block_size(os.path.getsize(file_path))
+        signatures = DeltaManager.get_signatures(file_path, block_size)
+
+        if len(signatures) == 0:
+            self.client_socket.send(Protocol.signatures_packet(0, b""))
+            return
+
+        self.current_file = self.new_file(File.get_temporary_path(file_path, ".delta"), file_dict)
+        self.current_file.final_path = file_path
+        self.current_file.open_basis(file_path, block_size)
+
+        self.client_socket.send(Protocol.signatures_packet(block_size, signatures))
+
+    def receive_delta_instructions(self):
+        if self.current_file is None or self.current_file.basis is None:
+            return
+
+        with self.packet_buffer[5:] as instructions:
+            try:
+                DeltaManager.apply_instructions(self.current_file, instructions)
+            except InvalidDeltaInstruction:
+                # Ignore the following instructions, the end of file checksum rejects the file
+                self.current_file.basis.close()
+                self.current_file.basis = None
+
+    def receive_chunk_offer(self):
+        if self.current_file is not None or not self.dedup:
+            self.client_socket.send(Protocol.missing_chunks_packet([]))
+            return
+
+        file_dict_size = struct.unpack_from("I", self.packet_buffer, 5)[0]
+        file_dict = json.loads(bytes(self.packet_buffer[9:9+file_dict_size]))
+        file_path = self.get_file_path(file_dict["name"])
+
+        if file_path is None:  # Nothing is asked for, the end of file then fails the file
+            self.client_socket.send(Protocol.missing_chunks_packet([]))
+            return
+
+        self.current_file = self.new_file(file_path, file_dict)
+        self.current_file.recipe = list(struct.iter_unpack(Protocol.CHUNK_OFFER_FORMAT,
+                                                           self.packet_buffer[9+file_dict_size:]))
+
+        if os.path.exists(self.chunk_store_manager.get_file_path(ChunkStoreManager.get_recipe_id(
+                self.current_file.recipe))):
+            self.client_socket.send(Protocol.missing_chunks_packet([]))  # Identical file already stored
+            return
+
+        self.client_socket.send(Protocol.missing_chunks_packet(
+            self.chunk_store_manager.get_missing_chunks(self.current_file.recipe)))
+
+    def receive_stored_chunk(self):
+        if self.current_file is None or self.current_file.recipe is None:
+            return
+
+        chunk_number = struct.unpack_from("I", self.packet_buffer, 5)[0]
+
+        with self.packet_buffer[9:] as chunk_data:
+            if chunk_number >= len(self.current_file.recipe):
+                return
+
+            digest, size = self.current_file.recipe[chunk_number]
+
+            # Chunks that do not match their digest are dropped, the file then fails its integrity check
+            if len(chunk_data) == size and hashlib.sha256(chunk_data).digest() == digest:
+                self.chunk_store_manager.add_chunk(digest, chunk_data)
+
+    def receive_sync_manifest(self):
+        manifest = self.packet_json_deserialize()
+        base_path = os.path.normpath(self.base_path)
+        needed_files = list()
+
+        for file_number, (relative_path, size, modification_time, checksum) in enumerate(manifest["files"]):
+            path = os.path.normpath(os.path.join(self.current_path, relative_path))
+
+            if not self.sync or not path.startswith(base_path + os.sep):
+                needed_files.append(file_number)
+                continue
+
+            if not FileManager.is_synchronized(path, size, modification_time, checksum, self.file_hash_algorithm):
+                self.sync_modification_times[path] = modification_time
+                needed_files.append(file_number)
+            elif checksum is not None:  # Same content, the following synchronizations can compare times again
+                FileManager.set_modification_time(path, modification_time)
+
+        self.client_socket.send(Protocol.needed_files_packet(needed_files))
+
+    def receive_bundle(self):
+        files_dict_size = struct.unpack_from("I", self.packet_buffer, 5)[0]
+        files_list = json.loads(bytes(self.packet_buffer[9:9+files_dict_size]))["files"]
+        offset = 9 + files_dict_size
+        results = list()
+
+        for file_dict in files_list:
+            file_path = self.get_file_path(file_dict["name"])
+
+            with self.packet_buffer[offset:offset+file_dict["size"]] as file_data:
+                results.append(self.bundle and
+                               file_path is not None and
+                               len(file_data) == file_dict["size"] and
+                               FileManager.write_bundled_file(file_path,
+                                                              file_data,
+                                                              file_dict["checksum"],
+                                                              self.file_hash_algorithm))
+
+            if results[-1]:
+                self.set_sync_modification_time(file_path)
+
+            offset += file_dict["size"]
+
+        self.client_socket.send(Protocol.bundle_results_packet(results))
+
+    def create_session(self):
+        if self.current_file is not None or self.session_manager is None:
+            self.client_socket.send(Protocol.session_packet({"session_id": None}))
+            return
+
+        file_dict = self.packet_json_deserialize()
+        file_path = self.get_file_path(file_dict["name"])
+
+        if file_path is None:
+            self.client_socket.send(Protocol.session_packet({"session_id": None}))
+            return
+
+        if self.current_session is not None:
+            self.leave_session()
+
+        self.current_file = self.new_file(file_path, file_dict)
+        self.current_file.preallocate(file_dict["size"])
+
+        self.current_session = self.session_manager.create_session(self.current_file)
+
+        self.client_socket.send(Protocol.session_packet({"session_id": self.current_session.session_id}))
+
+    def join_session(self):
+        session = None
+
+        if self.session_manager is not None:
+            session = self.session_manager.join_session(self.packet_json_deserialize()["session_id"])
+
+        if session is None:
+            self.client_socket.send(Protocol.confirmation_packet(False))
+            return
+
+        if self.current_session is not None:  # Session of the previous file sent through this stripe
+            self.leave_session()
+
+        self.current_session = session
+        self.client_socket.send(Protocol.confirmation_packet(True))
+
+    def leave_session(self):
+        session = self.current_session
+        self.current_session = None
+
+        if self.session_manager.leave_session(session):
+            # Last connection of an unfinished transfer, striped files are not resumed so the file is removed
+            session.file.close()
+            os.remove(session.file.path)
 
     def end_of_file(self):
+        if self.streaming_checksum and self.current_file is not None:
+            self.current_file.checksum = self.packet_json_deserialize()["checksum"]
+
         self.client_socket.send(Protocol.confirmation_packet(True))
 
-        if not FileManager.is_file_checksum_match(self.current_file):
+        if self.current_file is None:  # File refused when it was announced
+            self.client_socket.send(Protocol.file_integrity_confirmation(False))
+            return
+
+        if self.current_session is not None:
+            session_complete = self.current_session.is_complete()
+
+            self.session_manager.close_session(self.current_session)
+            self.leave_session()
+
+            if not session_complete:
+                self.client_socket.send(Protocol.file_integrity_confirmation(False))
+
+                self.current_file.close()
+                os.remove(self.current_file.path)
+                self.current_file = None
+
+                return
+
+        if self.current_file.recipe is not None:
+            self.chunk_store_manager.commit()
+
+            if not self.chunk_store_manager.materialize(self.current_file):
+                self.client_socket.send(Protocol.file_integrity_confirmation(False))
+
+                os.remove(self.current_file.path)
+                self.current_file = None
+
+                return
+
+        if not FileManager.is_file_checksum_match(self.current_file, self.verify_from_disk):
             self.client_socket.send(Protocol.file_integrity_confirmation(False))
 
             os.remove(self.current_file.path)
+            FileManager.remove_progress(self.current_file)
             del self.current_file
             self.current_file = None
-            del self.packet_buffer[:]
 
             return
 
         self.client_socket.send(Protocol.file_integrity_confirmation(True))
 
-        self.current_file.close()
+        FileManager.commit(self.current_file)
+        FileManager.remove_progress(self.current_file)
+
+        if self.current_file.recipe is not None:
+            self.chunk_store_manager.add_file(self.current_file)
+
+        self.set_sync_modification_time(self.current_file.final_path or self.current_file.path)
+
         self.current_file = None
-        del self.packet_buffer[:]
+
+    def set_sync_modification_time(self, file_path: str):
+        file_path = os.path.normpath(file_path)
+
+        if file_path in self.sync_modification_times:  # Lets the next synchronization skip the file
+            FileManager.set_modification_time(file_path, self.sync_modification_times.pop(file_path))
 
     def end_of_directory(self):
         self.current_path = "/".join(self.current_path.split("/")[:-2])+"/"
-        del self.packet_buffer[:]
 
         self.client_socket.send(Protocol.confirmation_packet(True))
 
     def file_transfer_abort(self):
-        del self.current_file
-        os.remove(self.current_path+self.current_file.name)
-        self.current_file = None
-        del self.packet_buffer[:]
+        if self.current_file is not None:
+            if self.is_resumable():  # Keep the partial file to resume it later
+                FileManager.save_progress(self.current_file)
+                self.current_file.close()
+            else:
+                self.current_file.close()
+                os.remove(self.current_file.path)
+
+            if self.current_session is not None:
+                self.session_manager.close_session(self.current_session)
+                self.leave_session()
+
+            self.current_file = None
+
+        self.client_socket.send(Protocol.confirmation_packet(True))
+
+    def close(self):
+        if self.splice_pipe is not None:
+            os.close(self.splice_pipe[0])
+            os.close(self.splice_pipe[1])
+            self.splice_pipe = None
+
+        if self.current_session is not None:
+            self.current_file = None  # Shared with the other connections of the session, the last one closes it
+            self.leave_session()
+
+        if self.current_file is not None:
+            if self.is_resumable():
+                FileManager.save_progress(self.current_file)
+
+            self.current_file.close()
+
+            if self.current_file.final_path is not None:
+                os.remove(self.current_file.path)
+
+            self.current_file = None
+
+    def hello(self):
+        options = self.packet_json_deserialize()
+        data_frame_versions = set(options.get("data_frame_versions", [])) & set(Protocol.DATA_FRAME_VERSIONS)
+
+        if data_frame_versions:
+            self.data_frame_version = max(data_frame_versions)
+
+            # Windowed transmission relies on the acknowledgements of binary data frames
+            self.window_size = max(1, min(int(options.get("window_size", 1)), self.max_window_size))
+
+            if self.data_frame_version >= 2:  # Compressed chunks are flagged in the version 2 header
+                self.compression = CompressionManager.select(options.get("compressions", []))
+
+        self.resume = bool(options.get("resume", False))
+        self.delta = bool(options.get("delta", False))
+        self.dedup = bool(options.get("dedup", False)) and self.chunk_store_manager is not None
+        self.sync = bool(options.get("sync", False))
+        self.streaming_checksum = bool(options.get("streaming_checksum", False))
+        self.bundle = bool(options.get("bundle", False))
+        self.tree = bool(options.get("tree", False))
+        self.raw_data_frames = bool(options.get("raw_data_frames", False)) and self.data_frame_version is not None
+        self.splice = self.raw_data_frames and self.splice_enabled
+        self.chunk_size_range = self.get_chunk_size_range(options.get("chunk_size_range"))
+
+        self.file_hash_algorithm = HashManager.select(options.get("file_hash_algorithms", []),
+                                                      HashManager.FILE_ALGORITHMS) or HashManager.DEFAULT_ALGORITHM
+        self.chunk_hash_algorithm = HashManager.select(options.get("chunk_hash_algorithms", []),
+                                                       HashManager.ALGORITHMS) or HashManager.DEFAULT_ALGORITHM
+
+        self.client_socket.send(Protocol.hello_packet({"version": Protocol.VERSION,
+                                                       "data_frame_version": self.data_frame_version,
+                                                       "window_size": self.window_size,
+                                                       "striping": (self.data_frame_version is not None and
+                                                                    self.session_manager is not None),
+                                                       "resume": self.resume,
+                                                       "delta": self.delta,
+                                                       "dedup": self.dedup,
+                                                       "sync": self.sync,
+                                                       "streaming_checksum": self.streaming_checksum,
+                                                       "file_hash_algorithm": self.file_hash_algorithm,
+                                                       "chunk_hash_algorithm": self.chunk_hash_algorithm,
+                                                       "compression": self.compression,
+                                                       "bundle": self.bundle,
+                                                       "tree": self.tree,
+                                                       "chunk_size_range": self.chunk_size_range,
+                                                       "raw_data_frames": self.raw_data_frames}))
+
+    def get_chunk_size_range(self, chunk_size_range) -> list:
+        if (not isinstance(chunk_size_range, list) or len(chunk_size_range) != 2 or
+                not all(isinstance(chunk_size, int) for chunk_size in chunk_size_range)):
+            return None
+
+        # The client proposes the range, the server caps it to the chunks it accepts to buffer
+        minimum_chunk_size = max(1, min(chunk_size_range[0], self.max_chunk_size))
+        maximum_chunk_size = min(chunk_size_range[1], self.max_chunk_size)
+
+        if minimum_chunk_size > maximum_chunk_size:
+            return None
+
+        return [minimum_chunk_size, maximum_chunk_size]
 
     def send_chunk_size(self):
         data = bytearray()
         data.append(0x01)
 
         data.extend(bytearray(struct.pack("I", self.chunk_size)))
+        data.extend(bytearray(struct.pack("B", Protocol.VERSION)))  # Ignored by version 1 clients
         self.client_socket.send(data)
 
 
 if __name__ == '__main__':
     test_handler = Handler("test", "test", 15, "test")
 
-    test_handler.main_buffer.append(0x01)
-    test_handler.main_buffer.extend(bytearray(struct.pack("I", 4)))
-    test_handler.main_buffer.extend(bytearray(b"te"))
+    test_handler.receive_buffer.extend(bytearray([0x01]))
+    test_handler.receive_buffer.extend(bytearray(struct.pack("I", 4)))
+    test_handler.receive_buffer.extend(bytearray(b"te"))
 
     test_handler.get_last_packet()
     print("")
-    test_handler.main_buffer.extend(bytearray(b"t"))
+    test_handler.receive_buffer.extend(bytearray(b"t"))
     print(test_handler.get_last_packet())
     print("")
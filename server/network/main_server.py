@@ -1,24 +1,60 @@
+import os
 import socket
 import threading
 import signal
 import sys
 
 from server.network.handler import Handler
+from server.network.async_server import AsyncServer
 from server.core.configuration import Configuration
+from server.core.managers.session_manager import SessionManager
+from server.core.managers.chunk_store_manager import ChunkStoreManager
+from server.core.managers.writer_manager import WriterManager
 
 
 class Server:
 
     def __init__(self):
-        #  self.config = Configuration("config.ini")
-
-        #  self.port = self.config.read_config("DEFAULT", "port")
-        #  self.chunk_size = self.config.read_config("DEFAULT", "chunk_size")
-        #  self.default_path = self.config.read_config("DEFAULT", "path")
-
-        self.port = 1234
-        self.chunk_size = 15
-        self.default_path = "/home/user/transferred_files/"
+        self.config = Configuration(os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.ini"))
+
+        self.port = int(self.config.read_config("DEFAULT", "port", 1234))
+        self.chunk_size = int(self.config.read_config("DEFAULT", "chunk_size", 15))
+        self.max_chunk_size = int(self.config.read_config("DEFAULT", "max_chunk_size", 4096))
+        self.max_window_size = int(self.config.read_config("DEFAULT", "max_window_size", 64))
+        self.receive_size = int(self.config.read_config("DEFAULT", "receive_size", 65536))
+        self.max_frame_size = int(self.config.read_config("DEFAULT", "max_frame_size", 65536))
+        self.progress_interval = int(self.config.read_config("DEFAULT", "progress_interval", 8 * 2**20))
+        self.default_path = os.path.join(self.config.read_config("DEFAULT", "default_path",
+                                                                 "/home/user/transferred_files"), "")
+
+        self.engine = self.config.read_config("DEFAULT", "engine", "threaded")
+        self.backlog = int(self.config.read_config("DEFAULT", "backlog", 128))
+        self.max_connections = int(self.config.read_config("DEFAULT", "max_connections", 1024))
+        verify_from_disk = self.config.read_config("DEFAULT", "verify_from_disk", "no")
+        self.verify_from_disk = verify_from_disk.lower() in ("yes", "true", "1")
+        self.splice = self.config.read_config("DEFAULT", "splice", "no").lower() in ("yes", "true", "1")
+
+        self.session_manager = SessionManager()
+        self.chunk_store_manager = None
+
+        chunk_store_path = self.config.read_config("DEFAULT", "chunk_store_path", "")
+
+        if chunk_store_path:
+            self.chunk_store_manager = ChunkStoreManager(chunk_store_path)
+
+        self.writer_manager = None
+
+        writer_threads = int(self.config.read_config("DEFAULT", "writer_threads", 4))
+        writer_queue_size = int(self.config.read_config("DEFAULT", "writer_queue_size", 64))
+        write_buffer_size = int(self.config.read_config("DEFAULT", "write_buffer_size", 1024))
+        fsync_policy = self.config.read_config("DEFAULT", "fsync_policy", "none").lower()
+
+        if writer_threads > 0 and hasattr(os, "pwrite"):
+            self.writer_manager = WriterManager(writer_threads,
+                                                writer_queue_size,
+                                                write_buffer_size * 1000,
+                                                int(fsync_policy) * 10**6 if fsync_policy.isdigit() else 0,
+                                                fsync_policy == "close")
 
         self.main_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.main_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -27,8 +63,13 @@ class Server:
         signal.signal(signal.SIGTERM, self.stop)
 
     def serve(self):
+        if self.engine == "asyncio":
+            self.main_socket.close()
+            AsyncServer(self.port, self.backlog, self.max_connections, self.new_handler).serve()
+            return
+
         self.main_socket.bind(("0.0.0.0", self.port))
-        self.main_socket.listen(1)
+        self.main_socket.listen(self.backlog)
 
         print("Server now listening on port", self.port)
 
@@ -46,23 +87,42 @@ class Server:
         client_thread = threading.Thread(target=self.new_client, args=(client_socket, client_address,))
         client_thread.start()
 
+    def new_handler(self, client_socket, client_address) -> Handler:
+        return Handler(client_socket,
+                       client_address,
+                       self.chunk_size,
+                       self.default_path,
+                       self.max_window_size,
+                       self.receive_size,
+                       self.session_manager,
+                       self.progress_interval,
+                       self.chunk_store_manager,
+                       self.verify_from_disk,
+                       max(self.chunk_size, self.max_chunk_size),
+                       self.writer_manager,
+                       self.splice,
+                       self.max_frame_size * 1000)
+
     def new_client(self, client_socket, client_address):
-        handler = Handler(client_socket, client_address, self.chunk_size, self.default_path)
-        handler.send_chunk_size()
+        handler = self.new_handler(client_socket, client_address)
 
-        while self.running:
-            data = client_socket.recv(1024)
+        try:
+            handler.send_chunk_size()
 
-            if not data:
-                break
+            while self.running:
+                if handler.receive() == 0:
+                    break
 
-            handler.main_buffer.extend(bytearray(data))
-            handler.handle()
+                handler.handle()
+        except socket.error:  # Connection lost, also while a raw payload is being moved to its file
+            pass
+        finally:
+            handler.close()
+            client_socket.close()
 
-        client_socket.close()
         print("Client with address", client_address, "disconnected")
 
-    def stop(self):
+    def stop(self, *args):
         self.running = False
         sys.exit(0)
 
@@ -1,9 +1,22 @@
 from typing import Tuple
 import struct
+import json
 
 
 class Protocol:
 
+    VERSION = 2
+    DATA_FRAME_VERSIONS = (1, 2)
+    DATA_FRAME_HEADER_FORMATS = {1: "<BIIB",  # Version, chunk number, data size, digest size
+                                 2: "<BIIBB"}  # Version 1 header followed by the compressed flag
+    RAW_DATA_FRAME_HEADER_FORMAT = "<IIB"  # Chunk number, data size following the frame, digest size
+    CHUNK_ACKNOWLEDGEMENT_FORMAT = "<II?"  # Chunk number, last contiguous chunk, chunk confirmed
+    SIGNATURE_FORMAT = "<I16s"  # Rolling checksum, strong checksum of a block
+    DELTA_COPY_FORMAT = "<BII"  # 0x00, first block, blocks count
+    DELTA_LITERAL_FORMAT = "<BI"  # 0x01, data size, followed by the data
+    CHUNK_OFFER_FORMAT = "<32sI"  # sha256 digest, size of a content defined chunk
+    CHUNK_SIZE_CHANGE_FORMAT = "<II"  # First chunk sent with the new chunk size, chunk size in Ko
+
     @staticmethod
     def confirmation_packet(response: bool) -> bytearray:
         data = bytearray()
@@ -30,3 +43,88 @@ class Protocol:
         data.extend(bytearray(struct.pack("?", response)))
 
         return data
+
+    @staticmethod
+    def hello_packet(options: dict) -> bytearray:
+        data = bytearray()
+        data.append(0x05)
+
+        options_bytes = json.dumps(options).encode("utf-8")
+
+        data.extend(bytearray(struct.pack("I", len(options_bytes))))
+        data.extend(options_bytes)
+
+        return data
+
+    @staticmethod
+    def chunk_acknowledgement(chunk_number: int, cumulative_chunk: int, response: bool) -> bytearray:
+        data = bytearray()
+        data.append(0x06)
+
+        data.extend(bytearray(struct.pack(Protocol.CHUNK_ACKNOWLEDGEMENT_FORMAT,
+                                          chunk_number,
+                                          cumulative_chunk,
+                                          response)))
+
+        return data
+
+    @staticmethod
+    def session_packet(options: dict) -> bytearray:
+        data = bytearray()
+        data.append(0x07)
+
+        options_bytes = json.dumps(options).encode("utf-8")
+
+        data.extend(bytearray(struct.pack("I", len(options_bytes))))
+        data.extend(options_bytes)
+
+        return data
+
+    @staticmethod
+    def resume_packet(options: dict) -> bytearray:
+        data = bytearray()
+        data.append(0x08)
+
+        options_bytes = json.dumps(options).encode("utf-8")
+
+        data.extend(bytearray(struct.pack("I", len(options_bytes))))
+        data.extend(options_bytes)
+
+        return data
+
+    @staticmethod
+    def signatures_packet(block_size: int, signatures: bytes) -> bytearray:
+        data = bytearray()
+        data.append(0x09)
+
+        data.extend(bytearray(struct.pack("II", len(signatures) + 4, block_size)))
+        data.extend(signatures)
+
+        return data
+
+    @staticmethod
+    def missing_chunks_packet(chunk_numbers: list) -> bytearray:
+        data = bytearray()
+        data.append(0x0A)
+
+        data.extend(bytearray(struct.pack("I%dI" % len(chunk_numbers), 4 * len(chunk_numbers), *chunk_numbers)))
+
+        return data
+
+    @staticmethod
+    def needed_files_packet(file_numbers: list) -> bytearray:
+        data = bytearray()
+        data.append(0x0B)
+
+        data.extend(bytearray(struct.pack("I%dI" % len(file_numbers), 4 * len(file_numbers), *file_numbers)))
+
+        return data
+
+    @staticmethod
+    def bundle_results_packet(results: list) -> bytearray:
+        data = bytearray()
+        data.append(0x0C)
+
+        data.extend(bytearray(struct.pack("I%d?" % len(results), len(results), *results)))
+
+        return data
@@ -0,0 +1,68 @@
+class ReceiveBuffer:
+    """Preallocated receive buffer filled with recv_into and read through memoryviews.
+
+    Unread bytes live in buffer[start:end]. Consuming a frame only moves start, the unread tail is moved back
+    to the front of the buffer when there is not enough free space left for the next receive.
+    """
+
+    def __init__(self, size: int):
+        self.size = size  # Grown to hold a larger frame, shrunk back once it is consumed
+        self.buffer = bytearray(size)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def reserve(self, size: int) -> memoryview:
+        if len(self.buffer) - self.end < size:
+            length = len(self)
+
+            if self.start > 0:
+                self.buffer[:length] = self.buffer[self.start:self.end]
+                self.start = 0
+                self.end = length
+
+            if len(self.buffer) - self.end < size:
+                self.buffer.extend(bytes(max(size - (len(self.buffer) - self.end), len(self.buffer))))
+
+        return memoryview(self.buffer)[self.end:self.end + size]
+
+    def commit(self, size: int) -> None:
+        self.end += size
+
+    def receive_from(self, client_socket, size: int) -> int:
+        with self.reserve(size) as view:
+            received_size = client_socket.recv_into(view, size)
+
+        self.commit(received_size)
+
+        return received_size
+
+    def extend(self, data: bytes) -> None:
+        with self.reserve(len(data)) as view:
+            view[:] = data
+
+        self.commit(len(data))
+
+    def peek(self, size: int) -> memoryview:
+        return memoryview(self.buffer)[self.start:self.start + min(size, len(self))]
+
+    def consume(self, size: int) -> None:
+        self.start += size
+
+        if self.start >= self.end:
+            self.start = 0
+            self.end = 0
+
+    def shrink(self) -> None:
+        if len(self.buffer) <= self.size or len(self) > self.size:
+            return
+
+        # Replaced instead of resized, the event loop may still hold a view over the buffer it received into
+        buffer = bytearray(self.size)
+        buffer[:len(self)] = self.buffer[self.start:self.end]
+
+        self.buffer = buffer
+        self.end = len(self)
+        self.start = 0
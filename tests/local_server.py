@@ -0,0 +1,100 @@
+import os
+import time
+import socket
+import shutil
+import hashlib
+import tempfile
+import threading
+import unittest
+
+from client.network.core.client import Client
+from client.network.protocol.protocol import Protocol
+from server.network.main_server import Server
+
+
+class LocalServerTestCase(unittest.TestCase):
+    """Runs the threaded server on a free local port, receiving into a temporary directory.
+
+    Tests set the server attributes they need before connecting, every connection gets a handler built from them.
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.clients = list()
+        self.client_threads = list()
+
+        self.server = Server()
+        self.server.default_path = os.path.join(self.path, "")
+        self.server.main_socket.bind(("127.0.0.1", 0))
+        self.server.main_socket.listen(self.server.backlog)
+
+        self.port = self.server.main_socket.getsockname()[1]
+        self.chunk_size = self.server.chunk_size * 1000
+
+        threading.Thread(target=self.accept_connections, daemon=True).start()
+
+    def tearDown(self):
+        for client in self.clients:
+            client.disconnect()
+
+        for client_thread in self.client_threads:  # Handlers save their progress while they are closed
+            client_thread.join(5)
+
+        self.server.main_socket.shutdown(socket.SHUT_RDWR)  # Wakes the accepting thread up
+        self.server.main_socket.close()
+
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def accept_connections(self):
+        try:
+            while True:
+                client_socket, client_address = self.server.main_socket.accept()
+                client_thread = threading.Thread(target=self.server.new_client, args=(client_socket, client_address))
+
+                client_thread.start()
+                self.client_threads.append(client_thread)
+        except OSError:  # Listening socket closed by tearDown
+            pass
+
+    def connect(self, **options) -> Client:
+        client = Client("127.0.0.1", self.port)
+        client.connect()
+        self.clients.append(client)
+
+        Protocol.receive_chunk_size(client.receive())
+
+        client.send(Protocol.send_hello(dict({"version": Protocol.VERSION,
+                                              "data_frame_versions": list(Protocol.DATA_FRAME_VERSIONS)},
+                                             **options)))
+        Protocol.receive_hello(client.receive())
+
+        return client
+
+    def get_chunk(self, data: bytes, chunk_number: int) -> bytes:
+        return data[(chunk_number - 1) * self.chunk_size:chunk_number * self.chunk_size]
+
+    def send_chunk(self, client: Client, data: bytes, chunk_number: int, corrupted=False, corrupted_data=False,
+                   raw=False):
+        chunk_data = self.get_chunk(data, chunk_number)
+        chunk_digest = hashlib.md5(chunk_data + (b"corrupted" if corrupted else b"")).digest()
+
+        if corrupted_data:  # Zeroed data sent with the digest of the real data
+            chunk_data = bytes(len(chunk_data))
+
+        client.send_data_frame(chunk_number, chunk_data, chunk_digest, max(Protocol.DATA_FRAME_VERSIONS), raw=raw)
+
+    @staticmethod
+    def get_checksum(data: bytes) -> str:
+        return hashlib.md5(data).hexdigest()
+
+    @staticmethod
+    def wait_until(condition, timeout=5.0) -> bool:
+        deadline = time.monotonic() + timeout
+
+        while not condition():
+            if time.monotonic() > deadline:
+                return False
+
+            time.sleep(0.01)
+
+        return True
@@ -0,0 +1,84 @@
+import os
+import hashlib
+import unittest
+
+from client.network.protocol.protocol import Protocol
+from tests.local_server import LocalServerTestCase
+
+
+class ChunkSizeTest(LocalServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.server.progress_interval = 1
+
+        self.data = os.urandom(100000)
+        self.offsets = [0, 4000, 8000, 24000, 40000, 56000, 72000, 88000]  # 4 Ko chunks, then 16 Ko from chunk 3
+        self.file_path = os.path.join(self.path, "adapted.bin")
+
+    def send_adapted_chunk(self, client, chunk_number: int):
+        offset = self.offsets[chunk_number - 1]
+        chunk_data = self.data[offset:self.offsets[chunk_number] if chunk_number < len(self.offsets) else None]
+
+        client.send_data_frame(chunk_number, chunk_data, hashlib.md5(chunk_data).digest(),
+                               max(Protocol.DATA_FRAME_VERSIONS))
+
+    def end_file(self, client) -> bool:
+        client.send(Protocol.send_end_of_file("adapted.bin"))
+        self.assertTrue(Protocol.receive_confirmation_packet(client.receive()))
+
+        return Protocol.receive_file_integrity_confirmation(client.receive())
+
+    def test_chunk_size_changed_within_file(self):
+        client = self.connect(window_size=4, chunk_size_range=[4, 64])
+
+        client.send(Protocol.send_create_new_file("adapted.bin", len(self.data), self.get_checksum(self.data), 4))
+        self.assertTrue(Protocol.receive_confirmation_packet(client.receive()))
+
+        self.send_adapted_chunk(client, 1)
+        client.send(Protocol.send_chunk_size_change(3, 16))
+
+        # Chunk 2 is sent after the change and is still placed with the chunk size it was read with
+        for chunk_number in (3, 2, 4, 5, 6, 7, 8):
+            self.send_adapted_chunk(client, chunk_number)
+
+        self.assertTrue(all(Protocol.receive_chunk_acknowledgement(client.receive())[2] for _ in range(8)))
+        self.assertTrue(self.end_file(client))
+
+        with open(self.file_path, "rb") as file_object:
+            self.assertEqual(file_object.read(), self.data)
+
+    def test_resume_after_chunk_size_change(self):
+        client = self.connect(resume=True, chunk_size_range=[4, 64])
+
+        client.send(Protocol.send_resume_file("adapted.bin", len(self.data), self.get_checksum(self.data), 4))
+        self.assertEqual(Protocol.receive_resume(client.receive())["chunk"], 0)
+
+        for chunk_number in (1, 2, 3, 4):
+            if chunk_number == 3:
+                client.send(Protocol.send_chunk_size_change(3, 16))
+
+            self.send_adapted_chunk(client, chunk_number)
+            self.assertTrue(Protocol.receive_file_chunk_integrity_confirmation(client.receive()))
+
+        client.disconnect()
+        self.assertTrue(self.wait_until(lambda: os.path.exists(os.path.join(self.path, ".adapted.bin.partial"))))
+        self.assertTrue(self.wait_until(lambda: not self.client_threads[0].is_alive()))
+
+        client = self.connect(resume=True, chunk_size_range=[4, 64])
+
+        client.send(Protocol.send_resume_file("adapted.bin", len(self.data), self.get_checksum(self.data), 4))
+        resume = Protocol.receive_resume(client.receive())
+
+        self.assertEqual((resume["chunk"], resume["offset"], resume["chunk_size"]), (4, 40000, 16))
+
+        for chunk_number in (5, 6, 7, 8):
+            self.send_adapted_chunk(client, chunk_number)
+            self.assertTrue(Protocol.receive_file_chunk_integrity_confirmation(client.receive()))
+
+        self.assertTrue(self.end_file(client))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import unittest
+
+from server.core.managers.chunk_store_manager import ChunkStoreManager
+from server.core.models.file import File
+
+
+class ChunkStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.chunk_store_manager = ChunkStoreManager(os.path.join(self.path, "store"))
+
+        self.chunks = [os.urandom(1000), os.urandom(2000)]
+        self.recipe = [(hashlib.sha256(chunk).digest(), len(chunk)) for chunk in self.chunks]
+
+        self.file = File(os.path.join(self.path, "materialized.bin"), 3000, None, 4)
+        self.file.recipe = self.recipe
+
+    def tearDown(self):
+        self.file.close()
+        self.chunk_store_manager.pack.close()
+        self.chunk_store_manager.connection.close()
+
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_materialize(self):
+        for (digest, _), chunk in zip(self.recipe, self.chunks):
+            self.chunk_store_manager.add_chunk(digest, chunk)
+
+        self.chunk_store_manager.commit()
+
+        self.assertTrue(self.chunk_store_manager.materialize(self.file))
+        self.assertIsNone(self.file.file)
+
+        with open(self.file.path, "rb") as file_object:
+            self.assertEqual(file_object.read(), b"".join(self.chunks))
+
+    def test_missing_chunk_closes_file(self):
+        self.chunk_store_manager.add_chunk(self.recipe[0][0], self.chunks[0])
+        self.chunk_store_manager.commit()
+
+        self.assertFalse(self.chunk_store_manager.materialize(self.file))
+        self.assertIsNone(self.file.file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import time
+import hashlib
+import unittest
+from unittest import mock
+
+from client.network.protocol.protocol import Protocol
+from server.network.handler import Handler
+from tests.local_server import LocalServerTestCase
+
+
+class ChunkStreamTest(LocalServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.server.receive_size = 4096  # Every chunk is larger than a receive and is streamed to the file
+
+        self.data = os.urandom(3 * self.chunk_size + self.chunk_size // 2)
+        self.file_path = os.path.join(self.path, "streamed.bin")
+
+    def send_file(self, client, chunks, acknowledgements, raw=False):
+        client.send(Protocol.send_create_new_file("streamed.bin", len(self.data), self.get_checksum(self.data)))
+        self.assertTrue(Protocol.receive_confirmation_packet(client.receive()))
+
+        for chunk_number, corrupted in chunks:
+            self.send_chunk(client, self.data, chunk_number, corrupted, raw=raw)
+
+        self.assertEqual([Protocol.receive_chunk_acknowledgement(client.receive()) for _ in chunks], acknowledgements)
+
+        client.send(Protocol.send_end_of_file("streamed.bin"))
+        self.assertTrue(Protocol.receive_confirmation_packet(client.receive()))
+        self.assertTrue(Protocol.receive_file_integrity_confirmation(client.receive()))
+
+        with open(self.file_path, "rb") as file_object:
+            self.assertEqual(file_object.read(), self.data)
+
+    def test_streamed_chunks(self):
+        client = self.connect(window_size=4)
+
+        # Sent back to back: the frames following a streamed chunk are read from the same receives
+        self.send_file(client,
+                       [(2, False), (1, False), (3, True), (3, False), (4, False)],
+                       [(2, 0, True), (1, 2, True), (3, 2, False), (3, 3, True), (4, 4, True)])
+
+    def test_streamed_raw_chunks(self):
+        client = self.connect(window_size=4, raw_data_frames=True)
+
+        with mock.patch.object(Handler, "open_chunk_stream", autospec=True,
+                               side_effect=Handler.open_chunk_stream) as open_chunk_stream:
+            self.send_file(client,
+                           [(1, False), (3, False), (2, True), (2, False), (4, False)],
+                           [(1, 1, True), (3, 1, True), (2, 1, False), (2, 3, True), (4, 4, True)],
+                           raw=True)
+
+        self.assertEqual(open_chunk_stream.call_count, 5)
+
+    @unittest.skipUnless(hasattr(os, "splice"), "os.splice needs Linux and Python 3.10")
+    def test_spliced_raw_chunks(self):
+        self.server.splice = True
+        client = self.connect(window_size=4, raw_data_frames=True)
+
+        with mock.patch.object(Handler, "splice_chunk", autospec=True,
+                               side_effect=Handler.splice_chunk) as splice_chunk:
+            self.send_file(client,
+                           [(2, False), (1, True), (1, False), (3, False), (4, False)],
+                           [(2, 0, True), (1, 0, False), (1, 2, True), (3, 3, True), (4, 4, True)],
+                           raw=True)
+
+        self.assertEqual(splice_chunk.call_count, 5)
+
+    def test_corrupted_streamed_data(self):
+        self.assertIsNotNone(self.server.writer_manager)
+
+        client = self.connect(window_size=4)
+        pwrite = os.pwrite
+
+        def delayed_pwrite(file_descriptor, data, offset):
+            if bytes(64) in bytes(data):  # Written after its retransmission if it went through the writer threads
+                time.sleep(0.2)
+
+            return pwrite(file_descriptor, data, offset)
+
+        client.send(Protocol.send_create_new_file("streamed.bin", len(self.data), self.get_checksum(self.data)))
+        self.assertTrue(Protocol.receive_confirmation_packet(client.receive()))
+
+        with mock.patch("os.pwrite", delayed_pwrite):
+            for chunk_number, corrupted_data in ((1, False), (2, True), (2, False), (3, False), (4, False)):
+                self.send_chunk(client, self.data, chunk_number, corrupted_data=corrupted_data)
+
+            self.assertEqual([Protocol.receive_chunk_acknowledgement(client.receive()) for _ in range(5)],
+                             [(1, 1, True), (2, 1, False), (2, 2, True), (3, 3, True), (4, 4, True)])
+
+            client.send(Protocol.send_end_of_file("streamed.bin"))
+            self.assertTrue(Protocol.receive_confirmation_packet(client.receive()))
+            self.assertTrue(Protocol.receive_file_integrity_confirmation(client.receive()))
+
+        with open(self.file_path, "rb") as file_object:
+            self.assertEqual(file_object.read(), self.data)
+
+    def test_dropped_chunk_payload(self):
+        client = self.connect(window_size=4)
+        chunk_data = self.get_chunk(self.data, 1)
+
+        client.send(Protocol.send_create_new_file("streamed.bin", len(self.data), self.get_checksum(self.data)))
+        self.assertTrue(Protocol.receive_confirmation_packet(client.receive()))
+
+        # Beyond the window, the payload is read and dropped, and the connection stays usable
+        client.send_data_frame(6, chunk_data, hashlib.md5(chunk_data).digest(), max(Protocol.DATA_FRAME_VERSIONS))
+        self.assertEqual(Protocol.receive_chunk_acknowledgement(client.receive()), (6, 0, False))
+
+        self.send_chunk(client, self.data, 1)
+        self.assertEqual(Protocol.receive_chunk_acknowledgement(client.receive()), (1, 1, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
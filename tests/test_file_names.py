@@ -0,0 +1,57 @@
+import os
+import unittest
+
+from client.network.protocol.protocol import Protocol
+from tests.local_server import LocalServerTestCase
+
+
+class FileNamesTest(LocalServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        # Files escaping the receiving directory would land next to it, in the temporary directory
+        os.mkdir(os.path.join(self.path, "received"))
+        self.server.default_path = os.path.join(self.path, "received", "")
+
+        self.data = os.urandom(self.chunk_size // 2)
+        self.escaped_path = os.path.join(self.path, "escaped.bin")
+
+    def test_new_file_refused(self):
+        client = self.connect()
+
+        for name in ("../escaped.bin", "directory/../../escaped.bin", self.escaped_path):
+            client.send(Protocol.send_create_new_file(name, len(self.data), self.get_checksum(self.data)))
+            self.assertFalse(Protocol.receive_confirmation_packet(client.receive()))
+
+        self.assertFalse(os.path.exists(self.escaped_path))
+
+    def test_resumed_file_refused(self):
+        client = self.connect(resume=True)
+
+        client.send(Protocol.send_resume_file("../escaped.bin", len(self.data), self.get_checksum(self.data)))
+        self.assertIsNone(Protocol.receive_resume(client.receive())["chunk"])
+
+        self.assertFalse(os.path.exists(self.escaped_path))
+
+    def test_session_refused(self):
+        client = self.connect(window_size=4)
+
+        client.send(Protocol.send_create_session("../escaped.bin", len(self.data), self.get_checksum(self.data)))
+        self.assertIsNone(Protocol.receive_session(client.receive())["session_id"])
+
+        self.assertFalse(os.path.exists(self.escaped_path))
+
+    def test_bundled_file_refused(self):
+        client = self.connect(bundle=True)
+
+        client.send(Protocol.send_bundle([("../escaped.bin", self.get_checksum(self.data), self.data),
+                                          ("kept.bin", self.get_checksum(self.data), self.data)]))
+        self.assertEqual(Protocol.receive_bundle_results(client.receive()), [False, True])
+
+        self.assertFalse(os.path.exists(self.escaped_path))
+        self.assertTrue(os.path.exists(os.path.join(self.path, "received", "kept.bin")))
+
+
+if __name__ == '__main__':
+    unittest.main()
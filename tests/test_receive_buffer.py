@@ -0,0 +1,42 @@
+import unittest
+
+from server.network.receive_buffer import ReceiveBuffer
+
+
+class ReceiveBufferTest(unittest.TestCase):
+
+    def test_shrunk_after_large_frame(self):
+        receive_buffer = ReceiveBuffer(16)
+
+        receive_buffer.extend(bytes(100) + b"next")
+        self.assertGreaterEqual(len(receive_buffer.buffer), 104)
+
+        receive_buffer.consume(100)
+        receive_buffer.shrink()
+
+        self.assertEqual(len(receive_buffer.buffer), 16)
+        self.assertEqual(bytes(receive_buffer.peek(4)), b"next")
+
+    def test_kept_while_large_frame_unread(self):
+        receive_buffer = ReceiveBuffer(16)
+
+        receive_buffer.extend(bytes(100))
+        receive_buffer.consume(10)
+        receive_buffer.shrink()
+
+        self.assertEqual(len(receive_buffer), 90)
+        self.assertGreaterEqual(len(receive_buffer.buffer), 100)
+
+    def test_view_outlives_shrink(self):
+        receive_buffer = ReceiveBuffer(16)
+        receive_buffer.extend(bytes(100))
+
+        with receive_buffer.reserve(16):  # Held by the event loop while the frames are handled
+            receive_buffer.consume(100)
+            receive_buffer.shrink()
+
+        self.assertEqual(len(receive_buffer.buffer), 16)
+
+
+if __name__ == '__main__':
+    unittest.main()
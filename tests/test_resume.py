@@ -0,0 +1,96 @@
+import os
+import json
+import unittest
+
+from client.network.protocol.protocol import Protocol
+from tests.local_server import LocalServerTestCase
+
+
+class ResumeTest(LocalServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.server.progress_interval = 1  # Progress saved after every chunk
+
+        self.data = os.urandom(3 * self.chunk_size + self.chunk_size // 2)
+        self.file_path = os.path.join(self.path, "resumed.bin")
+        self.progress_path = os.path.join(self.path, ".resumed.bin.partial")
+
+    def resume_file(self, client, checksum: str, modification_time: int = None) -> dict:
+        client.send(Protocol.send_resume_file("resumed.bin", len(self.data), checksum, None, modification_time))
+
+        return Protocol.receive_resume(client.receive())
+
+    def send_resumed_chunk(self, client, chunk_number: int):
+        self.send_chunk(client, self.data, chunk_number)
+        self.assertTrue(Protocol.receive_file_chunk_integrity_confirmation(client.receive()))
+
+    def get_saved_chunk(self):
+        try:
+            with open(self.progress_path) as progress_file:
+                return json.load(progress_file)["current_chunk"]
+        except (OSError, ValueError):
+            return None
+
+    def send_first_chunks(self, streaming_checksum=False):
+        client = self.connect(resume=True)
+
+        if streaming_checksum:  # Only the size and the modification time identify the source
+            resume = self.resume_file(client, None, 1000)
+        else:
+            resume = self.resume_file(client, self.get_checksum(self.data))
+
+        self.assertEqual(resume["chunk"], 0)
+
+        for chunk_number in (1, 2):
+            self.send_resumed_chunk(client, chunk_number)
+
+        client.disconnect()
+        self.assertTrue(self.wait_until(lambda: self.get_saved_chunk() == 2))
+
+    def test_resume_from_partial_file(self):
+        self.send_first_chunks()
+
+        client = self.connect(resume=True)
+        resume = self.resume_file(client, self.get_checksum(self.data))
+
+        self.assertEqual((resume["chunk"], resume["offset"]), (2, 2 * self.chunk_size))
+
+        for chunk_number in (3, 4):
+            self.send_resumed_chunk(client, chunk_number)
+
+        client.send(Protocol.send_end_of_file("resumed.bin"))
+        self.assertTrue(Protocol.receive_confirmation_packet(client.receive()))
+        self.assertTrue(Protocol.receive_file_integrity_confirmation(client.receive()))
+
+        self.assertFalse(os.path.exists(self.progress_path))
+
+        with open(self.file_path, "rb") as file_object:
+            self.assertEqual(file_object.read(), self.data)
+
+    def test_changed_file_starts_over(self):
+        self.send_first_chunks()
+
+        client = self.connect(resume=True)
+        resume = self.resume_file(client, self.get_checksum(self.data[::-1]))
+
+        self.assertEqual((resume["chunk"], resume["offset"]), (0, 0))
+
+    def test_modified_file_starts_over(self):
+        self.send_first_chunks(streaming_checksum=True)
+
+        client = self.connect(resume=True)
+        self.assertEqual(self.resume_file(client, None, 1000)["chunk"], 2)
+
+        client.disconnect()
+        self.assertTrue(self.wait_until(lambda: not self.client_threads[1].is_alive()))
+
+        client = self.connect(resume=True)
+        resume = self.resume_file(client, None, 2000)
+
+        self.assertEqual((resume["chunk"], resume["offset"]), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
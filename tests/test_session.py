@@ -0,0 +1,66 @@
+import os
+import unittest
+
+from client.network.protocol.protocol import Protocol
+from tests.local_server import LocalServerTestCase
+
+
+class SessionTest(LocalServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.data = os.urandom(3 * self.chunk_size + self.chunk_size // 2)
+        self.file_path = os.path.join(self.path, "striped.bin")
+
+        self.client = self.connect(window_size=4)
+        self.stripe_client = self.connect(window_size=4)
+
+        self.client.send(Protocol.send_create_session("striped.bin", len(self.data), self.get_checksum(self.data)))
+        self.session_id = Protocol.receive_session(self.client.receive())["session_id"]
+
+        self.stripe_client.send(Protocol.send_join_session(self.session_id))
+        self.assertTrue(Protocol.receive_confirmation_packet(self.stripe_client.receive()))
+
+    def send_stripe_chunk(self, client, chunk_number: int):
+        self.send_chunk(client, self.data, chunk_number)
+        self.assertTrue(Protocol.receive_chunk_acknowledgement(client.receive())[2])
+
+    def test_stripe_connection_dropped(self):
+        self.send_stripe_chunk(self.stripe_client, 3)
+        self.send_stripe_chunk(self.client, 1)
+
+        self.stripe_client.disconnect()
+
+        # The session goes on through the connection left
+        for chunk_number in (2, 4):
+            self.send_stripe_chunk(self.client, chunk_number)
+
+        self.client.send(Protocol.send_end_of_file("striped.bin"))
+        self.assertTrue(Protocol.receive_confirmation_packet(self.client.receive()))
+        self.assertTrue(Protocol.receive_file_integrity_confirmation(self.client.receive()))
+
+        self.assertNotIn(self.session_id, self.server.session_manager.sessions)
+
+        with open(self.file_path, "rb") as file_object:
+            self.assertEqual(file_object.read(), self.data)
+
+    def test_every_connection_dropped(self):
+        self.send_stripe_chunk(self.stripe_client, 3)
+        self.send_stripe_chunk(self.client, 1)
+
+        session = self.server.session_manager.sessions[self.session_id]
+
+        self.client.disconnect()
+        self.assertTrue(self.wait_until(lambda: session.connections == 1))
+        self.assertIn(self.session_id, self.server.session_manager.sessions)
+
+        self.stripe_client.disconnect()
+
+        # The last connection gone, the session is dropped along with its preallocated file
+        self.assertTrue(self.wait_until(lambda: self.session_id not in self.server.session_manager.sessions))
+        self.assertTrue(self.wait_until(lambda: not os.path.exists(self.file_path)))
+
+
+if __name__ == '__main__':
+    unittest.main()
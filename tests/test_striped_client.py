@@ -0,0 +1,73 @@
+import io
+import os
+import socket
+import unittest
+from unittest import mock
+
+from client.core.main import Main
+from tests.local_server import LocalServerTestCase
+
+
+class StripedClientTest(LocalServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.source_path = os.path.join(self.path, "source")
+        self.destination_path = os.path.join(self.path, "destination")
+        os.mkdir(self.source_path)
+        os.mkdir(self.destination_path)
+
+        self.server.default_path = os.path.join(self.destination_path, "")
+
+        self.files_data = dict()
+
+        for file_name in ("first.bin", "second.bin"):
+            self.files_data[file_name] = os.urandom(8 * self.chunk_size + self.chunk_size // 2)
+
+            with open(os.path.join(self.source_path, file_name), "wb") as file_object:
+                file_object.write(self.files_data[file_name])
+
+    def connect_dropping_stripe_client(self, main):
+        self.clients.append(main.client)  # Left open by the exiting client, closed by tearDown
+
+        stripe_client = self.connect_stripe_client(main)
+        send_data_frame = stripe_client.send_data_frame
+        frames_sent = list()
+
+        # The stripe connection is lost after its second chunk, while the other stripe is still being sent
+        def dropping_send_data_frame(*args, **kwargs):
+            frames_sent.append(args[0])
+
+            if len(frames_sent) == 2:
+                stripe_client.socket.shutdown(socket.SHUT_RDWR)
+
+            return send_data_frame(*args, **kwargs)
+
+        stripe_client.send_data_frame = dropping_send_data_frame
+
+        return stripe_client
+
+    def test_stripe_connection_dropped(self):
+        self.connect_stripe_client = Main.connect_stripe_client
+
+        with mock.patch.object(Main, "connect_stripe_client", autospec=True,
+                               side_effect=self.connect_dropping_stripe_client), \
+                mock.patch("sys.stdout", new_callable=io.StringIO):
+            files_path_list = [os.path.join(self.source_path, file_name) for file_name in sorted(self.files_data)]
+
+            with self.assertRaises(SystemExit) as context:
+                Main("127.0.0.1", self.port, files_path_list=files_path_list, window_size=4, stripes=2, read_ahead=0)
+
+        self.assertEqual(context.exception.code, 0)
+
+        # The first file is aborted through the main connection, which goes on with the second file
+        self.assertFalse(os.path.exists(os.path.join(self.destination_path, "first.bin")))
+        self.assertEqual(self.server.session_manager.sessions, dict())
+
+        with open(os.path.join(self.destination_path, "second.bin"), "rb") as file_object:
+            self.assertEqual(file_object.read(), self.files_data["second.bin"])
+
+
+if __name__ == '__main__':
+    unittest.main()
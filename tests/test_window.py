@@ -0,0 +1,58 @@
+import os
+import unittest
+
+from client.network.protocol.protocol import Protocol
+from tests.local_server import LocalServerTestCase
+
+
+class WindowTest(LocalServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.data = os.urandom(3 * self.chunk_size + self.chunk_size // 2)
+        self.client = self.connect(window_size=4)
+
+        self.client.send(Protocol.send_create_new_file("window.bin", len(self.data), self.get_checksum(self.data)))
+        self.assertTrue(Protocol.receive_confirmation_packet(self.client.receive()))
+
+    def receive_acknowledgement(self):
+        return Protocol.receive_chunk_acknowledgement(self.client.receive())
+
+    def end_file(self) -> bool:
+        self.client.send(Protocol.send_end_of_file("window.bin"))
+        self.assertTrue(Protocol.receive_confirmation_packet(self.client.receive()))
+
+        return Protocol.receive_file_integrity_confirmation(self.client.receive())
+
+    def test_out_of_order_chunks(self):
+        # Every chunk is acknowledged with the last chunk received without a gap before it
+        for chunk_number, cumulative_chunk in ((3, 0), (1, 1), (4, 1), (2, 4)):
+            self.send_chunk(self.client, self.data, chunk_number)
+            self.assertEqual(self.receive_acknowledgement(), (chunk_number, cumulative_chunk, True))
+
+        self.assertTrue(self.end_file())
+
+        with open(os.path.join(self.path, "window.bin"), "rb") as file_object:
+            self.assertEqual(file_object.read(), self.data)
+
+    def test_retransmitted_chunk(self):
+        self.send_chunk(self.client, self.data, 2, corrupted=True)
+        self.assertEqual(self.receive_acknowledgement(), (2, 0, False))
+
+        for chunk_number in (1, 2, 2, 3, 4):  # The second chunk 2 is a duplicate, acknowledged again
+            self.send_chunk(self.client, self.data, chunk_number)
+            self.assertEqual(self.receive_acknowledgement(), (chunk_number, chunk_number, True))
+
+        self.assertTrue(self.end_file())
+
+    def test_chunk_beyond_window(self):
+        self.send_chunk(self.client, self.data, 1)
+        self.receive_acknowledgement()
+
+        self.client.send_data_frame(6, b"data", b"digest", max(Protocol.DATA_FRAME_VERSIONS))
+        self.assertEqual(self.receive_acknowledgement(), (6, 1, False))
+
+
+if __name__ == '__main__':
+    unittest.main()